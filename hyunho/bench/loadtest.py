@@ -0,0 +1,345 @@
+# 두 서비스(discord-webhook-server, code-reviewer) 부하 테스트 하네스
+# 시나리오마다 별도 프로세스에서 앱(lifespan 포함)과 로컬 업스트림 스텁을 띄우고,
+# 고정 시드로 만든 요청을 동시 접속 수만큼의 클라이언트로 보내 처리량/p50/p95/p99/메모리(RSS)를 측정
+# 결과는 기준선(baselines/<이름>.json)으로 저장해 다른 커밋의 결과와 비교할 수 있음 (회귀 시 종료 코드 1)
+# 기준선은 만든 머신에서만 의미가 있으므로 저장소에 커밋하지 않음 (baselines/는 .gitignore)
+#
+# 실행:
+#   python bench/loadtest.py                                  # 전체 시나리오
+#   python bench/loadtest.py -s discord -s review --requests 300 --concurrency 32
+#   python bench/loadtest.py --save main                      # 기준선 저장
+#   python bench/loadtest.py --compare main [--tolerance 0.2] # 기준선과 비교
+#
+# 앱은 httpx.ASGITransport로 같은 프로세스에서 호출하므로 네트워크/서버(uvicorn, Functions Framework) 비용은 포함되지 않음
+# 지연 시간은 머신마다 다르므로 기준선 비교는 같은 머신에서 실행한 결과끼리 해야 의미가 있음
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+DISCORD_DIR = os.path.join(ROOT_DIR, "discord-webhook-server")
+REVIEWER_DIR = os.path.join(ROOT_DIR, "code-reviewer")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# 시나리오별 기본값 (--requests/--concurrency로 전체 덮어쓰기 가능)
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # 임베드 위주 메시지를 동기 전송, Discord 스텁 지연 20ms, 레이트리밋 없음
+    "discord": {"service": "discord", "requests": 2000, "concurrency": 50, "latency_ms": 20.0, "webhooks": 8},
+    # 웹훅(버킷)당 1초에 5건만 허용하고 초과 시 429 + X-RateLimit-* 헤더를 주는 스텁
+    "discord-ratelimited": {
+        "service": "discord", "requests": 400, "concurrency": 50, "latency_ms": 20.0, "webhooks": 8,
+        "rate_limit": 5, "window": 1.0,
+    },
+    # 1~200개 파일 PR 리뷰, Gemini 스텁 지연 200ms + 프롬프트 1k 토큰당 5ms
+    "review": {"service": "review", "requests": 200, "concurrency": 16, "latency_ms": 200.0, "ms_per_1k_tokens": 5.0},
+    # 동시 4건을 넘으면 429를 주는 Gemini 스텁 (승인 제어/재시도 경로)
+    "review-quota": {
+        "service": "review", "requests": 100, "concurrency": 16, "latency_ms": 200.0, "ms_per_1k_tokens": 5.0,
+        "capacity": 4,
+    },
+}
+
+# 비교 시 회귀로 판단하는 지표 (높을수록 좋은 지표는 True)
+COMPARED = (("rps", True), ("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("rss_peak_mb", False))
+
+
+def percentile(values: List[float], q: float) -> float:
+    """nearest-rank 백분위수"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def rss_mb() -> float:
+    """현재 RSS (MB), /proc이 없으면 최대 RSS로 대체"""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage / 2**20 if sys.platform == "darwin" else usage / 1024
+
+
+class RssSampler:
+    """측정 구간 동안 일정 간격으로 RSS를 읽어 최대값 기록"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, rss_mb())
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.peak = rss_mb()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> float:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        return max(self.peak, rss_mb())
+
+
+async def drive(client, requests: List[Tuple[str, bytes]], concurrency: int) -> Dict[str, Any]:
+    """닫힌 루프 부하: concurrency개의 클라이언트가 요청을 하나씩 꺼내 응답을 받을 때까지 대기"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pending = iter(requests)
+    headers = {"Content-Type": "application/json"}
+
+    async def worker():
+        for path, body in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, content=body, headers=headers)
+                statuses[str(response.status_code)] += 1
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    sampler = RssSampler()
+    rss_before = rss_mb()
+    sampler.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    rss_peak = await sampler.stop()
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    latencies_ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "statuses": dict(statuses),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(ok / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "max_ms": round(max(latencies_ms, default=0.0), 2),
+        "rss_before_mb": round(rss_before, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "rss_after_mb": round(rss_mb(), 1),
+    }
+
+
+async def run_discord(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path[:0] = [DISCORD_DIR, os.path.join(DISCORD_DIR, "bench")]
+    # 서버 전송 계층 자체를 측정하도록 전역 레이트리밋 해제 (스텁에는 전역 한도가 없음)
+    os.environ.setdefault("DISCORD_HTTP_GLOBAL_RATE_LIMIT", "0")
+    import httpx
+    from stub_discord import RateLimitedStubDiscordServer, StubDiscordServer
+
+    import profiles
+
+    if cfg.get("rate_limit"):
+        stub = RateLimitedStubDiscordServer(latency_ms=cfg["latency_ms"], limit=cfg["rate_limit"], window=cfg["window"])
+    else:
+        stub = StubDiscordServer(latency_ms=cfg["latency_ms"])
+    # 스텁은 별도 스레드의 이벤트 루프에서 실행해 앱/부하 생성과 같은 루프를 쓰지 않게 함 (GIL은 공유)
+    stub.start_in_thread()
+
+    import main
+
+    for index in range(cfg["webhooks"]):
+        main.webhook_manager.register_webhook(f"load{index}", stub.webhook_url(str(1000 + index), "load-token"))
+
+    rng = random.Random(cfg["seed"])
+    requests = [
+        (f"/api/webhook/load{rng.randrange(cfg['webhooks'])}", json.dumps(profiles.discord_message(rng)).encode())
+        for _ in range(cfg["warmup"] + cfg["requests"])
+    ]
+    try:
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+                await drive(client, requests[: cfg["warmup"]], cfg["concurrency"])
+                result = await drive(client, requests[cfg["warmup"]:], cfg["concurrency"])
+    finally:
+        stub.stop_thread()
+    result["upstream"] = {"requests": stub.request_count, "rate_limited": getattr(stub, "rate_limited", 0)}
+    result["avg_request_bytes"] = round(sum(len(body) for _, body in requests) / len(requests))
+    return result
+
+
+async def run_review(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    sys.path[:0] = [REVIEWER_DIR, os.path.join(REVIEWER_DIR, "bench")]
+    # 캐시는 메모리 계층만 사용 (디스크 상태가 결과에 영향을 주지 않도록)
+    os.environ.pop("REVIEW_CACHE_DIR", None)
+    os.environ.pop("AUTH_TOKEN", None)
+    import httpx
+    from stub_gemini import StubGeminiModel, install
+
+    import profiles
+    from app.main import app
+
+    rng = random.Random(cfg["seed"])
+    payloads = [profiles.review_request(rng, number) for number in range(1, cfg["warmup"] + cfg["requests"] + 1)]
+    requests = [("/v1/review", json.dumps(payload).encode()) for payload in payloads]
+    async with app.router.lifespan_context(app):
+        stub = install(
+            app.state.review_service.gemini,
+            StubGeminiModel(
+                latency_ms=cfg["latency_ms"],
+                ms_per_1k_tokens=cfg["ms_per_1k_tokens"],
+                capacity=cfg.get("capacity", 0),
+                seed=cfg["seed"],
+            ),
+        )
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=600) as client:
+            await drive(client, requests[: cfg["warmup"]], cfg["concurrency"])
+            result = await drive(client, requests[cfg["warmup"]:], cfg["concurrency"])
+    result["upstream"] = stub.stats()
+    result["avg_files"] = round(sum(len(p["changed_files"]) for p in payloads) / len(payloads), 1)
+    return result
+
+
+def run_child(name: str, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """시나리오 하나를 새 프로세스에서 실행 (프로메테우스 레지스트리/메모리 측정이 서로 섞이지 않도록)"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", name, "--child-config", json.dumps(cfg)],
+        cwd=BENCH_DIR, capture_output=True, text=True,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"{name} 시나리오 실패:\n{output.stderr[-4000:]}")
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def git_revision() -> Dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", "-C", ROOT_DIR, *args], capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'scenario':<20} {'req':>6} {'ok':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rss peak MB':>12}")
+    for name, r in results.items():
+        print(
+            f"{name:<20} {r['requests']:>6} {r['ok']:>6} {r['rps']:>9.1f} {r['p50_ms']:>9.1f} "
+            f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['rss_peak_mb']:>12.1f}"
+        )
+        errors = {status: count for status, count in r["statuses"].items() if not status.startswith("2")}
+        if errors:
+            print(f"{'':<20} 오류 응답: {errors}")
+        print(f"{'':<20} 업스트림: {r['upstream']}")
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """기준선 대비 변화율 출력, tolerance를 넘게 나빠진 지표 목록 반환"""
+    regressions = []
+    print(f"\n기준선 {baseline['name']} ({baseline['revision']['commit']}) 대비, 허용 오차 {tolerance:.0%}")
+    machine = {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+    if baseline.get("machine") != machine:
+        print(f"경고: 기준선과 다른 머신/환경에서 실행 중 (기준선 {baseline.get('machine')}, 현재 {machine})")
+    if baseline["revision"].get("dirty"):
+        print("경고: 기준선이 커밋되지 않은 변경이 있는 작업 트리에서 측정됨")
+    for name, r in results.items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<20} 기준선 없음")
+            continue
+        cells = []
+        for metric, higher_is_better in COMPARED:
+            if not base.get(metric):
+                continue
+            change = (r[metric] - base[metric]) / base[metric]
+            worse = -change if higher_is_better else change
+            flag = ""
+            if worse > tolerance:
+                flag = " !"
+                regressions.append(f"{name}.{metric} {base[metric]} -> {r[metric]}")
+            cells.append(f"{metric} {change:+.1%}{flag}")
+        print(f"{name:<20} " + ", ".join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="discord-webhook-server / code-reviewer 부하 테스트")
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS), help="반복 지정 가능 (기본: 전체)")
+    parser.add_argument("--requests", type=int, help="시나리오별 측정 요청 수")
+    parser.add_argument("--concurrency", type=int, help="동시 클라이언트 수")
+    parser.add_argument("--warmup", type=int, default=20, help="측정 전 버리는 요청 수")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", metavar="NAME", help="결과를 baselines/NAME.json으로 저장")
+    parser.add_argument("--compare", metavar="NAME", help="baselines/NAME.json과 비교 (회귀 시 종료 코드 1)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="회귀로 보지 않는 변화율 (기본 20%%)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        cfg = json.loads(args.child_config)
+        runner = run_discord if cfg["service"] == "discord" else run_review
+        print(json.dumps(asyncio.run(runner(cfg))))
+        return
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    names = args.scenario or list(SCENARIOS)
+    configs: Dict[str, Dict[str, Any]] = {}
+    results: Dict[str, Dict[str, Any]] = {}
+    for name in names:
+        cfg = dict(SCENARIOS[name], seed=args.seed, warmup=args.warmup)
+        if args.requests:
+            cfg["requests"] = args.requests
+        if args.concurrency:
+            cfg["concurrency"] = args.concurrency
+        if baseline is not None and name in baseline.get("configs", {}):
+            if args.requests or args.concurrency:
+                print(f"경고: {name} 부하 조건이 기준선과 달라 비교 결과가 부정확할 수 있음")
+            else:
+                # 같은 부하 조건으로 비교
+                cfg = dict(baseline["configs"][name], seed=args.seed, warmup=args.warmup)
+        configs[name] = cfg
+        print(f"running {name} ({cfg['requests']} requests, concurrency {cfg['concurrency']}) ...", flush=True)
+        results[name] = run_child(name, cfg)
+
+    print()
+    print_results(results)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "name": args.save,
+                "revision": git_revision(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+                "configs": configs,
+                "results": results,
+            }, fh, ensure_ascii=False, indent=2)
+            fh.write("\n")
+        print(f"\n기준선 저장: {os.path.relpath(path, ROOT_DIR)}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n회귀 감지:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nOK: 기준선 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
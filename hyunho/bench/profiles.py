@@ -0,0 +1,111 @@
+# 부하 테스트용 요청 생성기 (시드 고정으로 재현 가능)
+# - Discord: 짧은 텍스트와 임베드가 많은 알림(배포/CI 리포트 형태)을 섞은 메시지
+# - 코드 리뷰: 1~200개 파일 PR (작은 PR이 대부분, 가끔 대형 PR), 일부 lockfile/생성 파일 포함
+
+import random
+from typing import Any, Dict, List
+
+_WORDS = (
+    "deploy build release service api worker queue cache config update fix refactor test "
+    "배포 완료 실패 경고 서버 응답 지연 확인 필요 성공 요청 처리 시간 메모리 사용량"
+).split()
+
+_CODE_LINES = (
+    "    result = compute(value, options)",
+    "    if not items:",
+    "        return None",
+    "    for index, item in enumerate(items):",
+    "    logger.info(\"processing %s\", item.id)",
+    "    total += item.price * item.quantity",
+    "    raise ValueError(f\"invalid input: {value}\")",
+    "def handle_request(request, context=None):",
+    "    session = await client.get(url, timeout=10)",
+    "    return {\"status\": \"ok\", \"count\": len(rows)}",
+    "class OrderService:",
+    "    self.cache[key] = response",
+)
+
+_EXTENSIONS = (".py", ".py", ".py", ".ts", ".tsx", ".go", ".java", ".md")
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def _embed(rng: random.Random) -> Dict[str, Any]:
+    embed: Dict[str, Any] = {
+        "title": _text(rng, rng.randint(2, 8)),
+        "description": _text(rng, rng.randint(20, 300)),
+        "color": rng.randint(0, 0xFFFFFF),
+        "timestamp": "2024-01-01T00:00:00Z",
+        "footer": {"text": _text(rng, 3), "icon_url": "https://example.com/icon.png"},
+        "author": {"name": _text(rng, 2), "url": "https://example.com"},
+        "fields": [
+            {"name": _text(rng, 2), "value": _text(rng, rng.randint(3, 30)), "inline": rng.random() < 0.5}
+            for _ in range(rng.randint(0, 25))
+        ],
+    }
+    if rng.random() < 0.3:
+        embed["thumbnail"] = {"url": "https://example.com/thumb.png"}
+    return embed
+
+
+def discord_message(rng: random.Random) -> Dict[str, Any]:
+    """텍스트 전용 30%, 임베드 1~10개 70%"""
+    if rng.random() < 0.3:
+        return {"content": _text(rng, rng.randint(5, 60)), "username": "load-test"}
+    return {
+        "content": _text(rng, rng.randint(0, 20)) or None,
+        "username": "load-test",
+        "avatar_url": "https://example.com/avatar.png",
+        "embeds": [_embed(rng) for _ in range(rng.randint(1, 10))],
+    }
+
+
+def pr_file_count(rng: random.Random) -> int:
+    """1~200개 파일 (1~3개 40%, 4~15개 35%, 16~60개 18%, 61~200개 7%)"""
+    low, high = rng.choices([(1, 3), (4, 15), (16, 60), (61, 200)], weights=[40, 35, 18, 7])[0]
+    return rng.randint(low, high)
+
+
+def _patch(rng: random.Random, hunks: int) -> str:
+    lines: List[str] = []
+    start = 1
+    for _ in range(hunks):
+        start += rng.randint(5, 120)
+        body: List[str] = []
+        old = new = 0
+        for _ in range(rng.randint(6, 60)):
+            kind = rng.choices(" +-", weights=[5, 3, 2])[0]
+            body.append(kind + rng.choice(_CODE_LINES))
+            old += kind != "+"
+            new += kind != "-"
+        lines.append(f"@@ -{start},{old} +{start},{new} @@")
+        lines.extend(body)
+    return "\n".join(lines) + "\n"
+
+
+def review_request(rng: random.Random, pr_number: int) -> Dict[str, Any]:
+    files: List[Dict[str, Any]] = []
+    for index in range(pr_file_count(rng)):
+        roll = rng.random()
+        if roll < 0.03:
+            files.append({"path": f"packages/p{index}/package-lock.json", "status": "modified", "patch": _patch(rng, 8)})
+        elif roll < 0.05:
+            files.append({"path": f"assets/logo{index}.png", "status": "added", "patch": None})
+        else:
+            path = f"src/module{index % 17}/file{index}{rng.choice(_EXTENSIONS)}"
+            files.append({
+                "path": path,
+                "status": rng.choice(("modified", "modified", "modified", "added")),
+                "patch": _patch(rng, rng.randint(1, 6)),
+            })
+    return {
+        "repo": "load/test",
+        "pr_number": pr_number,
+        "title": _text(rng, 6),
+        "description": _text(rng, rng.randint(0, 80)),
+        "head_sha": f"{rng.getrandbits(160):040x}",
+        "author": "load-test",
+        "changed_files": files,
+    }
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import json
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Tuple
+
+from fastapi import HTTPException
+
+SUPPORTED_ENCODINGS = ("gzip", "zstd")
+# zstd input is fed in slices this small so one slice can't expand far past the body limit
+# (a zstd block is at most 128 KiB of output)
+_ZSTD_SLICE = 512
+
+
+class _GzipDecoder:
+    def __init__(self):
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        # Output is capped one byte past the limit, so an oversized body is detected without inflating it
+        return self._d.decompress(data, limit + 1)
+
+    def finish(self) -> None:
+        if not self._d.eof:
+            raise zlib.error("truncated gzip stream")
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        import zstandard  # type: ignore
+
+        self._d = zstandard.ZstdDecompressor().decompressobj()
+        self._fed = False
+
+    def decompress(self, data: bytes, limit: int) -> bytes:
+        out = bytearray()
+        view = memoryview(data)
+        for start in range(0, len(view), _ZSTD_SLICE):
+            out += self._d.decompress(view[start:start + _ZSTD_SLICE])
+            if len(out) > limit:
+                break
+        self._fed = self._fed or bool(data)
+        return bytes(out)
+
+    def finish(self) -> None:
+        if self._fed and not self._d.eof:
+            raise ValueError("truncated zstd stream")
+
+
+def _decoder(encoding: str):
+    if encoding == "gzip":
+        return _GzipDecoder()
+    try:
+        return _ZstdDecoder()
+    except ImportError:
+        return None
+
+
+class DecompressMiddleware:
+    """Pure ASGI middleware decoding gzip/zstd request bodies (Content-Encoding) as they stream in.
+
+    The app sees a plain body and never the compressed bytes. Decoded bodies larger
+    than `max_body_bytes` are rejected with 413 (guards against decompression bombs).
+    """
+
+    def __init__(self, app: Callable[..., Any], max_body_bytes: int = 64 * 1024 * 1024):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = ""
+        for key, value in scope["headers"]:
+            if key == b"content-encoding":
+                encoding = value.decode("latin-1").strip().lower()
+                break
+        if encoding in ("", "identity"):
+            await self.app(scope, receive, send)
+            return
+
+        decoder = _decoder(encoding) if encoding in SUPPORTED_ENCODINGS else None
+        if decoder is None:
+            detail = f"Unsupported Content-Encoding: {encoding}"
+            if encoding == "zstd":
+                detail += " (zstandard is not installed)"
+            body = json.dumps({"detail": detail}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 415,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        # Edit the shared scope in place: outer middleware (metrics) reads the route the router sets on it
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in (b"content-encoding", b"content-length")]
+        remaining = self.max_body_bytes
+
+        async def receive_decoded() -> Dict[str, Any]:
+            nonlocal remaining
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            more_body = message.get("more_body", False)
+            try:
+                data = decoder.decompress(message.get("body", b""), remaining)
+                if not more_body:
+                    decoder.finish()
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid {encoding} request body: {e}")
+            remaining -= len(data)
+            if remaining < 0:
+                raise HTTPException(status_code=413, detail=f"Decoded request body exceeds {self.max_body_bytes} bytes")
+            return {"type": "http.request", "body": data, "more_body": more_body}
+
+        await self.app(scope, receive_decoded, send)
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """(line number, line) for each non-blank line of an NDJSON stream, holding at most one line in memory."""
+    buffer = bytearray()
+    number = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                buffer += chunk[start:]
+                break
+            number += 1
+            if buffer:
+                buffer += chunk[start:end]
+                line, buffer = bytes(buffer), bytearray()
+            else:
+                line = chunk[start:end]
+            start = end + 1
+            if len(line) > max_line_bytes:
+                raise HTTPException(status_code=413, detail=f"NDJSON line {number} exceeds {max_line_bytes} bytes")
+            if line.strip():
+                yield number, line
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(status_code=413, detail=f"NDJSON line {number + 1} exceeds {max_line_bytes} bytes")
+    if buffer.strip():
+        yield number + 1, bytes(buffer)
@@ -1,12 +1,100 @@
-from fastapi import FastAPI, HTTPException, Header
-from fastapi.responses import JSONResponse
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, HTTPException, Header, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from .schemas import ReviewRequest, ReviewResponse
+from pydantic import ValidationError
+from . import metrics
+from .ingest import DecompressMiddleware, iter_lines
+from .schemas import ChangedFile, ReviewRequest, ReviewResponse
+from .services.admission import AdmissionRejected
+from .services.jobs import JobQueueFullError, ReviewJob, ReviewJobManager
+from .services.preprocess import DEFAULT_IGNORE_GLOBS
 from .services.review import ReviewService, ReviewServiceConfig
+from .services.router import ModelRouter
 import os
 
 
-app = FastAPI(title="Code Review API", version="0.1.0")
+def build_review_service() -> ReviewService:
+    cfg = ReviewServiceConfig(
+        model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+        api_key=os.getenv("GEMINI_API_KEY", ""),
+        temperature=float(os.getenv("GEMINI_TEMPERATURE", "0.2")),
+        max_output_tokens=int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048")),
+        max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+        chunk_max_tokens=int(os.getenv("REVIEW_CHUNK_MAX_TOKENS", "24000")),
+        chunk_concurrency=int(os.getenv("REVIEW_CHUNK_CONCURRENCY", "4")),
+        cache_enabled=os.getenv("REVIEW_CACHE", "1") != "0",
+        cache_entries=int(os.getenv("REVIEW_CACHE_ENTRIES", "1024")),
+        cache_dir=os.getenv("REVIEW_CACHE_DIR") or None,
+        cache_max_bytes=int(os.getenv("REVIEW_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+        incremental=os.getenv("REVIEW_INCREMENTAL", "1") != "0",
+        ignore_globs=DEFAULT_IGNORE_GLOBS
+        + tuple(g.strip() for g in os.getenv("REVIEW_IGNORE_GLOBS", "").split(",") if g.strip()),
+        context_lines=int(os.getenv("REVIEW_CONTEXT_LINES", "1")),
+        max_prompt_tokens=int(os.getenv("REVIEW_MAX_PROMPT_TOKENS", "400000")),
+        max_file_tokens=int(os.getenv("REVIEW_MAX_FILE_TOKENS", "20000")),
+        comment_anchor=os.getenv("REVIEW_COMMENT_ANCHOR", "snap"),
+        comment_snap_lines=int(os.getenv("REVIEW_COMMENT_SNAP_LINES", "3")),
+        model_backends=os.getenv("GEMINI_BACKENDS", ""),
+    )
+    return ReviewService.from_env(cfg)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the service (and its model client) once per process and share it across requests
+    app.state.review_service = build_review_service()
+    app.state.review_jobs = ReviewJobManager(
+        app.state.review_service,
+        workers=int(os.getenv("REVIEW_JOB_WORKERS", "4")),
+        max_queue=int(os.getenv("REVIEW_JOB_QUEUE", "100")),
+    )
+    await app.state.review_jobs.start()
+    yield
+    await app.state.review_jobs.stop()
+
+
+def get_review_service(request: Request) -> ReviewService:
+    return request.app.state.review_service
+
+
+def get_review_jobs(request: Request) -> ReviewJobManager:
+    return request.app.state.review_jobs
+
+
+def require_auth(x_auth_token: str | None = Header(default=None)) -> None:
+    expected = os.getenv("AUTH_TOKEN")
+    if expected:
+        if not x_auth_token or x_auth_token != expected:
+            raise HTTPException(status_code=401, detail="Unauthorized")
+
+
+def check_admission(service: ReviewService = Depends(get_review_service)) -> None:
+    """Reject early (before parsing work is queued) while the model call queue is saturated."""
+    admission = service.gemini.admission
+    if admission.saturated:
+        raise HTTPException(
+            status_code=503,
+            detail="Model call queue is full",
+            headers={"Retry-After": str(int(admission.retry_after()))},
+        )
+
+
+def get_job(
+    job_id: str,
+    _: None = Depends(require_auth),
+    jobs: ReviewJobManager = Depends(get_review_jobs),
+) -> ReviewJob:
+    # Authenticate before the lookup so unauthenticated callers can't probe job ids (404 vs 401)
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Review job not found")
+    return job
+
+
+app = FastAPI(title="Code Review API", version="0.1.0", lifespan=lifespan)
 
 # Allow local and GitHub Action runners by default; adjust as needed
 app.add_middleware(
@@ -16,16 +104,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# gzip/zstd request bodies (Content-Encoding); the decoded size is capped against decompression bombs
+app.add_middleware(
+    DecompressMiddleware,
+    max_body_bytes=int(os.getenv("REVIEW_MAX_BODY_BYTES", str(64 * 1024 * 1024))),
+)
+app.add_middleware(metrics.MetricsMiddleware)
 
-
-def build_review_service() -> ReviewService:
-    cfg = ReviewServiceConfig(
-        model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
-        api_key=os.getenv("GEMINI_API_KEY", ""),
-        temperature=float(os.getenv("GEMINI_TEMPERATURE", "0.2")),
-        max_output_tokens=int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "2048")),
-    )
-    return ReviewService.from_env(cfg)
+MAX_LINE_BYTES = int(os.getenv("REVIEW_MAX_LINE_BYTES", str(8 * 1024 * 1024)))
 
 
 @app.get("/healthz")
@@ -33,17 +119,143 @@ def healthz():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def prometheus_metrics(
+    service: ReviewService = Depends(get_review_service),
+    jobs: ReviewJobManager = Depends(get_review_jobs),
+):
+    return Response(content=metrics.render(service, jobs), media_type=metrics.CONTENT_TYPE_LATEST)
+
+
+@app.get("/v1/cache/stats")
+def cache_stats(service: ReviewService = Depends(get_review_service)):
+    if service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **service.cache.stats()}
+
+
+@app.get("/v1/admission/stats")
+def admission_stats(service: ReviewService = Depends(get_review_service)):
+    stats = service.gemini.admission.stats()
+    if isinstance(service.gemini, ModelRouter):
+        stats["backends"] = service.gemini.stats()
+    return stats
+
+
 @app.post("/v1/review", response_model=ReviewResponse)
-async def create_review(payload: ReviewRequest, x_auth_token: str | None = Header(default=None)):
+async def create_review(
+    payload: ReviewRequest,
+    _: None = Depends(require_auth),
+    __: None = Depends(check_admission),
+    service: ReviewService = Depends(get_review_service),
+):
     try:
-        expected = os.getenv("AUTH_TOKEN")
-        if expected:
-            if not x_auth_token or x_auth_token != expected:
-                raise HTTPException(status_code=401, detail="Unauthorized")
-        service = build_review_service()
         result = await service.generate_review(payload)
         return JSONResponse(content=result.model_dump())
     except HTTPException:
         raise
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/review/stream", response_model=ReviewResponse)
+async def create_review_stream(
+    request: Request,
+    _: None = Depends(require_auth),
+    __: None = Depends(check_admission),
+    service: ReviewService = Depends(get_review_service),
+):
+    """NDJSON upload: the first line is the ReviewRequest (changed_files optional), then one ChangedFile per line.
+
+    Files are preprocessed as they arrive, so memory stays bounded by the prompt budget
+    rather than the upload size.
+    """
+    lines = iter_lines(request.stream(), MAX_LINE_BYTES)
+    try:
+        number, line = await lines.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=422, detail="Empty NDJSON body: expected a ReviewRequest on the first line")
+    try:
+        payload = ReviewRequest.model_validate_json(line)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=f"Line {number}: {e}")
+
+    async def files():
+        async for number, line in lines:
+            try:
+                yield ChangedFile.model_validate_json(line)
+            except ValidationError as e:
+                raise HTTPException(status_code=422, detail=f"Line {number}: {e}")
+
+    try:
+        result = await service.review_stream(payload, files())
+        return JSONResponse(content=result.model_dump())
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/v1/reviews", status_code=202)
+async def submit_review(
+    payload: ReviewRequest,
+    _: None = Depends(require_auth),
+    __: None = Depends(check_admission),
+    jobs: ReviewJobManager = Depends(get_review_jobs),
+):
+    try:
+        job = jobs.submit(payload)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return JSONResponse(
+        status_code=202,
+        content={
+            "id": job.id,
+            "status": job.status,
+            "status_url": f"/v1/reviews/{job.id}",
+            "events_url": f"/v1/reviews/{job.id}/events",
+        },
+        headers={"Location": f"/v1/reviews/{job.id}"},
+    )
+
+
+@app.get("/v1/reviews/{job_id}")
+def get_review_job(job: ReviewJob = Depends(get_job)):
+    return job.to_dict()
+
+
+@app.delete("/v1/reviews/{job_id}")
+def cancel_review_job(
+    job: ReviewJob = Depends(get_job),
+    jobs: ReviewJobManager = Depends(get_review_jobs),
+):
+    return jobs.cancel(job.id).to_dict()
+
+
+@app.get("/v1/reviews/{job_id}/events")
+async def stream_review_job(
+    job: ReviewJob = Depends(get_job),
+    jobs: ReviewJobManager = Depends(get_review_jobs),
+    last_event_id: str | None = Header(default=None),
+):
+    """Server-Sent Events: status changes, comments per finished file/chunk, then the final result."""
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else -1
+
+    async def stream():
+        async for index, event in jobs.events(job, after=after):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            data = json.dumps(event["data"], ensure_ascii=False, separators=(",", ":"))
+            yield f"id: {index}\nevent: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+
+if TYPE_CHECKING:
+    from .services.jobs import ReviewJobManager
+    from .services.review import ReviewService
+
+# *_created series double the scrape size and nothing here uses them
+disable_created_metrics()
+
+_FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_MODEL_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route", "status"],
+)
+MODEL_REQUEST_SECONDS = Histogram(
+    "model_request_duration_seconds",
+    "Latency of one model API attempt (excluding admission queueing).",
+    ["model", "status"],
+    buckets=_MODEL_BUCKETS,
+)
+MODEL_TOKENS = Counter(
+    "model_tokens",
+    "Prompt/response tokens reported by the model (estimated when usage metadata is missing).",
+    ["model", "kind"],
+)
+MODEL_ROUTES = Counter(
+    "model_routes",
+    "Model calls started per backend, by routing role (primary, hedge, failover).",
+    ["backend", "role"],
+)
+REVIEW_STAGE_SECONDS = Histogram(
+    "review_stage_duration_seconds",
+    "Time spent in review pipeline stages outside the model call.",
+    ["stage"],
+    buckets=_FAST_BUCKETS,
+)
+REVIEW_SECONDS = Histogram(
+    "review_duration_seconds",
+    "End-to-end review latency (one model run, shared by single-flight waiters).",
+    buckets=_MODEL_BUCKETS,
+)
+
+REVIEW_COMMENTS = Counter(
+    "review_comments",
+    "Inline comments returned, by how they were anchored to the diff (kept, snapped, dropped, unanchored).",
+    ["result"],
+)
+
+
+def observe_stage(stage: str, started: float) -> None:
+    REVIEW_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def _status_label(error: Optional[BaseException]) -> str:
+    if error is None:
+        return "ok"
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return str(code)
+    return type(error).__name__
+
+
+def observe_model_call(model: str, started: float, error: Optional[BaseException] = None) -> None:
+    MODEL_REQUEST_SECONDS.labels(model, _status_label(error)).observe(time.perf_counter() - started)
+
+
+def record_tokens(model: str, prompt: int, response: int) -> None:
+    MODEL_TOKENS.labels(model, "prompt").inc(prompt)
+    MODEL_TOKENS.labels(model, "response").inc(response)
+
+
+class _ServiceCollector:
+    """Reads cache, admission and job queue state at scrape time; nothing is tracked on the hot path."""
+
+    def __init__(self, service: ReviewService, jobs: Optional[ReviewJobManager]):
+        self.service = service
+        self.jobs = jobs
+
+    def collect(self) -> Iterator[Metric]:
+        cache = self.service.cache
+        if cache is not None:
+            stats = cache.stats()
+            lookups = CounterMetricFamily("review_cache_lookups", "Result cache lookups.", labels=["result"])
+            lookups.add_metric(["hit_memory"], stats["hits_memory"])
+            lookups.add_metric(["hit_disk"], stats["hits_disk"])
+            lookups.add_metric(["miss"], stats["misses"])
+            yield lookups
+            yield CounterMetricFamily(
+                "review_cache_model_calls_saved", "Model calls avoided by the cache.", value=stats["model_calls_saved"]
+            )
+            yield CounterMetricFamily(
+                "review_cache_tokens_saved", "Estimated prompt tokens avoided.", value=stats["estimated_tokens_saved"]
+            )
+            yield GaugeMetricFamily("review_cache_entries", "Entries in the memory tier.", value=stats["entries_memory"])
+
+        admission = self.service.gemini.admission.stats()
+        yield GaugeMetricFamily("model_concurrency_limit", "Adaptive model call concurrency limit.", value=admission["concurrency_limit"])
+        yield GaugeMetricFamily("model_calls_in_flight", "Model calls in progress.", value=admission["in_flight"])
+        yield GaugeMetricFamily("model_calls_queued", "Model calls waiting for admission.", value=admission["queued"])
+        outcomes = CounterMetricFamily("model_admission", "Admission decisions.", labels=["outcome"])
+        for outcome in ("admitted", "rejected", "retries", "throttled"):
+            outcomes.add_metric([outcome], admission[outcome])
+        yield outcomes
+
+        backends = getattr(self.service.gemini, "backends", None)
+        if backends is not None:
+            p95 = GaugeMetricFamily(
+                "model_backend_latency_p95_seconds", "Recent p95 call latency per routed backend.", labels=["backend"]
+            )
+            for b in backends:
+                value = b.latency.p95()
+                if value is not None:
+                    p95.add_metric([b.name], value)
+            yield p95
+
+        flights = CounterMetricFamily("review_flights", "Review runs started vs. joined by identical requests.", labels=["kind"])
+        flights.add_metric(["started"], self.service.flights_started)
+        flights.add_metric(["joined"], self.service.flights_joined)
+        yield flights
+
+        if self.jobs is not None:
+            stats = self.jobs.stats()
+            yield GaugeMetricFamily("review_job_queue_depth", "Background review jobs waiting for a worker.", value=stats["queue_depth"])
+            jobs = GaugeMetricFamily("review_jobs", "Retained background review jobs by status.", labels=["status"])
+            for status, count in stats["jobs"].items():
+                jobs.add_metric([status], count)
+            yield jobs
+
+
+def render(service: ReviewService, jobs: Optional[ReviewJobManager] = None) -> bytes:
+    """Process-wide metrics plus a snapshot of the service's queues and cache, in Prometheus text format."""
+    snapshot = CollectorRegistry(auto_describe=False)
+    snapshot.register(_ServiceCollector(service, jobs))
+    return generate_latest(REGISTRY) + generate_latest(snapshot)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per route template (FastAPI sets scope["route"])."""
+
+    def __init__(self, app: Callable[..., Any]):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route.path if route else "unmatched", str(status)).observe(
+                time.perf_counter() - started
+            )
+
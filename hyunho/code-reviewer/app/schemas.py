@@ -28,6 +28,17 @@ class InlineComment(BaseModel):
     severity: Optional[str] = Field(
         default=None, description="nit|suggestion|warning|error"
     )
+    position: Optional[int] = Field(
+        default=None,
+        description="Position of `line` in the file's diff (GitHub review comment `position`)",
+    )
+
+
+class SkippedFile(BaseModel):
+    path: str
+    reason: str = Field(
+        ..., description="ignored:<glob>|removed|generated|minified|binary|truncated|budget"
+    )
 
 
 class ReviewResponse(BaseModel):
@@ -36,4 +47,8 @@ class ReviewResponse(BaseModel):
     suggestions: List[str] = Field(default_factory=list)
     model: Optional[str] = None
     tokens_used: Optional[int] = None
+    skipped_files: List[SkippedFile] = Field(
+        default_factory=list,
+        description="Files left out of (or truncated in) the prompt by pre-processing",
+    )
 
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+RETRYABLE_NAMES = ("ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded")
+
+
+class AdmissionRejected(Exception):
+    """The model call queue is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"model call queue is full, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Provider quota / transient server errors (HTTP 429 and 5xx) and timeouts."""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_NAMES
+
+
+@dataclass
+class AdmissionConfig:
+    # Provider quotas; 0 disables the corresponding bucket
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    # Adaptive concurrency window (AIMD between min and max)
+    min_concurrency: int = 1
+    max_concurrency: int = 8
+    # Calls allowed to wait for a slot before new ones are rejected
+    max_queue: int = 200
+    # Priority units (estimated PR tokens) a waiting call gains per second, so large PRs can't starve
+    priority_aging: float = 1000.0
+    max_retries: int = 3
+    base_backoff: float = 1.0
+    max_backoff: float = 30.0
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (requests larger than the bucket wait for a full one)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class AdmissionController:
+    """Gate for model calls: RPM/TPM token buckets, a priority queue and adaptive concurrency.
+
+    Lower priority values are admitted first, less `priority_aging` per second spent
+    waiting, so a steady stream of small PRs delays a large one but never starves it.
+    The concurrency limit grows by one per
+    window of successful calls and halves on 429/5xx, which are retried with
+    exponential backoff and full jitter.
+    """
+
+    def __init__(self, cfg: AdmissionConfig):
+        self.cfg = cfg
+        self.limit = float(cfg.max_concurrency)
+        self.in_flight = 0
+        self._rpm = TokenBucket(cfg.requests_per_minute) if cfg.requests_per_minute > 0 else None
+        self._tpm = TokenBucket(cfg.tokens_per_minute) if cfg.tokens_per_minute > 0 else None
+        self._waiting: List[Tuple[float, int, int, asyncio.Future]] = []
+        # Waiters not yet admitted or cancelled; cancelled entries stay in the heap until popped
+        self._live = 0
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._last_decrease = 0.0
+        self._latency = 1.0  # EWMA of call latency, seconds (for Retry-After estimates)
+        self.admitted = 0
+        self.rejected = 0
+        self.retries = 0
+        self.throttled = 0
+
+    @property
+    def queued(self) -> int:
+        return self._live
+
+    @property
+    def saturated(self) -> bool:
+        return self._live >= self.cfg.max_queue
+
+    def retry_after(self) -> float:
+        """Rough time for the current queue to drain."""
+        return max(1.0, math.ceil(self._live / max(self.limit, 1.0) * self._latency))
+
+    async def run(self, tokens: int, priority: int, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            await self._acquire(tokens, priority)
+            started = time.monotonic()
+            try:
+                result = await call()
+            except Exception as e:
+                self._release()
+                if not is_retryable(e) or attempt >= self.cfg.max_retries:
+                    raise
+                self._on_overload(started)
+                attempt += 1
+                self.retries += 1
+                backoff = min(self.cfg.max_backoff, self.cfg.base_backoff * (2 ** (attempt - 1)))
+                await asyncio.sleep(random.uniform(0, backoff))
+                continue
+            except BaseException:
+                self._release()
+                raise
+            self._latency += 0.2 * ((time.monotonic() - started) - self._latency)
+            self._release()
+            self._on_success()
+            return result
+
+    async def _acquire(self, tokens: int, priority: int) -> None:
+        if self.saturated:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        # priority - aging * waited orders the same as priority + aging * enqueued (every waiter
+        # ages at the same rate), so the key can be fixed at push time
+        key = priority + self.cfg.priority_aging * time.monotonic()
+        heapq.heappush(self._waiting, (key, next(self._seq), tokens, future))
+        self._live += 1
+        self._pump()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as we were cancelled: give the slot back
+                self._release()
+            else:
+                self._live -= 1
+                if len(self._waiting) > 2 * self._live + 16:
+                    # Mostly cancelled entries: drop them instead of waiting for them to reach the top
+                    self._waiting = [entry for entry in self._waiting if not entry[3].done()]
+                    heapq.heapify(self._waiting)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._pump()
+
+    def _pump(self) -> None:
+        while self._waiting and self.in_flight < int(self.limit):
+            _, _, tokens, future = self._waiting[0]
+            if future.done():
+                heapq.heappop(self._waiting)
+                continue
+            wait = max(
+                self._rpm.delay(1) if self._rpm else 0.0,
+                self._tpm.delay(tokens) if self._tpm else 0.0,
+            )
+            if wait > 0:
+                if self._timer is None:
+                    self.throttled += 1
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._wake)
+                return
+            heapq.heappop(self._waiting)
+            self._live -= 1
+            if self._rpm:
+                self._rpm.take(1)
+            if self._tpm:
+                self._tpm.take(tokens)
+            self.in_flight += 1
+            self.admitted += 1
+            future.set_result(None)
+
+    def _wake(self) -> None:
+        self._timer = None
+        self._pump()
+
+    def _on_success(self) -> None:
+        # Additive increase: +1 per `limit` successes
+        self.limit = min(float(self.cfg.max_concurrency), self.limit + 1.0 / max(self.limit, 1.0))
+        self._pump()
+
+    def _on_overload(self, started: float) -> None:
+        # Multiplicative decrease, only for calls admitted after the last decrease so one burst counts once
+        if started >= self._last_decrease:
+            self.limit = max(float(self.cfg.min_concurrency), self.limit / 2)
+            self._last_decrease = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self._live,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class ReviewCacheConfig:
+    max_entries: int = 1024
+    # On-disk tier is disabled unless a directory is configured.
+    disk_dir: Optional[str] = None
+    disk_max_bytes: int = 256 * 1024 * 1024
+
+
+def content_key(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalize_patch(patch: Optional[str]) -> str:
+    """Strip differences that don't change the review (line endings, trailing whitespace)."""
+    if not patch:
+        return ""
+    lines = patch.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+class DiskCache:
+    """One JSON file per key, sharded by prefix; evicts least recently used files by mtime."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p in self._files())
+
+    def _files(self):
+        for shard in os.scandir(self.directory):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith(".json"):
+                        yield entry.path
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fh:
+                value = json.loads(fh.read())
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        path = self._path(key)
+        data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        try:
+            previous = os.path.getsize(path)
+        except OSError:
+            previous = 0
+        os.replace(tmp, path)
+        with self._lock:
+            self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        # Trim to 90% of the budget so eviction scans are amortized over many writes.
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self._files():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        size = sum(e[1] for e in entries)
+        for _, file_size, path in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(path)
+                size -= file_size
+            except OSError:
+                continue
+        self._size = size
+
+
+class ReviewCache:
+    """Two-tier (in-memory LRU + optional disk) cache of model results keyed by content hash."""
+
+    def __init__(self, cfg: ReviewCacheConfig):
+        self.cfg = cfg
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.disk = DiskCache(cfg.disk_dir, cfg.disk_max_bytes) if cfg.disk_dir else None
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.model_calls_saved = 0
+        self.tokens_saved = 0
+        self.hunks_reviewed = 0
+        self.hunks_reused = 0
+
+    async def get(self, key: str, track: bool = True) -> Optional[Dict[str, Any]]:
+        """Look up a result; track=False keeps bookkeeping lookups out of the hit-rate metrics."""
+        value = self._memory.get(key)
+        if value is not None:
+            self._memory.move_to_end(key)
+            self.hits_memory += track
+            return value
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.hits_disk += track
+                self._remember(key, value)
+                return value
+        self.misses += track
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._remember(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, value)
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.cfg.max_entries:
+            self._memory.popitem(last=False)
+
+    def record_savings(self, model_calls: int, tokens: int) -> None:
+        self.model_calls_saved += model_calls
+        self.tokens_saved += tokens
+
+    def record_hunks(self, reviewed: int, reused: int) -> None:
+        self.hunks_reviewed += reviewed
+        self.hunks_reused += reused
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_memory + self.hits_disk
+        lookups = hits + self.misses
+        return {
+            "entries_memory": len(self._memory),
+            "disk_bytes": self.disk._size if self.disk is not None else None,
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "model_calls_saved": self.model_calls_saved,
+            "estimated_tokens_saved": self.tokens_saved,
+            "hunks_reviewed": self.hunks_reviewed,
+            "hunks_reused": self.hunks_reused,
+        }
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..schemas import ChangedFile, InlineComment
+
+# Rough chars-per-token ratio for code/diff text; good enough for budgeting.
+CHARS_PER_TOKEN = 4
+# Per-file prompt overhead (file header + code fences).
+FILE_OVERHEAD_TOKENS = 16
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def file_tokens(f: ChangedFile) -> int:
+    return estimate_tokens(f.patch) + estimate_tokens(f.path) + FILE_OVERHEAD_TOKENS
+
+
+@dataclass
+class Chunk:
+    files: List[ChangedFile] = field(default_factory=list)
+    tokens: int = 0
+
+
+def split_patch(f: ChangedFile, max_tokens: int) -> List[ChangedFile]:
+    """Split an oversized file patch on hunk boundaries into pieces under max_tokens."""
+    if not f.patch or file_tokens(f) <= max_tokens:
+        return [f]
+    hunks: List[List[str]] = []
+    for line in f.patch.splitlines(keepends=True):
+        if line.startswith("@@") or not hunks:
+            hunks.append([])
+        hunks[-1].append(line)
+
+    pieces: List[ChangedFile] = []
+    current: List[str] = []
+    current_tokens = 0
+    budget = max_tokens - FILE_OVERHEAD_TOKENS - estimate_tokens(f.path)
+    for hunk in hunks:
+        text = "".join(hunk)
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > budget:
+            pieces.append(f.model_copy(update={"patch": "".join(current)}))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        pieces.append(f.model_copy(update={"patch": "".join(current)}))
+    return pieces
+
+
+def plan_chunks(files: Iterable[ChangedFile], max_tokens: int) -> List[Chunk]:
+    """Group files into chunks of at most max_tokens (first-fit decreasing).
+
+    Files larger than the budget are split by hunk; a single hunk larger than the
+    budget gets a chunk of its own. Files keep their original order inside a chunk.
+    """
+    pieces: List[Tuple[int, ChangedFile, int]] = []
+    for f in files:
+        for piece in split_patch(f, max_tokens):
+            pieces.append((len(pieces), piece, file_tokens(piece)))
+
+    chunks: List[Chunk] = []
+    members: List[List[Tuple[int, ChangedFile]]] = []
+    for order, piece, tokens in sorted(pieces, key=lambda p: p[2], reverse=True):
+        for i, chunk in enumerate(chunks):
+            if chunk.tokens + tokens <= max_tokens:
+                break
+        else:
+            chunks.append(Chunk())
+            members.append([])
+            i = len(chunks) - 1
+        chunks[i].tokens += tokens
+        members[i].append((order, piece))
+
+    ordered = []
+    for chunk, entries in zip(chunks, members):
+        entries.sort(key=lambda e: e[0])
+        chunk.files = [piece for _, piece in entries]
+        ordered.append((entries[0][0], chunk))
+    return [chunk for _, chunk in sorted(ordered, key=lambda o: o[0])]
+
+
+def merge_comments(groups: Iterable[List[InlineComment]], path_order: Dict[str, int]) -> List[InlineComment]:
+    """Concatenate per-chunk comments, dropping duplicates and ordering by file then line."""
+    seen = set()
+    merged: List[InlineComment] = []
+    for comments in groups:
+        for c in comments:
+            key = (c.path, c.line, " ".join(c.comment.lower().split()))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(c)
+    merged.sort(key=lambda c: (path_order.get(c.path, len(path_order)), c.line if c.line is not None else -1))
+    return merged
+
+
+def merge_suggestions(groups: Iterable[List[str]]) -> List[str]:
+    seen = set()
+    merged: List[str] = []
+    for suggestions in groups:
+        for s in suggestions:
+            key = " ".join(s.lower().split())
+            if key not in seen:
+                seen.add(key)
+                merged.append(s)
+    return merged
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    header: str
+    lines: List[str] = field(default_factory=list)
+
+    @property
+    def new_end(self) -> int:
+        """Last new-file line covered by this hunk (new_start - 1 for pure deletions)."""
+        return self.new_start + self.new_count - 1
+
+    def contains_new_line(self, line: int) -> bool:
+        return self.new_start <= line <= self.new_end
+
+    def content_key(self) -> str:
+        """Identity of the hunk body, independent of where it sits in the file."""
+        return hashlib.sha256("\n".join(self.lines).encode("utf-8")).hexdigest()[:32]
+
+    def text(self) -> str:
+        return "\n".join([self.header, *self.lines])
+
+
+@dataclass
+class DiffIndex:
+    """Line lookups for one file's diff, built in the same pass that parses its hunks.
+
+    Holds sorted integer arrays only (not the patch text), so lookups bisect in
+    O(log n) and an index stays small next to the diff it was built from. Positions
+    follow GitHub's review comment `position`: lines below the first @@ header count
+    from 1, and later headers take a position of their own.
+    """
+
+    # New-file span of each hunk (start, end inclusive; end < start for pure deletions)
+    hunk_starts: array = field(default_factory=lambda: array("i"))
+    hunk_ends: array = field(default_factory=lambda: array("i"))
+    # New-file lines shown in the diff (context and added, ascending) and their diff positions
+    lines: array = field(default_factory=lambda: array("i"))
+    positions: array = field(default_factory=lambda: array("i"))
+    # New-file lines added by the diff, ascending
+    added: array = field(default_factory=lambda: array("i"))
+
+    @classmethod
+    def from_patch(cls, patch: Optional[str]) -> "DiffIndex":
+        return index_patch(patch)[1]
+
+    def position(self, line: int) -> Optional[int]:
+        i = bisect_left(self.lines, line)
+        if i < len(self.lines) and self.lines[i] == line:
+            return self.positions[i]
+        return None
+
+    def contains(self, line: int) -> bool:
+        return self.position(line) is not None
+
+    def hunk_at(self, line: int) -> Optional[int]:
+        """Index of the hunk whose new-file span holds `line`, or None."""
+        i = bisect_right(self.hunk_starts, line) - 1
+        if i >= 0 and line <= self.hunk_ends[i]:
+            return i
+        return None
+
+    def nearest_added(self, line: int, max_distance: int) -> Optional[int]:
+        """The added line closest to `line` (the earlier one on a tie), if within max_distance."""
+        i = bisect_left(self.added, line)
+        best: Optional[int] = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self.added) and abs(self.added[j] - line) <= max_distance:
+                if best is None or abs(self.added[j] - line) < abs(best - line):
+                    best = self.added[j]
+        return best
+
+    def anchor(self, line: int, max_distance: int) -> Optional[int]:
+        """`line` if the diff shows it, else the nearest added line within max_distance, else None."""
+        if self.contains(line):
+            return line
+        return self.nearest_added(line, max_distance)
+
+
+def _parse(patch: Optional[str], index: Optional[DiffIndex]) -> List[Hunk]:
+    hunks: List[Hunk] = []
+    if not patch:
+        return hunks
+    current: Optional[Hunk] = None
+    position = -1
+    new_line = 0
+    for line in patch.splitlines():
+        m = HUNK_HEADER_RE.match(line)
+        if m:
+            old_start, old_count, new_start, new_count = m.groups()
+            current = Hunk(
+                old_start=int(old_start),
+                old_count=int(old_count) if old_count is not None else 1,
+                new_start=int(new_start),
+                new_count=int(new_count) if new_count is not None else 1,
+                header=line,
+            )
+            hunks.append(current)
+            position += 1
+            new_line = current.new_start
+            if index is not None:
+                index.hunk_starts.append(current.new_start)
+                index.hunk_ends.append(current.new_end)
+        elif current is not None:
+            position += 1
+            if line.startswith("\\"):
+                # "\ No newline at end of file"
+                continue
+            current.lines.append(line.rstrip())
+            if line[:1] == "-":
+                continue
+            if index is not None:
+                index.lines.append(new_line)
+                index.positions.append(position)
+                if line[:1] == "+":
+                    index.added.append(new_line)
+            new_line += 1
+    return hunks
+
+
+def parse_hunks(patch: Optional[str]) -> List[Hunk]:
+    """Parse the hunks of a single-file unified diff; file headers before the first @@ are skipped."""
+    return _parse(patch, None)
+
+
+def index_patch(patch: Optional[str]) -> Tuple[List[Hunk], DiffIndex]:
+    """parse_hunks() and the patch's DiffIndex from a single pass."""
+    index = DiffIndex()
+    return _parse(patch, index), index
+
+
+def trim_context(hunk: Hunk, context: int) -> List[Hunk]:
+    """Keep at most `context` unchanged lines around changes; long unchanged runs split the hunk."""
+    n = len(hunk.lines)
+    changed = [i for i, line in enumerate(hunk.lines) if line[:1] in ("+", "-")]
+    if not changed:
+        return []
+    keep = [False] * n
+    for i in changed:
+        for j in range(max(0, i - context), min(n, i + context + 1)):
+            keep[j] = True
+    if all(keep):
+        return [hunk]
+
+    section = hunk.header[hunk.header.find("@@", 2) + 2:]
+    pieces: List[Hunk] = []
+    old_line, new_line = hunk.old_start, hunk.new_start
+    current: Optional[Hunk] = None
+    for i, line in enumerate(hunk.lines):
+        tag = line[:1]
+        if keep[i]:
+            if current is None:
+                current = Hunk(old_start=old_line, old_count=0, new_start=new_line, new_count=0, header="")
+                pieces.append(current)
+            current.lines.append(line)
+            if tag != "+":
+                current.old_count += 1
+            if tag != "-":
+                current.new_count += 1
+        else:
+            current = None
+        if tag != "+":
+            old_line += 1
+        if tag != "-":
+            new_line += 1
+
+    for index, piece in enumerate(pieces):
+        # Unified diff convention: an empty side starts at the line before the change
+        if piece.old_count == 0:
+            piece.old_start -= 1
+        if piece.new_count == 0:
+            piece.new_start -= 1
+        piece.header = (
+            f"@@ -{piece.old_start},{piece.old_count} +{piece.new_start},{piece.new_count} @@"
+            + (section if index == 0 else "")
+        )
+    return pieces
@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+import re
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Union
+
+from .. import metrics
+from .admission import AdmissionConfig, AdmissionController, AdmissionRejected
+
+if TYPE_CHECKING:
+    from .router import ModelRouter
+
+# Model name of the local deterministic backend (no API calls)
+STUB_MODEL = "stub"
 
 
 @dataclass
@@ -12,20 +25,93 @@ class GeminiConfig:
     model: str = "gemini-1.5-flash"
     temperature: float = 0.2
     max_output_tokens: int = 2048
+    max_concurrency: int = 8
+    # Admission control (see admission.AdmissionConfig); 0 disables a quota
+    min_concurrency: int = 1
+    requests_per_minute: int = 0
+    tokens_per_minute: int = 0
+    max_queue: int = 200
+    priority_aging: float = 1000.0
+    max_retries: int = 3
+    # Fixed response latency of the STUB_MODEL backend
+    stub_latency_ms: float = 0.0
+
+
+# First file in a review prompt whose first hunk shows new lines: "File: path (status)" then "@@ -a,b +c,d @@"
+_MOCK_TARGET_RE = re.compile(r"^File: (.+) \(\w+\)\n```diff\n@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.M)
+
+
+def mock_response(prompt: str = "") -> Dict[str, Any]:
+    """Deterministic review returned when the SDK or API key is unavailable (local testing).
+
+    The comment lands on the first changed file of the prompt, so local runs exercise
+    comment anchoring end to end; "example.py" is only used when the prompt has no diff.
+    """
+    path, line = "example.py", 10
+    for m in _MOCK_TARGET_RE.finditer(prompt):
+        if m.group(3) != "0":
+            path, line = m.group(1), int(m.group(2))
+            break
+    return {
+        "summary": "Automated review mock: looks generally good. Consider minor cleanups.",
+        "comments": [
+            {
+                "path": path,
+                "line": line,
+                "comment": "Prefer using context manager for file operations.",
+                "severity": "suggestion",
+            }
+        ],
+        "suggestions": [
+            "Add tests for edge cases in input parsing.",
+            "Consider typing annotations for public functions.",
+        ],
+    }
+
+
+class StubModel:
+    """Local stand-in for GenerativeModel: answers mock_response() after a fixed latency."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return SimpleNamespace(text=json.dumps(mock_response(prompt)), usage_metadata=None)
 
 
 class GeminiClient:
     def __init__(self, cfg: GeminiConfig):
         self.cfg = cfg
         self._client = None
+        self._generation_config = None
+        self.admission = AdmissionController(
+            AdmissionConfig(
+                requests_per_minute=cfg.requests_per_minute,
+                tokens_per_minute=cfg.tokens_per_minute,
+                min_concurrency=max(1, cfg.min_concurrency),
+                max_concurrency=max(1, cfg.max_concurrency),
+                max_queue=cfg.max_queue,
+                priority_aging=cfg.priority_aging,
+                max_retries=cfg.max_retries,
+            )
+        )
 
+        if self.cfg.model == STUB_MODEL:
+            self._client = StubModel(self.cfg.stub_latency_ms)
         # Lazy import to avoid hard failure if package isn't installed yet.
-        if self.cfg.api_key:
+        elif self.cfg.api_key:
             try:
                 import google.generativeai as genai  # type: ignore
 
                 genai.configure(api_key=self.cfg.api_key)
                 self._client = genai.GenerativeModel(self.cfg.model)
+                self._generation_config = genai.GenerationConfig(
+                    temperature=self.cfg.temperature,
+                    max_output_tokens=self.cfg.max_output_tokens,
+                    response_mime_type="application/json",
+                )
             except Exception:
                 # Keep _client None; we'll mock responses.
                 self._client = None
@@ -33,52 +119,70 @@ class GeminiClient:
     def is_mock(self) -> bool:
         return self._client is None
 
-    def generate_json(self, system_prompt: str, user_prompt: str) -> Dict[str, Any]:
-        """Generate a JSON object response. If SDK unavailable, return mock."""
+    async def generate_json(
+        self, system_prompt: str, user_prompt: Union[str, Sequence[str]], priority: int = 0
+    ) -> Dict[str, Any]:
+        """Generate a JSON object response. If SDK unavailable, return mock.
+
+        `user_prompt` may be a list of pieces, joined once into the final prompt.
+        Calls go through the admission controller (lower priority first) and use the
+        SDK's async API. Raises AdmissionRejected when the call queue is saturated.
+        """
+        user_parts = [user_prompt] if isinstance(user_prompt, str) else user_prompt
+        prompt = "".join(["<SYSTEM>\n", system_prompt, "\n</SYSTEM>\n\n<USER>\n", *user_parts, "\n</USER>"])
         if self._client is None:
-            # Provide a deterministic mock helpful for local testing
-            return {
-                "summary": "Automated review mock: looks generally good. Consider minor cleanups.",
-                "comments": [
-                    {
-                        "path": "example.py",
-                        "line": 10,
-                        "comment": "Prefer using context manager for file operations.",
-                        "severity": "suggestion",
-                    }
-                ],
-                "suggestions": [
-                    "Add tests for edge cases in input parsing.",
-                    "Consider typing annotations for public functions.",
-                ],
-            }
+            return mock_response(prompt)
+        # Quota cost: prompt estimate (~4 chars/token) plus the output allowance
+        tokens = len(prompt) // 4 + self.cfg.max_output_tokens
 
-        import google.generativeai as genai  # type: ignore
+        async def call() -> Any:
+            # Timed per attempt, so retried 429s show up under their own status
+            started = time.perf_counter()
+            try:
+                response = await self._client.generate_content_async(
+                    prompt,
+                    generation_config=self._generation_config,
+                )
+            except Exception as e:
+                metrics.observe_model_call(self.cfg.model, started, e)
+                raise
+            metrics.observe_model_call(self.cfg.model, started)
+            return response
 
-        prompt = (
-            f"<SYSTEM>\n{system_prompt}\n</SYSTEM>\n\n<USER>\n{user_prompt}\n</USER>"
-        )
         try:
-            response = self._client.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=self.cfg.temperature,
-                    max_output_tokens=self.cfg.max_output_tokens,
-                    response_mime_type="application/json",
-                ),
-            )
+            response = await self.admission.run(tokens, priority, call)
             text = response.text or "{}"
-            return json.loads(text)
+            data = json.loads(text)
+            data["tokens_used"] = self._record_usage(response, prompt, text)
+            return data
+        except AdmissionRejected:
+            raise
         except Exception as e:
             # Last-resort fallback
             return {
                 "summary": f"Model call failed: {e}",
                 "comments": [],
                 "suggestions": [],
+                # Marks the result as a failure so callers don't cache it
+                "error": str(e),
             }
 
+    def _record_usage(self, response: Any, prompt: str, text: str) -> int:
+        """Token usage from the response metadata, or a ~4 chars/token estimate without it."""
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        response_tokens = getattr(usage, "candidates_token_count", None)
+        if not isinstance(prompt_tokens, int):
+            prompt_tokens = len(prompt) // 4
+        if not isinstance(response_tokens, int):
+            response_tokens = len(text) // 4
+        metrics.record_tokens(self.cfg.model, prompt_tokens, response_tokens)
+        total = getattr(usage, "total_token_count", None)
+        return total if isinstance(total, int) and total else prompt_tokens + response_tokens
+
 
-def build_gemini_from_env(api_key: Optional[str] = None, **overrides: Any) -> GeminiClient:
+def build_gemini_from_env(api_key: Optional[str] = None, **overrides: Any) -> Union[GeminiClient, "ModelRouter"]:
+    """One GeminiClient, or a ModelRouter over several backends when GEMINI_BACKENDS is set."""
     key = api_key or os.getenv("GEMINI_API_KEY", "")
     cfg = GeminiConfig(
         api_key=key,
@@ -90,6 +194,23 @@ def build_gemini_from_env(api_key: Optional[str] = None, **overrides: Any) -> Ge
                 os.getenv("GEMINI_MAX_OUTPUT_TOKENS", 2048),
             )
         ),
+        max_concurrency=int(
+            overrides.get("max_concurrency", os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+        ),
+        min_concurrency=int(os.getenv("GEMINI_MIN_CONCURRENCY", 1)),
+        requests_per_minute=int(os.getenv("GEMINI_RPM", 0)),
+        tokens_per_minute=int(os.getenv("GEMINI_TPM", 0)),
+        max_queue=int(os.getenv("GEMINI_QUEUE_LIMIT", 200)),
+        priority_aging=float(os.getenv("GEMINI_PRIORITY_AGING", 1000)),
+        max_retries=int(os.getenv("GEMINI_MAX_RETRIES", 3)),
+        stub_latency_ms=float(os.getenv("GEMINI_STUB_LATENCY_MS", 0)),
     )
-    return GeminiClient(cfg)
+    backends = overrides.get("backends", os.getenv("GEMINI_BACKENDS", ""))
+    if not backends:
+        return GeminiClient(cfg)
+
+    from .router import ModelRouter, parse_backends
+
+    hedge_p95_ms = float(overrides.get("hedge_p95_ms", os.getenv("GEMINI_HEDGE_P95_MS", 20000)))
+    return ModelRouter.from_specs(cfg, parse_backends(backends), hedge_p95=hedge_p95_ms / 1000)
 
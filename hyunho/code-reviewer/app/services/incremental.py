@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence
+
+from ..schemas import ChangedFile
+from .chunking import estimate_tokens
+from .diff import parse_hunks
+
+
+@dataclass
+class IncrementalPlan:
+    # Files (or reduced files holding only their new hunks) that still need a model review
+    pending: List[ChangedFile] = field(default_factory=list)
+    # Earlier comments on unchanged hunks, with lines remapped to the new diff
+    carried: List[Dict[str, Any]] = field(default_factory=list)
+    hunks_reviewed: int = 0
+    hunks_reused: int = 0
+    tokens_saved: int = 0
+
+
+def file_state(f: ChangedFile, comments: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """What is remembered about a reviewed file: its hunks (position + content hash) and comments."""
+    return {
+        "hunks": [[h.new_start, h.new_count, h.content_key()] for h in parse_hunks(f.patch)],
+        "comments": list(comments),
+    }
+
+
+def plan_incremental(previous: Dict[str, Dict[str, Any]], files: Sequence[ChangedFile]) -> IncrementalPlan:
+    """Compare files against the previously reviewed push of the same PR.
+
+    Hunks whose body is unchanged keep their earlier comments (line numbers shifted to
+    the hunk's new position); only new or modified hunks are sent to the model.
+    """
+    plan = IncrementalPlan()
+    for f in files:
+        prev = previous.get(f.path)
+        hunks = parse_hunks(f.patch)
+        if prev is None or not hunks:
+            plan.pending.append(f)
+            plan.hunks_reviewed += len(hunks)
+            continue
+
+        prev_hunks = {key: (start, count) for start, count, key in prev.get("hunks", [])}
+        changed = []
+        shifts = []  # (old_start, old_end, delta) for reused hunks
+        for h in hunks:
+            old = prev_hunks.get(h.content_key())
+            if old is None:
+                changed.append(h)
+            else:
+                shifts.append((old[0], old[0] + old[1] - 1, h.new_start - old[0]))
+                plan.tokens_saved += estimate_tokens(h.text())
+
+        shifts.sort()
+        starts = [start for start, _, _ in shifts]
+        for c in prev.get("comments", []):
+            line = c.get("line")
+            if line is None:
+                # File-level comments stay valid only while none of the file's hunks changed
+                if not changed:
+                    plan.carried.append(dict(c))
+                continue
+            i = bisect_right(starts, line) - 1
+            if i >= 0 and line <= shifts[i][1]:
+                plan.carried.append({**c, "line": line + shifts[i][2]})
+
+        plan.hunks_reused += len(shifts)
+        plan.hunks_reviewed += len(changed)
+        if changed:
+            patch = "\n".join(h.text() for h in changed) + "\n"
+            plan.pending.append(f.model_copy(update={"patch": patch}))
+    return plan
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from ..schemas import InlineComment, ReviewRequest, ReviewResponse
+from .review import ReviewService
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobQueueFullError(Exception):
+    pass
+
+
+@dataclass
+class ReviewJob:
+    id: str
+    repo: str
+    pr_number: int
+    head_sha: Optional[str]
+    request: Optional[ReviewRequest]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[ReviewResponse] = None
+    error: Optional[str] = None
+    # Progress events in order; their index is the SSE event id
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _task: Optional[asyncio.Task] = None
+    _waker: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        self.events.append({"event": event, "data": data})
+        # Swap the waker so every listener waiting on the old one wakes exactly once
+        waker, self._waker = self._waker, asyncio.Event()
+        waker.set()
+
+    def set_status(self, status: str, **data: Any) -> None:
+        self.status = status
+        if status == "running":
+            self.started_at = time.time()
+        elif status in FINISHED:
+            self.finished_at = time.time()
+            self.request = None
+        self.emit("status", {"status": status, **data})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "repo": self.repo,
+            "pr_number": self.pr_number,
+            "head_sha": self.head_sha,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result.model_dump() if self.result is not None else None,
+            "error": self.error,
+        }
+
+
+class ReviewJobManager:
+    """Bounded in-process worker pool running reviews in the background.
+
+    A newer head_sha for the same repo/PR cancels the older job, since its review
+    would be stale by the time it finished.
+    """
+
+    def __init__(self, service: ReviewService, workers: int = 4, max_queue: int = 100, max_jobs: int = 1000):
+        self.service = service
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, ReviewJob]" = OrderedDict()
+        self._latest: Dict[Tuple[str, int], str] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for job in self._jobs.values():
+            if not job.finished:
+                self.cancel(job.id, reason="shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, req: ReviewRequest) -> ReviewJob:
+        if self._queue.full():
+            raise JobQueueFullError("review queue is full")
+        job = ReviewJob(id=os.urandom(12).hex(), repo=req.repo, pr_number=req.pr_number, head_sha=req.head_sha, request=req)
+
+        key = (req.repo, req.pr_number)
+        previous = self._jobs.get(self._latest.get(key, ""))
+        if previous is not None and not previous.finished and previous.head_sha != req.head_sha:
+            self.cancel(previous.id, reason=f"superseded by {job.id}")
+        self._latest[key] = job.id
+
+        self._jobs[job.id] = job
+        self._evict()
+        job.set_status("queued")
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str, reason: str = "cancelled") -> Optional[ReviewJob]:
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job._task is not None:
+            job._task.cancel()
+        job.error = reason
+        job.set_status("cancelled", reason=reason)
+        return job
+
+    async def events(self, job: ReviewJob, after: int = -1, keepalive: float = 15.0) -> AsyncIterator[Tuple[int, Optional[Dict[str, Any]]]]:
+        """Yield (event id, event) after `after`; (id, None) is a keep-alive tick. Ends when the job finishes."""
+        index = after + 1
+        while True:
+            waker = job._waker
+            while index < len(job.events):
+                yield index, job.events[index]
+                index += 1
+            if job.finished:
+                return
+            try:
+                await asyncio.wait_for(waker.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield index - 1, None
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"queue_depth": self._queue.qsize(), "workers": self.workers, "jobs": counts}
+
+    def _evict(self) -> None:
+        while len(self._jobs) > self.max_jobs:
+            for job_id, job in self._jobs.items():
+                if job.finished:
+                    del self._jobs[job_id]
+                    key = (job.repo, job.pr_number)
+                    if self._latest.get(key) == job_id:
+                        del self._latest[key]
+                    break
+            else:
+                return
+
+    async def _worker(self) -> None:
+        while True:
+            job: ReviewJob = await self._queue.get()
+            try:
+                if job.finished:
+                    continue
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ReviewJob) -> None:
+        job.set_status("running")
+
+        def on_comments(comments: List[InlineComment], paths: List[str]) -> None:
+            if not job.finished:
+                job.emit("comments", {"paths": paths, "comments": [c.model_dump() for c in comments]})
+
+        job._task = asyncio.create_task(self.service.generate_review(job.request, on_comments=on_comments))
+        # Waiting (rather than awaiting the task) keeps a job cancellation separate from worker shutdown
+        await asyncio.wait({job._task})
+        task, job._task = job._task, None
+        if job.finished:
+            return
+        if task.cancelled():
+            job.set_status("cancelled", reason="cancelled")
+        elif task.exception() is not None:
+            job.error = str(task.exception())
+            job.set_status("failed", error=job.error)
+        else:
+            job.result = task.result()
+            job.emit("result", job.result.model_dump())
+            job.set_status("succeeded")
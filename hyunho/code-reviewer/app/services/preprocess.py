@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from fnmatch import fnmatch
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..schemas import ChangedFile, SkippedFile
+from .chunking import FILE_OVERHEAD_TOKENS, estimate_tokens, file_tokens
+from .diff import HUNK_HEADER_RE, DiffIndex, Hunk, index_patch, trim_context
+
+DEFAULT_IGNORE_GLOBS: Tuple[str, ...] = (
+    # Lockfiles
+    "*.lock", "*package-lock.json", "*pnpm-lock.yaml", "*npm-shrinkwrap.json", "*go.sum",
+    # Minified / bundled / source maps
+    "*.min.js", "*.min.css", "*.bundle.js", "*.map",
+    # Vendored and build output
+    "vendor/*", "*/vendor/*", "node_modules/*", "*/node_modules/*", "third_party/*",
+    "dist/*", "build/*",
+    # Generated code
+    "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.g.dart", "*.freezed.dart", "*.generated.*",
+    "*generatedpluginregistrant*", "*generated_plugin*",
+    # IDE / project files
+    "*.pbxproj", "*.xib", "*.storyboard", "*.xcscheme", "*.xcworkspacedata", "*/pods/*",
+    # Binary-ish assets
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.ico", "*.pdf", "*.woff", "*.woff2", "*.ttf", "*.svg",
+)
+
+GENERATED_MARKERS = (
+    "@generated", "DO NOT EDIT", "Code generated by", "GENERATED CODE", "auto-generated", "autogenerated",
+)
+# Markers only count in the first lines of the new file (a license/codegen header), not in any added line
+GENERATED_HEADER_LINES = 10
+MINIFIED_LINE_LENGTH = 1000
+# Added lines are "minified" when this share of them is over MINIFIED_LINE_LENGTH, or their average length is
+MINIFIED_LONG_SHARE = 0.5
+MINIFIED_AVERAGE_LENGTH = 300
+
+
+@dataclass
+class PreprocessConfig:
+    ignore_globs: Sequence[str] = DEFAULT_IGNORE_GLOBS
+    # Unchanged lines kept around each change (the GitHub API sends 3)
+    context_lines: int = 1
+    # Estimated prompt tokens for all diffs of one review; files past the budget are left out
+    max_prompt_tokens: int = 400_000
+    # Per-file cap; hunks past it are dropped and the file reported as truncated
+    max_file_tokens: int = 20_000
+
+
+@dataclass
+class PreprocessResult:
+    files: List[ChangedFile] = field(default_factory=list)
+    skipped: List[SkippedFile] = field(default_factory=list)
+    tokens: int = 0
+    # Files whose diff goes to the model (not a placeholder or left out); 0 means nothing to review
+    reviewable: int = 0
+    # Line index of every incoming file's original patch, for anchoring comments to the real diff
+    indexes: Dict[str, DiffIndex] = field(default_factory=dict)
+
+
+def _classify(f: ChangedFile, globs: Sequence[str]) -> Optional[str]:
+    """Return why a file's diff is not worth sending to the model, or None."""
+    path = f.path.lower()
+    for pattern in globs:
+        if fnmatch(path, pattern.lower()):
+            return f"ignored:{pattern}"
+    if f.status == "removed":
+        return "removed"
+    patch = f.patch or ""
+    if patch.lstrip().startswith("Binary files"):
+        return "binary"
+    if not patch.strip():
+        return "no-patch"
+    lines = patch.splitlines()
+    header = _file_header(lines)
+    if any(marker in line for line in header for marker in GENERATED_MARKERS):
+        return "generated"
+    added = [len(line) - 1 for line in lines if line.startswith("+") and not line.startswith("+++")]
+    if added and (
+        sum(1 for n in added if n > MINIFIED_LINE_LENGTH) >= MINIFIED_LONG_SHARE * len(added)
+        or sum(added) / len(added) > MINIFIED_AVERAGE_LENGTH
+    ):
+        return "minified"
+    return None
+
+
+def _file_header(lines: List[str]) -> List[str]:
+    """The first new-file lines shown by the diff, if its first hunk starts at the top of the file."""
+    for i, line in enumerate(lines):
+        m = HUNK_HEADER_RE.match(line)
+        if m is None:
+            continue
+        if int(m.group(3)) > 1:
+            return []
+        header: List[str] = []
+        for body in lines[i + 1:]:
+            if body.startswith("@@") or len(header) >= GENERATED_HEADER_LINES:
+                break
+            if not body.startswith(("-", "\\")):
+                header.append(body[1:])
+        return header
+    return []
+
+
+def _placeholder(f: ChangedFile, reason: str) -> ChangedFile:
+    """Keep a one-line note so the model still knows the file changed."""
+    added = removed = 0
+    for line in (f.patch or "").splitlines():
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return f.model_copy(update={"patch": f"(diff omitted: {reason}; +{added}/-{removed} lines)"})
+
+
+def _compact(f: ChangedFile, hunks: List[Hunk], cfg: PreprocessConfig) -> Tuple[ChangedFile, bool]:
+    """Trim context lines and cap the file at max_file_tokens; returns (file, truncated)."""
+    if not hunks:
+        return f, False
+    parts: List[str] = []
+    tokens = estimate_tokens(f.path) + FILE_OVERHEAD_TOKENS
+    truncated = False
+    for hunk in hunks:
+        for piece in trim_context(hunk, cfg.context_lines):
+            text = piece.text()
+            cost = estimate_tokens(text) + 1
+            if parts and tokens + cost > cfg.max_file_tokens:
+                truncated = True
+                break
+            parts.append(text)
+            tokens += cost
+        if truncated:
+            break
+    return f.model_copy(update={"patch": "\n".join(parts) + "\n"}), truncated
+
+
+def iter_preprocessed(
+    files: Iterable[ChangedFile], cfg: PreprocessConfig, result: PreprocessResult
+) -> Iterator[ChangedFile]:
+    """Stream files through filtering, compaction and the prompt budget.
+
+    Files are yielded as they pass; skipped ones and the running token total are
+    recorded on `result` so callers can report them.
+    """
+    for f in files:
+        reason = _classify(f, cfg.ignore_globs)
+        if reason is not None:
+            # Only file-level comments can apply to a file the model sees as a one-line note
+            result.indexes[f.path] = DiffIndex()
+        if reason == "no-patch":
+            pass
+        elif reason is not None:
+            result.skipped.append(SkippedFile(path=f.path, reason=reason))
+            f = _placeholder(f, reason)
+        else:
+            hunks, result.indexes[f.path] = index_patch(f.patch)
+            f, truncated = _compact(f, hunks, cfg)
+            if truncated:
+                result.skipped.append(SkippedFile(path=f.path, reason="truncated"))
+
+        tokens = file_tokens(f)
+        if result.tokens + tokens > cfg.max_prompt_tokens:
+            result.skipped.append(SkippedFile(path=f.path, reason="budget"))
+            continue
+        result.tokens += tokens
+        if reason is None:
+            result.reviewable += 1
+        yield f
+
+
+def preprocess(files: Iterable[ChangedFile], cfg: PreprocessConfig) -> PreprocessResult:
+    result = PreprocessResult()
+    result.files = list(iter_preprocessed(files, cfg, result))
+    return result
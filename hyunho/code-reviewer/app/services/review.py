@@ -1,11 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
 from dataclasses import dataclass
-from typing import Any, Dict
+from typing import Any, AsyncIterable, Callable, Dict, List, Optional, Sequence
 
-from ..schemas import ReviewRequest, ReviewResponse, InlineComment
+from .. import metrics
+from ..schemas import ChangedFile, ReviewRequest, ReviewResponse, InlineComment
+from .cache import ReviewCache, ReviewCacheConfig, content_key, normalize_patch
+from .chunking import file_tokens, merge_comments, merge_suggestions, plan_chunks
+from .diff import DiffIndex
 from .gemini import build_gemini_from_env
+from .incremental import file_state, plan_incremental
+from .preprocess import DEFAULT_IGNORE_GLOBS, PreprocessConfig, PreprocessResult, iter_preprocessed, preprocess
+
+# Bump whenever prompts change so cached results from older prompts are not reused.
+PROMPT_VERSION = "1"
+
+# Progress hook: called with each batch of comments (and the file paths it covers) as soon as it is ready
+CommentsCallback = Callable[[List[InlineComment], List[str]], None]
+
+SYSTEM_PROMPT = (
+    "You are a senior software engineer performing code reviews. "
+    "Provide concise, actionable feedback, prioritizing correctness, security, readability, and performance. "
+    "Prefer inline comments that reference specific lines and files. "
+    "Use the schema: {summary: string, comments: [{path, line?, comment, severity?}], suggestions: [string]}"
+)
 
 
 @dataclass
@@ -14,40 +35,388 @@ class ReviewServiceConfig:
     api_key: str
     temperature: float = 0.2
     max_output_tokens: int = 2048
+    max_concurrency: int = 8
+    # Map-reduce: diffs are split into chunks of at most this many (estimated) prompt tokens
+    chunk_max_tokens: int = 24000
+    chunk_concurrency: int = 4
+    # Content-addressed result cache (memory LRU + optional disk tier)
+    cache_enabled: bool = True
+    cache_entries: int = 1024
+    cache_dir: Optional[str] = None
+    cache_max_bytes: int = 256 * 1024 * 1024
+    # Re-review only hunks that changed since the last reviewed push of the same PR (needs the cache)
+    incremental: bool = True
+    # Diff pre-processing: ignorable paths, context trimming and prompt token budget
+    ignore_globs: Sequence[str] = DEFAULT_IGNORE_GLOBS
+    context_lines: int = 1
+    max_prompt_tokens: int = 400_000
+    max_file_tokens: int = 20_000
+    # Inline comments on lines outside the diff: "snap" to the nearest added line within
+    # comment_snap_lines (else drop), "drop", or "keep" as-is (without a diff position)
+    comment_anchor: str = "snap"
+    comment_snap_lines: int = 3
+    # Several model backends behind one router (see router.parse_backends); empty = `model` only
+    model_backends: str = ""
+
+
+class _Flight:
+    """One in-flight review shared by every caller that asked for the same request."""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.emitted: List[tuple[List[InlineComment], List[str]]] = []
+        self.listeners: List[CommentsCallback] = []
+
+    def publish(self, comments: List[InlineComment], paths: List[str]) -> None:
+        self.emitted.append((comments, paths))
+        for listener in list(self.listeners):
+            listener(comments, paths)
 
 
 class ReviewService:
     def __init__(self, cfg: ReviewServiceConfig):
         self.cfg = cfg
+        self._in_flight: Dict[str, _Flight] = {}
+        self.flights_started = 0
+        self.flights_joined = 0
         self.gemini = build_gemini_from_env(
             api_key=cfg.api_key,
             model=cfg.model,
             temperature=cfg.temperature,
             max_output_tokens=cfg.max_output_tokens,
+            max_concurrency=cfg.max_concurrency,
+            backends=cfg.model_backends,
+        )
+        self.cache: Optional[ReviewCache] = None
+        if cfg.cache_enabled:
+            self.cache = ReviewCache(
+                ReviewCacheConfig(
+                    max_entries=cfg.cache_entries,
+                    disk_dir=cfg.cache_dir,
+                    disk_max_bytes=cfg.cache_max_bytes,
+                )
+            )
+        self.preprocess_cfg = PreprocessConfig(
+            ignore_globs=tuple(cfg.ignore_globs),
+            context_lines=cfg.context_lines,
+            max_prompt_tokens=cfg.max_prompt_tokens,
+            max_file_tokens=cfg.max_file_tokens,
         )
 
     @classmethod
     def from_env(cls, cfg: ReviewServiceConfig) -> "ReviewService":
         return cls(cfg)
 
-    async def generate_review(self, req: ReviewRequest) -> ReviewResponse:
-        system_prompt = (
-            "You are a senior software engineer performing code reviews. "
-            "Provide concise, actionable feedback, prioritizing correctness, security, readability, and performance. "
-            "Prefer inline comments that reference specific lines and files. "
-            "Use the schema: {summary: string, comments: [{path, line?, comment, severity?}], suggestions: [string]}"
+    async def generate_review(
+        self,
+        req: ReviewRequest,
+        on_comments: Optional[CommentsCallback] = None,
+        prepared: Optional[PreprocessResult] = None,
+    ) -> ReviewResponse:
+        """Review a PR; concurrent identical requests share a single model run (single-flight).
+
+        A caller that is cancelled only stops waiting; the shared run is cancelled when its
+        last waiter goes away. Errors reach every waiter and are not remembered.
+        `prepared` means req.changed_files were already preprocessed (see review_stream).
+        """
+        key = content_key("flight", req.model_dump(), prepared is not None)
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = self._in_flight[key] = _Flight()
+            flight.task = asyncio.create_task(self._review(req, flight.publish, prepared))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.flights_started += 1
+        else:
+            self.flights_joined += 1
+
+        if on_comments is not None:
+            for comments, paths in flight.emitted:
+                on_comments(comments, paths)
+            flight.listeners.append(on_comments)
+        flight.waiters += 1
+        try:
+            response = await asyncio.shield(flight.task)
+            return response.model_copy()
+        finally:
+            flight.waiters -= 1
+            if on_comments is not None:
+                flight.listeners.remove(on_comments)
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    async def review_stream(
+        self,
+        req: ReviewRequest,
+        files: AsyncIterable[ChangedFile],
+        on_comments: Optional[CommentsCallback] = None,
+    ) -> ReviewResponse:
+        """Review a PR whose files arrive one at a time (e.g. an NDJSON upload).
+
+        Each file is filtered, compacted and counted against the prompt budget as it
+        arrives, so only the prompt-sized remainder of the diff is held however large the
+        upload is. Model calls start once the last file is in: the cache, incremental plan
+        and single-flight keys all depend on the complete file set.
+        """
+        prepared = PreprocessResult()
+        kept = list(iter_preprocessed(req.changed_files, self.preprocess_cfg, prepared))
+        async for f in files:
+            started = time.perf_counter()
+            kept.extend(iter_preprocessed((f,), self.preprocess_cfg, prepared))
+            metrics.observe_stage("preprocess", started)
+        prepared.files = kept
+        return await self.generate_review(req.model_copy(update={"changed_files": kept}), on_comments, prepared)
+
+    async def _review(
+        self,
+        req: ReviewRequest,
+        on_comments: Optional[CommentsCallback] = None,
+        prepared: Optional[PreprocessResult] = None,
+    ) -> ReviewResponse:
+        started = time.perf_counter()
+        if prepared is None:
+            prepared = preprocess(req.changed_files, self.preprocess_cfg)
+            metrics.observe_stage("preprocess", started)
+        indexes = prepared.indexes
+        if not prepared.reviewable:
+            # Every file was filtered out (ignored, removed, generated, ...): nothing worth a model call
+            return self._build_response(
+                summary="No reviewable changes: every changed file was skipped (see skipped_files).",
+                comments=[],
+                suggestions=[],
+                tokens_used=0,
+            ).model_copy(update={"skipped_files": prepared.skipped})
+        publish = on_comments
+        if on_comments is not None:
+            def publish(comments: List[InlineComment], paths: List[str]) -> None:
+                on_comments(self._anchor_comments(comments, indexes, record=False), paths)
+
+        response = await self._generate(req.model_copy(update={"changed_files": prepared.files}), publish)
+        metrics.REVIEW_SECONDS.observe(time.perf_counter() - started)
+        return response.model_copy(update={
+            "comments": self._anchor_comments(response.comments, indexes),
+            "skipped_files": prepared.skipped,
+        })
+
+    def _anchor_comments(
+        self, comments: List[InlineComment], indexes: Dict[str, DiffIndex], record: bool = True
+    ) -> List[InlineComment]:
+        """Pin comments to lines the PR diff actually shows, and fill in their diff position.
+
+        Comments on files outside the PR are dropped; file-level comments (no line) are kept.
+        """
+        mode = self.cfg.comment_anchor
+        anchored: List[InlineComment] = []
+        seen = set()
+        for c in comments:
+            index = indexes.get(c.path)
+            line = c.line
+            if index is not None and (line is None or index.contains(line)):
+                result = "kept"
+            elif (
+                index is not None
+                and mode == "snap"
+                and (snapped := index.nearest_added(line, self.cfg.comment_snap_lines)) is not None
+            ):
+                line, result = snapped, "snapped"
+            else:
+                result = "unanchored" if mode == "keep" else "dropped"
+            if record:
+                metrics.REVIEW_COMMENTS.labels(result).inc()
+            if result == "dropped":
+                continue
+            position = index.position(line) if index is not None and line is not None else None
+            c = c.model_copy(update={"line": line, "position": position})
+            # Snapping can land two copies of one comment on the same line
+            key = (c.path, c.line, c.comment)
+            if key not in seen:
+                seen.add(key)
+                anchored.append(c)
+        return anchored
+
+    async def _generate(self, req: ReviewRequest, on_comments: Optional[CommentsCallback] = None) -> ReviewResponse:
+        if self.cache is None:
+            results = await self._review_chunks(req, req.changed_files, on_comments)
+            return self._reduce(req, [data for _, data in results])
+
+        # Whole-PR hit: identical prompt inputs were reviewed before
+        file_keys = [self._file_key(f) for f in req.changed_files]
+        pr_key = content_key("pr", self._model_key(), req.repo, req.title, req.description, req.author, file_keys)
+        cached = await self.cache.get(pr_key)
+        if cached is not None:
+            self.cache.record_savings(1, sum(file_tokens(f) for f in req.changed_files))
+            # No model tokens were spent on this response
+            response = ReviewResponse.model_validate(cached).model_copy(update={"tokens_used": 0})
+            if on_comments is not None:
+                on_comments(response.comments, [f.path for f in req.changed_files])
+            return response
+
+        # Per-file hits: only files whose normalized patch is new go to the model
+        parts: List[Dict[str, Any]] = []
+        pending: List[ChangedFile] = []
+        pending_keys: Dict[str, str] = {}
+        for f, key in zip(req.changed_files, file_keys):
+            entry = await self.cache.get(key)
+            if entry is not None:
+                parts.append(entry)
+                self.cache.record_savings(0, file_tokens(f))
+            else:
+                pending.append(f)
+                pending_keys[f.path] = key
+
+        # Incremental: compared with the last reviewed push of this PR, only new/modified hunks go to the model
+        state_key = content_key("pr-state", req.repo, req.pr_number)
+        carried: List[Dict[str, Any]] = []
+        if self.cfg.incremental and pending:
+            previous = await self.cache.get(state_key, track=False)
+            if previous is not None:
+                plan = plan_incremental(previous.get("files", {}), pending)
+                pending, carried = plan.pending, plan.carried
+                self.cache.record_hunks(plan.hunks_reviewed, plan.hunks_reused)
+                self.cache.record_savings(0, plan.tokens_saved)
+                if carried or not pending:
+                    parts.append({
+                        "summary": "" if pending else str(previous.get("summary", "")),
+                        "comments": carried,
+                        "suggestions": [],
+                    })
+
+        if on_comments is not None and parts:
+            pending_paths = {f.path for f in pending}
+            on_comments(
+                [c for part in parts for c in self._parse_comments(part)],
+                [f.path for f in req.changed_files if f.path not in pending_paths],
+            )
+        if not pending and req.changed_files:
+            self.cache.record_savings(1, 0)
+        results = await self._review_chunks(req, pending, on_comments) if pending or not req.changed_files else []
+        failed_paths = set()
+        for files, data in results:
+            if data.get("error"):
+                failed_paths.update(f.path for f in files)
+        for path, key in pending_keys.items():
+            if path in failed_paths:
+                continue
+            # A file's entry holds its own comments plus the context of the chunk(s) it was reviewed in
+            chunk_data = [data for files, data in results if any(f.path == path for f in files)]
+            await self.cache.put(key, {
+                "summary": "\n\n".join(str(d.get("summary", "")).strip() for d in chunk_data).strip(),
+                "comments": [
+                    c
+                    for c in carried + [c for d in chunk_data for c in d.get("comments", []) or []]
+                    if str(c.get("path", "")) == path
+                ],
+                "suggestions": [s for d in chunk_data for s in d.get("suggestions", []) or []],
+            })
+
+        response = self._reduce(req, parts + [data for _, data in results])
+        if not failed_paths:
+            await self.cache.put(pr_key, response.model_dump())
+            if self.cfg.incremental:
+                by_path: Dict[str, List[Dict[str, Any]]] = {}
+                for c in response.comments:
+                    by_path.setdefault(c.path, []).append(c.model_dump())
+                await self.cache.put(state_key, {
+                    "head_sha": req.head_sha,
+                    "summary": response.summary,
+                    "files": {f.path: file_state(f, by_path.get(f.path, [])) for f in req.changed_files},
+                })
+        return response
+
+    async def _review_chunks(
+        self,
+        req: ReviewRequest,
+        files: Sequence[ChangedFile],
+        on_comments: Optional[CommentsCallback] = None,
+    ) -> List[tuple[List[ChangedFile], Dict[str, Any]]]:
+        """Map step: review token-budgeted chunks of files concurrently."""
+        chunks = plan_chunks(files, self.cfg.chunk_max_tokens)
+        if len(chunks) <= 1:
+            data = await self._review_files(req, files)
+            self._notify(on_comments, files, data)
+            return [(list(files), data)]
+
+        semaphore = asyncio.Semaphore(max(1, self.cfg.chunk_concurrency))
+
+        async def review_chunk(index: int, chunk_files: List[ChangedFile]) -> Dict[str, Any]:
+            async with semaphore:
+                data = await self._review_files(req, chunk_files, part=(index + 1, len(chunks)))
+            self._notify(on_comments, chunk_files, data)
+            return data
+
+        tasks = [asyncio.create_task(review_chunk(i, c.files)) for i, c in enumerate(chunks)]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # e.g. AdmissionRejected for one chunk: don't leave the rest running
+            for task in tasks:
+                task.cancel()
+            raise
+        return [(c.files, data) for c, data in zip(chunks, results)]
+
+    def _notify(
+        self, on_comments: Optional[CommentsCallback], files: Sequence[ChangedFile], data: Dict[str, Any]
+    ) -> None:
+        if on_comments is not None and not data.get("error"):
+            on_comments(self._parse_comments(data), list(dict.fromkeys(f.path for f in files)))
+
+    def _reduce(self, req: ReviewRequest, results: List[Dict[str, Any]]) -> ReviewResponse:
+        """Reduce step: merge per-chunk (or cached per-file) results into one response."""
+        # Only results from model calls made for this response carry token usage
+        tokens_used = sum(int(r.get("tokens_used") or 0) for r in results)
+        # With a model router, chunks may be answered by different models
+        model = ",".join(dict.fromkeys(str(r["model"]) for r in results if r.get("model"))) or None
+        if len(results) == 1:
+            data = results[0]
+            return self._build_response(
+                summary=str(data.get("summary", "")),
+                comments=self._parse_comments(data),
+                suggestions=self._parse_suggestions(data),
+                tokens_used=tokens_used,
+                model=model,
+            )
+        started = time.perf_counter()
+        path_order = {f.path: i for i, f in enumerate(req.changed_files)}
+        summaries = merge_suggestions([str(r.get("summary", "")).strip()] for r in results)
+        response = self._build_response(
+            summary="\n\n".join(s for s in summaries if s),
+            comments=merge_comments((self._parse_comments(r) for r in results), path_order),
+            suggestions=merge_suggestions(self._parse_suggestions(r) for r in results),
+            tokens_used=tokens_used,
+            model=model,
         )
+        metrics.observe_stage("reduce", started)
+        return response
 
-        user_prompt = self._build_user_prompt(req)
-        data = self.gemini.generate_json(system_prompt=system_prompt, user_prompt=user_prompt)
+    def _model_key(self) -> tuple:
+        key = (self.cfg.model, self.cfg.temperature, self.cfg.max_output_tokens, PROMPT_VERSION)
+        return key + (self.cfg.model_backends,) if self.cfg.model_backends else key
 
-        # Normalize model output
-        summary = str(data.get("summary", ""))
-        comments_raw = data.get("comments", []) or []
-        suggestions_raw = data.get("suggestions", []) or []
+    def _file_key(self, f: ChangedFile) -> str:
+        return content_key("file", self._model_key(), f.path, f.status, normalize_patch(f.patch))
 
+    async def _review_files(
+        self,
+        req: ReviewRequest,
+        files: Sequence[ChangedFile],
+        part: Optional[tuple[int, int]] = None,
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        user_prompt = self._build_user_prompt(req, files, part)
+        metrics.observe_stage("prompt", started)
+        # Smaller PRs are admitted first when model calls queue up
+        priority = sum(file_tokens(f) for f in req.changed_files)
+        return await self.gemini.generate_json(system_prompt=SYSTEM_PROMPT, user_prompt=user_prompt, priority=priority)
+
+    def _parse_comments(self, data: Dict[str, Any]) -> List[InlineComment]:
+        # Normalize model output
         comments = []
-        for c in comments_raw:
+        for c in data.get("comments", []) or []:
             try:
                 comments.append(
                     InlineComment(
@@ -60,19 +429,41 @@ class ReviewService:
             except Exception:
                 # Skip malformed entries
                 continue
+        return comments
 
-        suggestions = [str(s) for s in suggestions_raw if str(s).strip()]
+    def _parse_suggestions(self, data: Dict[str, Any]) -> List[str]:
+        return [str(s) for s in data.get("suggestions", []) or [] if str(s).strip()]
 
+    def _build_response(
+        self,
+        summary: str,
+        comments: List[InlineComment],
+        suggestions: List[str],
+        tokens_used: Optional[int] = None,
+        model: Optional[str] = None,
+    ) -> ReviewResponse:
         return ReviewResponse(
             summary=summary or "No summary provided.",
             comments=comments,
             suggestions=suggestions,
-            model=self.cfg.model,
-            tokens_used=None,
+            model=model or self.cfg.model,
+            tokens_used=tokens_used,
         )
 
-    def _build_user_prompt(self, req: ReviewRequest) -> str:
-        header = (
+    def _build_user_prompt(
+        self,
+        req: ReviewRequest,
+        files: Optional[Sequence[ChangedFile]] = None,
+        part: Optional[tuple[int, int]] = None,
+    ) -> List[str]:
+        """The user prompt as a list of pieces, joined once into the final prompt."""
+        parts: List[str] = []
+        if part is not None:
+            parts.append(
+                f"Note: this PR is reviewed in {part[1]} parts; this is part {part[0]}. "
+                "Only review the files shown here.\n\n"
+            )
+        parts.append(
             f"Repository: {req.repo}\n"
             f"PR: #{req.pr_number}\n"
             f"Title: {req.title}\n"
@@ -83,26 +474,16 @@ class ReviewService:
             "Changed Files (diffs below):\n"
         )
 
-        diffs = []
-        for f in req.changed_files:
-            patch = f.patch or ""
-            diffs.append(
-                "\n".join(
-                    [
-                        f"---\nFile: {f.path} ({f.status})",
-                        "```diff",
-                        patch.strip() if patch else "(no patch provided)",
-                        "```",
-                    ]
-                )
-            )
-
-        prompt = header + "\n\n".join(diffs)
+        for index, f in enumerate(req.changed_files if files is None else files):
+            if index:
+                parts.append("\n\n")
+            parts.append(f"---\nFile: {f.path} ({f.status})\n```diff\n")
+            parts.append(f.patch.strip() if f.patch else "(no patch provided)")
+            parts.append("\n```")
 
         # Guide the model to return the desired JSON structure
-        schema_hint = (
+        parts.append(
             "\n\nReturn ONLY JSON with keys: summary, comments, suggestions. "
             "Example: {\"summary\": \"...\", \"comments\": [{\"path\": \"a.py\", \"line\": 12, \"comment\": \"...\", \"severity\": \"suggestion\"}], \"suggestions\": [\"...\"]}"
         )
-        return prompt + schema_hint
-
+        return parts
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from .. import metrics
+from .admission import AdmissionController, AdmissionRejected
+from .gemini import STUB_MODEL, GeminiClient, GeminiConfig
+
+
+@dataclass
+class BackendSpec:
+    name: str
+    model: str
+    # Largest PR (estimated diff tokens) this backend is picked for; 0 = any size
+    max_pr_tokens: int = 0
+
+
+def parse_backends(spec: str) -> List[BackendSpec]:
+    """Parse `[name=]model[<=max_pr_tokens]` entries, comma-separated, in order of preference.
+
+    e.g. "fast=gemini-1.5-flash-8b<=8000,gemini-1.5-flash"
+    """
+    backends: List[BackendSpec] = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        head, _, limit = entry.partition("<=")
+        name, has_name, model = head.partition("=")
+        if not has_name:
+            name, model = "", name
+        model = model.strip()
+        if not model:
+            raise ValueError(f"Invalid model backend entry: {entry!r}")
+        backends.append(BackendSpec(name=name.strip() or model, model=model, max_pr_tokens=int(limit or 0)))
+    names = [b.name for b in backends]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate model backend names: {spec!r}")
+    return backends
+
+
+class LatencyWindow:
+    """Recent call latencies of one backend; old samples age out so a slow backend gets re-tried."""
+
+    def __init__(self, max_samples: int = 200, max_age: float = 300.0, min_samples: int = 20):
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self.max_age = max_age
+        self.min_samples = min_samples
+
+    def add(self, seconds: float) -> None:
+        self.samples.append((time.monotonic(), seconds))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentile (0-1) of recent latencies, or None while there are too few samples."""
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        if len(self.samples) < self.min_samples:
+            return None
+        values = sorted(seconds for _, seconds in self.samples)
+        return values[min(len(values) - 1, int(len(values) * q))]
+
+    def p95(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+
+class Backend:
+    def __init__(self, spec: BackendSpec, client: GeminiClient):
+        self.spec = spec
+        self.client = client
+        self.latency = LatencyWindow()
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def fits(self, size: int) -> bool:
+        return not self.spec.max_pr_tokens or size <= self.spec.max_pr_tokens
+
+
+class _Admission:
+    """Admission state across all backends, for early 503s and the stats endpoint."""
+
+    def __init__(self, controllers: Sequence[AdmissionController]):
+        self.controllers = controllers
+
+    @property
+    def saturated(self) -> bool:
+        return all(c.saturated for c in self.controllers)
+
+    def retry_after(self) -> float:
+        return min(c.retry_after() for c in self.controllers)
+
+    def stats(self) -> Dict[str, Any]:
+        totals: Dict[str, Any] = {}
+        for c in self.controllers:
+            for key, value in c.stats().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class ModelRouter:
+    """Routes model calls across several backends, each a GeminiClient with its own admission control.
+
+    Backends are tried in configured order among those whose PR size limit fits. When the
+    chosen backend's recent p95 latency is over `hedge_p95`, the next one is started as a
+    hedge if no answer came within `hedge_p95`, and the first good answer wins; a backend
+    whose median is over it (slow throughout, not just in the tail) is moved behind the
+    others until its samples age out. Failed calls fail over down the list.
+    """
+
+    def __init__(self, backends: Sequence[Backend], hedge_p95: float = 20.0):
+        if not backends:
+            raise ValueError("ModelRouter needs at least one backend")
+        self.backends = list(backends)
+        self.hedge_p95 = hedge_p95
+        self.admission = _Admission([b.client.admission for b in self.backends])
+
+    @classmethod
+    def from_specs(cls, cfg: GeminiConfig, specs: Sequence[BackendSpec], hedge_p95: float = 20.0) -> "ModelRouter":
+        # With a real API key, a stub backend would hand out canned mock reviews as failover answers
+        if cfg.api_key and any(s.model == STUB_MODEL for s in specs):
+            raise ValueError(f"The {STUB_MODEL!r} backend can't be routed alongside real models (GEMINI_API_KEY is set)")
+        return cls([Backend(s, GeminiClient(replace(cfg, model=s.model))) for s in specs], hedge_p95)
+
+    def is_mock(self) -> bool:
+        return all(b.client.is_mock() for b in self.backends)
+
+    def _slow(self, backend: Backend, q: float = 0.95) -> bool:
+        latency = backend.latency.percentile(q)
+        return self.hedge_p95 > 0 and latency is not None and latency > self.hedge_p95
+
+    def route(self, size: int) -> List[Backend]:
+        """Backends to try for a PR of `size` estimated diff tokens, best first."""
+        eligible = [b for b in self.backends if b.fits(size)] or self.backends
+        degraded = [b for b in eligible if self._slow(b, 0.5)]
+        return [b for b in eligible if b not in degraded] + degraded
+
+    async def generate_json(
+        self, system_prompt: str, user_prompt: Union[str, Sequence[str]], priority: int = 0
+    ) -> Dict[str, Any]:
+        """GeminiClient.generate_json over the routed backends; the answering model is set on the result.
+
+        `priority` is the PR's estimated diff tokens (see ReviewService), so every chunk
+        of one PR is routed to the same size tier.
+        """
+        order = self.route(priority)
+        args = (system_prompt, user_prompt, priority)
+        tried: Set[str] = set()
+        last: Union[Dict[str, Any], AdmissionRejected, None] = None
+        for backend in order:
+            if backend.name in tried:
+                continue
+            hedge = next((b for b in order if b.name not in tried and b is not backend), None)
+            if last is None and hedge is not None and self._slow(backend):
+                last = await self._hedged(backend, hedge, args, tried)
+            else:
+                last = await self._attempt(backend, "primary" if last is None else "failover", args, tried)
+            if isinstance(last, dict) and not last.get("error"):
+                return last
+        if isinstance(last, AdmissionRejected):
+            raise last
+        return last
+
+    async def _attempt(
+        self, backend: Backend, role: str, args: tuple, tried: Set[str]
+    ) -> Union[Dict[str, Any], AdmissionRejected]:
+        tried.add(backend.name)
+        metrics.MODEL_ROUTES.labels(backend.name, role).inc()
+        started = time.monotonic()
+        try:
+            data = await backend.client.generate_json(*args)
+        except AdmissionRejected as e:
+            return e
+        except asyncio.CancelledError:
+            # A hedge loser still tells us the backend took at least this long
+            backend.latency.add(time.monotonic() - started)
+            raise
+        if not data.get("error"):
+            backend.latency.add(time.monotonic() - started)
+        data["model"] = backend.client.cfg.model
+        return data
+
+    async def _hedged(
+        self, primary: Backend, hedge: Backend, args: tuple, tried: Set[str]
+    ) -> Union[Dict[str, Any], AdmissionRejected]:
+        tasks = [asyncio.create_task(self._attempt(primary, "primary", args, tried))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_p95)
+            if done:
+                return tasks[0].result()
+            tasks.append(asyncio.create_task(self._attempt(hedge, "hedge", args, tried)))
+            pending = set(tasks)
+            result: Union[Dict[str, Any], AdmissionRejected, None] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if isinstance(result, dict) and not result.get("error"):
+                        return result
+            return result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": b.name,
+                "model": b.spec.model,
+                "max_pr_tokens": b.spec.max_pr_tokens,
+                "p95_seconds": b.latency.p95(),
+                "hedged": self._slow(b),
+                "degraded": self._slow(b, 0.5),
+                "admission": b.client.admission.stats(),
+            }
+            for b in self.backends
+        ]
@@ -0,0 +1,132 @@
+"""Admission control under provider quota pressure, against a stub model.
+
+The stub accepts only `--capacity` concurrent calls and answers the rest with a 429
+(like Gemini's ResourceExhausted). Compares a fixed window without retries (the
+previous behaviour: excess calls became "Model call failed" reviews) with the
+adaptive controller, then checks small-PR priority, that priority aging keeps large PRs from starving,
+and queue saturation.
+
+Usage: python bench/bench_admission.py [--calls 60] [--capacity 4] [--latency-ms 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.admission import AdmissionRejected  # noqa: E402
+from app.services.gemini import GeminiClient, GeminiConfig  # noqa: E402
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class _Response:
+    text = json.dumps({"summary": "ok", "comments": [], "suggestions": []})
+
+
+class QuotaStubModel:
+    def __init__(self, capacity: int, latency_ms: float):
+        self.capacity = capacity
+        self.latency = latency_ms / 1000
+        self.active = 0
+        self.rejected = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        if self.active >= self.capacity:
+            self.rejected += 1
+            await asyncio.sleep(0.005)
+            raise ResourceExhausted("429 Resource has been exhausted")
+        self.active += 1
+        try:
+            await asyncio.sleep(self.latency)
+            return _Response()
+        finally:
+            self.active -= 1
+
+
+def make_client(args, **overrides) -> GeminiClient:
+    cfg = GeminiConfig(api_key="", **{"max_concurrency": 16, "max_retries": 6, **overrides})
+    client = GeminiClient(cfg)
+    client.admission.cfg.base_backoff = args.latency_ms / 1000
+    client._client = QuotaStubModel(args.capacity, args.latency_ms)
+    return client
+
+
+async def burst(client: GeminiClient, calls: int):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client.generate_json("s", "u") for _ in range(calls)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for r in results if isinstance(r, BaseException) or r.get("error"))
+    return elapsed, failed
+
+
+async def main(args) -> None:
+    fixed = make_client(args, min_concurrency=16, max_retries=0)
+    elapsed, failed = await burst(fixed, args.calls)
+    print(f"fixed window, no retries : {args.calls - failed}/{args.calls} reviews ok, {failed} failed, "
+          f"{fixed._client.rejected} upstream 429s, {elapsed:.2f}s")
+
+    adaptive = make_client(args)
+    elapsed, failed = await burst(adaptive, args.calls)
+    stats = adaptive.admission.stats()
+    print(f"adaptive admission       : {args.calls - failed}/{args.calls} reviews ok, {failed} failed, "
+          f"{adaptive._client.rejected} upstream 429s, {elapsed:.2f}s "
+          f"(limit now {stats['concurrency_limit']}, {stats['retries']} retries)")
+    ideal = args.calls / args.capacity * args.latency_ms / 1000
+    print(f"                           ideal at capacity {args.capacity}: {ideal:.2f}s")
+
+    # Priority: a queue of large-PR calls, then small-PR calls arrive; small ones should go next
+    prio = make_client(args, min_concurrency=args.capacity, max_concurrency=args.capacity)
+    finished = []
+
+    async def call(label: str, priority: int):
+        await prio.generate_json("s", "u", priority=priority)
+        finished.append(label)
+
+    large = [asyncio.create_task(call("large", 50_000)) for _ in range(20)]
+    await asyncio.sleep(0.01)
+    small = [asyncio.create_task(call("small", 500)) for _ in range(4)]
+    await asyncio.gather(*large, *small)
+    position = [i for i, label in enumerate(finished) if label == "small"]
+    print(f"priority                 : small PRs finished at positions {position} of {len(finished)}")
+
+    # Starvation: one large PR behind a steady stream of small ones; aging lets it through
+    for aging in (0.0, 100_000.0):
+        starve = make_client(args, min_concurrency=args.capacity, max_concurrency=args.capacity,
+                             priority_aging=aging)
+        stream_until = time.perf_counter() + args.stream_s
+
+        async def small_stream():
+            while time.perf_counter() < stream_until:
+                await starve.generate_json("s", "u", priority=500)
+
+        streams = [asyncio.create_task(small_stream()) for _ in range(args.capacity * 2)]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await starve.generate_json("s", "u", priority=50_000)
+        waited = time.perf_counter() - started
+        await asyncio.gather(*streams)
+        print(f"starvation (aging {aging:>7.0f}): large PR admitted after {waited:.2f}s "
+              f"of a {args.stream_s:.1f}s small-PR stream")
+
+    # Saturation: a tiny queue rejects the overflow instead of buffering it
+    sat = make_client(args, min_concurrency=args.capacity, max_concurrency=args.capacity, max_queue=10)
+    results = await asyncio.gather(*(sat.generate_json("s", "u") for _ in range(30)), return_exceptions=True)
+    rejected = [r for r in results if isinstance(r, AdmissionRejected)]
+    retry_after = rejected[0].retry_after if rejected else None
+    print(f"saturation (queue 10)    : {len(rejected)}/30 rejected with Retry-After {retry_after}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--stream-s", type=float, default=3.0, help="small-PR stream length in the starvation check")
+    asyncio.run(main(parser.parse_args()))
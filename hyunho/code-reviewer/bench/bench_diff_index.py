@@ -0,0 +1,127 @@
+"""Diff line index: build cost, lookup cost and size on PRs with thousands of hunks.
+
+Compares DiffIndex lookups (bisect over sorted arrays) with the linear approach of
+walking the parsed hunks for every comment, and times anchoring a batch of model
+comments through ReviewService (validate, snap, fill in diff positions).
+
+Usage: python bench/bench_diff_index.py [--files N] [--hunks N] [--comments N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.schemas import InlineComment  # noqa: E402
+from app.services.diff import DiffIndex, Hunk, index_patch, parse_hunks  # noqa: E402
+from app.services.review import ReviewService, ReviewServiceConfig  # noqa: E402
+
+
+def make_patch(rng: random.Random, hunks: int) -> str:
+    lines = []
+    old = new = 1
+    for _ in range(hunks):
+        gap = rng.randint(3, 40)
+        old += gap
+        new += gap
+        body = [rng.choice(" +-") + f"line {i}" for i in range(rng.randint(4, 24))]
+        old_count = sum(1 for b in body if b[0] != "+")
+        new_count = sum(1 for b in body if b[0] != "-")
+        lines.append(f"@@ -{old},{old_count} +{new},{new_count} @@")
+        lines.extend(body)
+        old += old_count
+        new += new_count
+    return "\n".join(lines) + "\n"
+
+
+def linear_position(hunks: List[Hunk], line: int) -> Optional[int]:
+    """Reference lookup: walk hunk by hunk (what callers had to do without an index)."""
+    position = 0
+    for index, hunk in enumerate(hunks):
+        if index:
+            position += 1
+        if not hunk.contains_new_line(line):
+            position += len(hunk.lines)
+            continue
+        new_line = hunk.new_start
+        for body in hunk.lines:
+            position += 1
+            if body[:1] == "-":
+                continue
+            if new_line == line:
+                return position
+            new_line += 1
+        return None
+    return None
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--hunks", type=int, default=2000, help="hunks per file")
+    parser.add_argument("--comments", type=int, default=2000, help="model comments per file")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patches = {f"src/file{i}.py": make_patch(rng, args.hunks) for i in range(args.files)}
+    total_lines = sum(p.count("\n") for p in patches.values())
+    print(f"{args.files} files x {args.hunks} hunks ({total_lines} diff lines, "
+          f"{sum(map(len, patches.values())) / 1024 / 1024:.1f} MB)")
+
+    parse_s = timed(lambda: [parse_hunks(p) for p in patches.values()])
+    index_s = timed(lambda: [index_patch(p) for p in patches.values()])
+    indexes = {path: DiffIndex.from_patch(p) for path, p in patches.items()}
+    hunks = {path: parse_hunks(p) for path, p in patches.items()}
+    index_bytes = sum(
+        a.itemsize * len(a)
+        for i in indexes.values()
+        for a in (i.hunk_starts, i.hunk_ends, i.lines, i.positions, i.added)
+    )
+    print(f"parse_hunks          {parse_s * 1000:8.1f} ms")
+    print(f"parse + index        {index_s * 1000:8.1f} ms  (index {index_bytes / 1024 / 1024:.1f} MB)")
+
+    queries = {
+        path: [rng.randint(1, i.lines[-1] + 50) for _ in range(args.comments)] for path, i in indexes.items()
+    }
+    # Spot-check the index against the reference lookup
+    for path, lines in queries.items():
+        for line in lines[:200]:
+            assert indexes[path].position(line) == linear_position(hunks[path], line), (path, line)
+
+    n = sum(len(q) for q in queries.values())
+    bisect_s = timed(lambda: [indexes[p].position(line) for p, lines in queries.items() for line in lines])
+    sample = {path: lines[: max(1, args.comments // 20)] for path, lines in queries.items()}
+    sample_n = sum(len(q) for q in sample.values())
+    linear_s = timed(lambda: [linear_position(hunks[p], line) for p, lines in sample.items() for line in lines], 1)
+    print(f"position() x{n:<7}  {bisect_s / n * 1e6:8.2f} us/lookup (bisect)")
+    print(f"linear walk x{sample_n:<6}  {linear_s / sample_n * 1e6:8.2f} us/lookup")
+
+    service = ReviewService(ReviewServiceConfig(model="bench", api_key="", cache_enabled=False))
+    comments = [
+        InlineComment(path=path, line=line, comment=f"comment {k}")
+        for path, lines in queries.items()
+        for k, line in enumerate(lines)
+    ]
+    anchor_s = timed(lambda: service._anchor_comments(comments, indexes, record=False))
+    anchored = service._anchor_comments(comments, indexes, record=False)
+    kept = sum(1 for c in anchored if c.position is not None)
+    print(f"anchor {len(comments)} comments {anchor_s * 1000:8.1f} ms  ({kept} anchored, "
+          f"{len(comments) - len(anchored)} dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Peak memory and latency of one large-PR review per upload format.
+
+Sends the same synthetic PR to the app (in-process, through httpx's ASGI transport,
+with the stub model from stub_gemini) as plain JSON, gzip JSON and gzip NDJSON on
+/v1/review/stream. The client produces every body lazily in small chunks, so the
+peak RSS growth reported is the server's. Each format runs in its own process,
+since peak RSS never goes back down.
+
+Usage: python bench/bench_ingest.py [--files N] [--hunks N] [--rounds N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_gemini import StubGeminiModel, install  # noqa: E402
+
+MODES = ("json", "json-gzip", "ndjson-gzip")
+
+_LINES = (
+    "    result = compute(value, options)",
+    "    if not items:",
+    "        return None",
+    "    for index, item in enumerate(items):",
+    "    logger.info(\"processing %s\", item.id)",
+    "    total += item.price * item.quantity",
+)
+
+
+def _patch(rng: random.Random, hunks: int) -> str:
+    lines = []
+    start = 1
+    for _ in range(hunks):
+        start += rng.randint(5, 120)
+        lines.append(f"@@ -{start},20 +{start},20 @@")
+        lines.extend(rng.choice(" +-") + rng.choice(_LINES) for _ in range(20))
+    return "\n".join(lines) + "\n"
+
+
+def _request(args, round_no: int) -> dict:
+    return {"repo": "bench/ingest", "pr_number": round_no, "title": "large PR", "head_sha": f"{round_no:040x}"}
+
+
+def _files(args, round_no: int):
+    rng = random.Random(round_no)
+    for index in range(args.files):
+        yield {"path": f"src/pkg{index % 50}/file{index}.py", "status": "modified", "patch": _patch(rng, args.hunks)}
+
+
+def _json_chunks(args, round_no: int):
+    head = json.dumps(_request(args, round_no))
+    yield head[:-1].encode() + b', "changed_files": ['
+    for index, f in enumerate(_files(args, round_no)):
+        yield (b"," if index else b"") + json.dumps(f).encode()
+    yield b"]}"
+
+
+def _ndjson_chunks(args, round_no: int):
+    yield json.dumps(_request(args, round_no)).encode() + b"\n"
+    for f in _files(args, round_no):
+        yield json.dumps(f).encode() + b"\n"
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+async def _body(chunks, counter: list):
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+
+def _upload(mode: str, args, round_no: int):
+    if mode == "json":
+        return "/v1/review", _json_chunks(args, round_no), {"content-type": "application/json"}
+    if mode == "json-gzip":
+        headers = {"content-type": "application/json", "content-encoding": "gzip"}
+        return "/v1/review", _gzip(_json_chunks(args, round_no)), headers
+    headers = {"content-type": "application/x-ndjson", "content-encoding": "gzip"}
+    return "/v1/review/stream", _gzip(_ndjson_chunks(args, round_no)), headers
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def child(mode: str, args) -> dict:
+    import httpx
+
+    os.environ["REVIEW_CACHE"] = "0"
+    from app.main import app
+
+    async with app.router.lifespan_context(app):
+        install(app.state.review_service.gemini, StubGeminiModel(latency_ms=20, ms_per_1k_tokens=0))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            # Warm up imports and lazy state before taking the baseline
+            await client.post("/v1/review", json={**_request(args, 0), "changed_files": []})
+            baseline = _max_rss_mb()
+            timings, sent = [], [0]
+            for round_no in range(1, args.rounds + 1):
+                path, chunks, headers = _upload(mode, args, round_no)
+                started = time.perf_counter()
+                response = await client.post(path, content=_body(chunks, sent), headers=headers)
+                timings.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise SystemExit(f"{mode}: HTTP {response.status_code} {response.text[:200]}")
+                skipped = len(response.json()["skipped_files"])
+    return {
+        "mode": mode,
+        "sent_mb": sent[0] / args.rounds / 1024 / 1024,
+        "seconds": min(timings),
+        "peak_rss_growth_mb": _max_rss_mb() - baseline,
+        "skipped": skipped,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--hunks", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--mode", choices=MODES, action="append")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child(args.child, args))))
+        return
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    print(f"{args.files} files x {args.hunks} hunks, best of {args.rounds}")
+    print(f"{'mode':<12} {'sent MB':>8} {'seconds':>8} {'peak RSS +MB':>13} {'skipped':>8}")
+    for mode in args.mode or MODES:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", mode,
+               "--files", str(args.files), "--hunks", str(args.hunks), "--rounds", str(args.rounds)]
+        out = subprocess.run(cmd, cwd=root, check=True, capture_output=True, text=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"{r['mode']:<12} {r['sent_mb']:>8.1f} {r['seconds']:>8.2f} {r['peak_rss_growth_mb']:>13.1f} {r['skipped']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Prompt size and latency before/after diff pre-processing, on real PR fixtures.
+
+Fixtures are rebuilt from git history (default: this repository) or loaded from a
+directory of saved ReviewRequest JSON files. Model latency is simulated by a stub
+whose response time grows with prompt size, so the numbers isolate the effect of
+smaller prompts (fewer chunks, shorter calls).
+
+Usage: python bench/bench_preprocess.py [--repo PATH] [--commits N] [--fixtures DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import git_history_fixtures, load_fixture_dir  # noqa: E402
+
+from app.services.chunking import estimate_tokens  # noqa: E402
+from app.services.preprocess import preprocess  # noqa: E402
+from app.services.review import ReviewService, ReviewServiceConfig  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..")
+
+
+class _Response:
+    text = json.dumps({"summary": "ok", "comments": [], "suggestions": []})
+
+
+class LatencyStubModel:
+    """Stand-in for GenerativeModel: base latency plus a per-token cost."""
+
+    def __init__(self, base_ms: float, ms_per_1k_tokens: float):
+        self.base_ms = base_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.prompt_tokens = 0
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        tokens = estimate_tokens(prompt)
+        self.prompt_tokens += tokens
+        self.calls += 1
+        await asyncio.sleep((self.base_ms + self.ms_per_1k_tokens * tokens / 1000) / 1000)
+        return _Response()
+
+
+class UnprocessedReviewService(ReviewService):
+    """The review path as it was before pre-processing: diffs go to the model verbatim."""
+
+    async def generate_review(self, req):
+        return await self._generate(req)
+
+
+def build_service(preprocessing: bool, args) -> ReviewService:
+    cls = ReviewService if preprocessing else UnprocessedReviewService
+    service = cls(ReviewServiceConfig(model="bench", api_key="", cache_enabled=False))
+    service.gemini._client = LatencyStubModel(args.base_ms, args.ms_per_1k_tokens)
+    return service
+
+
+async def measure(service: ReviewService, req):
+    started = time.perf_counter()
+    response = await service.generate_review(req)
+    return (time.perf_counter() - started) * 1000, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repo", default=REPO_ROOT, help="git repository to rebuild PRs from")
+    parser.add_argument("--commits", type=int, default=10, help="most recent commits to use as PRs")
+    parser.add_argument("--fixtures", help="directory of saved ReviewRequest *.json files")
+    parser.add_argument("--base-ms", type=float, default=300.0, help="stub model base latency")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=40.0, help="stub model latency per 1k prompt tokens")
+    args = parser.parse_args()
+
+    fixtures = load_fixture_dir(args.fixtures) if args.fixtures else git_history_fixtures(args.repo, args.commits)
+
+    print(f"{'fixture':<44}{'files':>6}{'tokens before':>15}{'after':>9}{'saved':>8}"
+          f"{'skipped':>9}{'prep ms':>9}{'latency before':>16}{'after':>9}")
+    totals = [0, 0, 0.0, 0.0]
+    for req in fixtures:
+        before_service = build_service(False, args)
+        after_service = build_service(True, args)
+        before_ms, _ = asyncio.run(measure(before_service, req))
+
+        started = time.perf_counter()
+        preprocess(req.changed_files, after_service.preprocess_cfg)
+        prep_ms = (time.perf_counter() - started) * 1000
+        after_ms, response = asyncio.run(measure(after_service, req))
+
+        before_tokens = before_service.gemini._client.prompt_tokens
+        after_tokens = after_service.gemini._client.prompt_tokens
+        saved = 1 - after_tokens / before_tokens if before_tokens else 0.0
+        label = f"#{req.pr_number} {req.title}"[:42]
+        print(f"{label:<44}{len(req.changed_files):>6}{before_tokens:>15,}{after_tokens:>9,}{saved:>8.0%}"
+              f"{len(response.skipped_files):>9}{prep_ms:>9.1f}{before_ms:>14.0f}ms{after_ms:>7.0f}ms")
+        totals[0] += before_tokens
+        totals[1] += after_tokens
+        totals[2] += before_ms
+        totals[3] += after_ms
+
+    saved = 1 - totals[1] / totals[0] if totals[0] else 0.0
+    print(f"\ntotal prompt tokens {totals[0]:,} -> {totals[1]:,} ({saved:.0%} fewer); "
+          f"summed latency {totals[2]:.0f}ms -> {totals[3]:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
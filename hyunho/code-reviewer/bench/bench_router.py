@@ -0,0 +1,132 @@
+"""Model router: size-based routing, hedging on a slow primary, and failover on errors.
+
+Backends are GeminiClients (with their real admission control) answering through
+local stub models, so the numbers only reflect routing decisions:
+
+  size      PRs of realistic sizes; how many go to the small-PR backend
+  tail      primary with a slow tail (p95 over the hedge threshold) vs. a steady
+            secondary; call latency without and with the router
+  failover  primary failing a share of calls; success rate without and with the router
+
+Usage: python bench/bench_router.py [--requests N] [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "bench"))
+
+from profiles import pr_file_count  # noqa: E402
+
+from app.services.gemini import GeminiClient, GeminiConfig, StubModel, mock_response  # noqa: E402
+from app.services.router import Backend, BackendSpec, ModelRouter  # noqa: E402
+
+
+class TailModel(StubModel):
+    """StubModel with a slow tail and failures, drawn from a seeded RNG."""
+
+    def __init__(self, latency_ms: float, tail_ms: float = 0.0, tail_rate: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        super().__init__(latency_ms)
+        self.tail = tail_ms / 1000
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        roll = self.random.random()
+        if roll < self.error_rate:
+            await asyncio.sleep(self.latency)
+            raise RuntimeError("upstream error")
+        await asyncio.sleep(self.tail if roll < self.error_rate + self.tail_rate else self.latency)
+        return SimpleNamespace(text=json.dumps(mock_response(prompt)), usage_metadata=None)
+
+
+def client(model: str, stub: TailModel) -> GeminiClient:
+    c = GeminiClient(GeminiConfig(api_key="", model=model, max_concurrency=64, max_retries=0))
+    c._client = stub
+    return c
+
+
+async def drive(gemini, sizes: List[int], concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(size: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            data = await gemini.generate_json("system", "user", priority=size)
+            latencies.append(time.perf_counter() - started)
+            failures += bool(data.get("error"))
+
+    await asyncio.gather(*(one(s) for s in sizes))
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99), "failures": failures}
+
+
+def line(label: str, r: dict, extra: str = "") -> None:
+    print(f"  {label:<22} p50 {r['p50']:7.0f}ms  p95 {r['p95']:7.0f}ms  p99 {r['p99']:7.0f}ms  "
+          f"failed {r['failures']:4d}  {extra}")
+
+
+async def main(args) -> None:
+    rng = random.Random(args.seed)
+    # ~600 estimated tokens per changed file, as in the load-test profiles
+    sizes = [pr_file_count(rng) * 600 for _ in range(args.requests)]
+
+    print(f"size: {args.requests} PRs, backends fast<=8000 tokens / main")
+    fast, main_model = TailModel(50), TailModel(300)
+    router = ModelRouter([
+        Backend(BackendSpec("fast", "fast", max_pr_tokens=8000), client("fast", fast)),
+        Backend(BackendSpec("main", "main"), client("main", main_model)),
+    ])
+    r = await drive(router, sizes, args.concurrency)
+    line("router", r, f"fast {fast.calls}, main {main_model.calls}")
+
+    print("tail: primary 100ms with 8% at 2000ms, secondary 250ms, hedge threshold 500ms")
+    sizes = [1000] * args.requests
+    alone = client("primary", TailModel(100, tail_ms=2000, tail_rate=0.08, seed=1))
+    line("primary only", await drive(alone, sizes, args.concurrency))
+    primary = TailModel(100, tail_ms=2000, tail_rate=0.08, seed=1)
+    secondary = TailModel(250, seed=2)
+    router = ModelRouter([
+        Backend(BackendSpec("primary", "primary"), client("primary", primary)),
+        Backend(BackendSpec("secondary", "secondary"), client("secondary", secondary)),
+    ], hedge_p95=0.5)
+    r = await drive(router, sizes, args.concurrency)
+    line("router (hedged)", r, f"primary {primary.calls}, secondary {secondary.calls} calls")
+
+    print("failover: primary failing 20% of calls, secondary healthy")
+    alone = client("primary", TailModel(100, error_rate=0.2, seed=3))
+    line("primary only", await drive(alone, sizes, args.concurrency))
+    primary, secondary = TailModel(100, error_rate=0.2, seed=3), TailModel(250, seed=4)
+    router = ModelRouter([
+        Backend(BackendSpec("primary", "primary"), client("primary", primary)),
+        Backend(BackendSpec("secondary", "secondary"), client("secondary", secondary)),
+    ], hedge_p95=0.5)
+    r = await drive(router, sizes, args.concurrency)
+    line("router (failover)", r, f"primary {primary.calls}, secondary {secondary.calls} calls")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,159 @@
+"""Concurrency check for single-flight review de-duplication, using a mocked slow model.
+
+Fires bursts of identical ReviewRequests (as re-runs and parallel workflow runs do)
+and checks that they share one model call, including when some callers are
+cancelled or the review fails. Exits non-zero if any check fails.
+
+Usage: python bench/bench_singleflight.py [--callers 20] [--latency-ms 300]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.schemas import ChangedFile, ReviewRequest  # noqa: E402
+from app.services.review import ReviewService, ReviewServiceConfig  # noqa: E402
+
+
+class _Response:
+    text = json.dumps({"summary": "ok", "comments": [{"path": "a.py", "line": 2, "comment": "c"}], "suggestions": []})
+
+
+class SlowModel:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return _Response()
+
+
+def make_service(latency_ms: float) -> ReviewService:
+    # Cache off so only single-flight can de-duplicate
+    service = ReviewService(ReviewServiceConfig(model="bench", api_key="", cache_enabled=False))
+    service.gemini._client = SlowModel(latency_ms)
+    return service
+
+
+def make_request(head_sha: str = "abc") -> ReviewRequest:
+    patch = "@@ -1,1 +1,2 @@\n a\n+b\n"
+    return ReviewRequest(
+        repo="acme/widgets", pr_number=7, title="t", head_sha=head_sha,
+        changed_files=[ChangedFile(path="a.py", status="modified", patch=patch)],
+    )
+
+
+failures = []
+
+
+def check(name: str, ok: bool, detail: str = "") -> None:
+    print(f"{'PASS' if ok else 'FAIL'}  {name}{'  (' + detail + ')' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+async def burst(args) -> None:
+    service = make_service(args.latency_ms)
+    req = make_request()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(service.generate_review(req) for _ in range(args.callers)))
+    elapsed = (time.perf_counter() - started) * 1000
+    calls = service.gemini._client.calls
+    check(f"{args.callers} identical concurrent requests -> 1 model call", calls == 1, f"{calls} calls, {elapsed:.0f}ms")
+    check("all callers get the same review", all(r == results[0] for r in results))
+    check("results are independent copies", len({id(r) for r in results}) == len(results))
+
+    baseline = make_service(args.latency_ms)
+    await asyncio.gather(*(baseline._review(req) for _ in range(args.callers)))
+    print(f"      without single-flight: {baseline.gemini._client.calls} model calls")
+
+    await service.generate_review(req)
+    check("a later request starts a new flight", service.gemini._client.calls == 2)
+
+    await asyncio.gather(service.generate_review(req), service.generate_review(make_request("def")))
+    check("different head_sha is not merged", service.gemini._client.calls == 4)
+
+
+async def cancellation(args) -> None:
+    service = make_service(args.latency_ms)
+    req = make_request()
+    tasks = [asyncio.create_task(service.generate_review(req)) for _ in range(3)]
+    await asyncio.sleep(args.latency_ms / 3000)
+    tasks[0].cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    check("cancelling one waiter leaves the others served",
+          isinstance(results[0], asyncio.CancelledError) and all(r.summary == "ok" for r in results[1:]))
+    check("...and the shared call is not cancelled", service.gemini._client.cancelled == 0)
+
+    tasks = [asyncio.create_task(service.generate_review(req)) for _ in range(3)]
+    await asyncio.sleep(args.latency_ms / 3000)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.sleep(0)
+    check("cancelling every waiter cancels the model call", service.gemini._client.cancelled == 1)
+    check("no flight is left behind", not service._in_flight)
+
+    response = await service.generate_review(req)
+    check("next request after a cancelled flight succeeds", response.summary == "ok")
+
+
+async def errors(args) -> None:
+    service = make_service(args.latency_ms)
+    req = make_request()
+    original = service._generate
+    calls = 0
+
+    async def failing(*a, **kw):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(args.latency_ms / 1000)
+        raise RuntimeError("boom")
+
+    service._generate = failing
+    results = await asyncio.gather(*(service.generate_review(req) for _ in range(5)), return_exceptions=True)
+    check("an error reaches every waiter once", calls == 1 and all(isinstance(r, RuntimeError) for r in results))
+
+    service._generate = original
+    response = await service.generate_review(req)
+    check("errors are not remembered", response.summary == "ok")
+
+
+async def progress(args) -> None:
+    service = make_service(args.latency_ms)
+    req = make_request()
+    seen = [[], []]
+    first = asyncio.create_task(service.generate_review(req, on_comments=lambda c, p: seen[0].append(p)))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(service.generate_review(req, on_comments=lambda c, p: seen[1].append(p)))
+    await asyncio.gather(first, second)
+    check("progress callbacks reach joined callers", seen[0] == seen[1] == [["a.py"]])
+
+
+async def main(args) -> None:
+    await burst(args)
+    await cancellation(args)
+    await errors(args)
+    await progress(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    asyncio.run(main(parser.parse_args()))
+    if failures:
+        print(f"\n{len(failures)} check(s) failed")
+        sys.exit(1)
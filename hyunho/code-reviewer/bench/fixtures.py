@@ -0,0 +1,82 @@
+"""Review request fixtures for benchmarks.
+
+Real PRs are rebuilt from git history (`git diff A B`, split per file the way the
+GitHub files API returns them), or loaded from saved ReviewRequest JSON files.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.schemas import ChangedFile, ReviewRequest  # noqa: E402
+
+def _git(repo: str, *args: str) -> str:
+    return subprocess.run(
+        ["git", "-C", repo, *args], capture_output=True, text=True, check=True, errors="replace"
+    ).stdout
+
+
+def parse_git_diff(diff: str) -> List[ChangedFile]:
+    files: List[ChangedFile] = []
+    for block in ("\n" + diff).split("\ndiff --git ")[1:]:
+        lines = block.splitlines()
+        path = lines[0].split(" b/", 1)[-1]
+        status = "modified"
+        patch_lines: List[str] = []
+        in_patch = False
+        for line in lines[1:]:
+            if in_patch:
+                patch_lines.append(line)
+            elif line.startswith("new file mode"):
+                status = "added"
+            elif line.startswith("deleted file mode"):
+                status = "removed"
+            elif line.startswith("rename from"):
+                status = "renamed"
+            elif line.startswith("@@"):
+                in_patch = True
+                patch_lines.append(line)
+        # Like the GitHub API: binary files come without a patch
+        files.append(ChangedFile(path=path, status=status, patch="\n".join(patch_lines) + "\n" if patch_lines else None))
+    return files
+
+
+def request_from_git(repo: str, base: Optional[str], head: str, pr_number: int = 1) -> ReviewRequest:
+    """PR equivalent of base..head; base=None diffs a root commit against the empty tree."""
+    if base is None:
+        diff = _git(repo, "diff-tree", "-p", "--root", "--no-color", "--unified=3", "-M", "--no-commit-id", head)
+    else:
+        diff = _git(repo, "diff", "--no-color", "--unified=3", "-M", base, head)
+    title = _git(repo, "log", "-1", "--format=%s", head).strip()
+    return ReviewRequest(
+        repo=os.path.basename(os.path.abspath(repo)),
+        pr_number=pr_number,
+        title=title,
+        base_sha=base,
+        head_sha=head,
+        changed_files=parse_git_diff(diff),
+    )
+
+
+def git_history_fixtures(repo: str, max_commits: Optional[int] = 10) -> List[ReviewRequest]:
+    """One fixture per commit (parent..commit), plus the root commit as a whole-tree PR."""
+    commits = _git(repo, "rev-list", "--first-parent", "--reverse", "HEAD").split()
+    fixtures = [request_from_git(repo, None, commits[0], pr_number=1)]
+    recent = commits[1:] if max_commits is None else commits[1:][-max_commits:]
+    for number, commit in enumerate(recent, start=2):
+        fixtures.append(request_from_git(repo, f"{commit}^", commit, pr_number=number))
+    return fixtures
+
+
+def load_fixture_dir(directory: str) -> List[ReviewRequest]:
+    """Saved ReviewRequest payloads (*.json), e.g. captured from the GitHub workflow."""
+    fixtures = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            with open(os.path.join(directory, name), encoding="utf-8") as fh:
+                fixtures.append(ReviewRequest.model_validate(json.load(fh)))
+    return fixtures
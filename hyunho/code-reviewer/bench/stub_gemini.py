@@ -0,0 +1,80 @@
+"""Local stand-in for the Gemini model, for benchmarks and load tests.
+
+Answers with the GeminiClient mock review after a configurable latency (a fixed
+part plus a part proportional to the prompt size), reports usage metadata, and
+can refuse calls with a 429 above a concurrency capacity or at a given rate.
+Install it with `install(service.gemini, StubGeminiModel(...))`.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.services.gemini import GeminiClient, mock_response  # noqa: E402
+
+
+class ResourceExhausted(Exception):
+    code = 429
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, response_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = response_tokens
+        self.total_token_count = prompt_tokens + response_tokens
+
+
+class _Response:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = _Usage(prompt_tokens, len(text) // 4)
+
+
+class StubGeminiModel:
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        ms_per_1k_tokens: float = 5.0,
+        capacity: int = 0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency_ms / 1000
+        self.per_token = ms_per_1k_tokens / 1000 / 1000
+        # Concurrent calls served before answering 429 (0 = unlimited)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.active = 0
+        self.calls = 0
+        self.rejected = 0
+        self.prompt_tokens = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        if (self.capacity and self.active >= self.capacity) or self.random.random() < self.error_rate:
+            self.rejected += 1
+            await asyncio.sleep(0.005)
+            raise ResourceExhausted("429 Resource has been exhausted")
+        tokens = len(prompt) // 4
+        self.prompt_tokens += tokens
+        self.active += 1
+        try:
+            await asyncio.sleep(self.latency + tokens * self.per_token)
+            return _Response(json.dumps(mock_response(prompt)), tokens)
+        finally:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "rejected": self.rejected, "prompt_tokens": self.prompt_tokens}
+
+
+def install(client: GeminiClient, model: StubGeminiModel) -> StubGeminiModel:
+    """Route a client's calls to the stub (through its real admission control and metrics)."""
+    client._client = model
+    return model
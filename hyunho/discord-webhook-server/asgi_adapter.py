@@ -0,0 +1,196 @@
+# Functions Framework(Flask) 요청을 ASGI 앱으로 직접 전달하는 어댑터
+# 요청마다 TestClient를 만드는 대신, 인스턴스 수명 동안 유지되는 이벤트 루프 하나에서 앱을 실행
+
+import asyncio
+import atexit
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class ASGIAdapter:
+    """Flask 요청 -> ASGI scope 변환 후 영구 이벤트 루프에서 실행하는 어댑터"""
+
+    def __init__(self, app, startup_timeout: float = 30.0, observer: Optional[Callable[[float, float], None]] = None):
+        self.app = app
+        self.startup_timeout = startup_timeout
+        # 요청마다 (전체 처리 시간, 앱 실행 시간)을 받는 콜백 (브리지 오버헤드 측정용)
+        self.observer = observer
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # lifespan에서 채워지는 앱 상태 (uvicorn과 동일하게 요청마다 얕은 복사로 전달)
+        self._state: Dict[str, Any] = {}
+        self._lifespan_receive: Optional[asyncio.Queue] = None
+        self._lifespan_task: Optional[asyncio.Task] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """영구 이벤트 루프 반환 (최초 호출 시 루프 스레드 시작 + lifespan startup 실행)"""
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    self._start()
+        return self._loop
+
+    def _start(self):
+        """백그라운드 스레드에서 이벤트 루프를 띄우고 앱 startup 완료까지 대기"""
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name="asgi-adapter-loop", daemon=True)
+        thread.start()
+        asyncio.run_coroutine_threadsafe(self._startup(), loop).result(self.startup_timeout)
+        self._thread = thread
+        self._loop = loop
+        atexit.register(self.close)
+
+    async def _startup(self):
+        """ASGI lifespan 프로토콜로 앱 startup 이벤트 실행"""
+        self._lifespan_receive = asyncio.Queue()
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            return await self._lifespan_receive.get()
+
+        async def send(message):
+            if message["type"] == "lifespan.startup.complete" and not started.done():
+                started.set_result(None)
+            elif message["type"] == "lifespan.startup.failed" and not started.done():
+                started.set_exception(RuntimeError(message.get("message", "lifespan startup failed")))
+
+        async def run():
+            scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": self._state}
+            try:
+                await self.app(scope, receive, send)
+            except Exception:
+                # lifespan을 지원하지 않는 앱은 startup 없이 진행
+                pass
+            finally:
+                if not started.done():
+                    started.set_result(None)
+
+        await self._lifespan_receive.put({"type": "lifespan.startup"})
+        self._lifespan_task = asyncio.create_task(run())
+        await started
+
+    async def _shutdown(self):
+        """ASGI lifespan shutdown 이벤트 실행"""
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_receive.put({"type": "lifespan.shutdown"})
+        try:
+            await asyncio.wait_for(self._lifespan_task, timeout=self.startup_timeout)
+        except Exception:
+            pass
+
+    def close(self):
+        """앱 shutdown 후 이벤트 루프 정지 (프로세스 종료 시 자동 호출)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(self.startup_timeout)
+            except Exception:
+                pass
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=self.startup_timeout)
+                self._thread = None
+
+    def warmup(self, paths: Tuple[str, ...] = ("/",)):
+        """
+        인스턴스 시작 시점에 lifespan startup과 가상 GET 요청을 미리 실행
+        (미들웨어 스택 구성, HTTP 클라이언트 생성 등 첫 요청에 몰리던 초기화 비용 제거)
+        """
+        loop = self.loop
+        for path in paths:
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0", "spec_version": "2.3"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode("utf-8"),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"host", b"localhost"), (b"user-agent", b"warmup")],
+                "client": ("127.0.0.1", 0),
+                "server": ("localhost", 80),
+                "state": self._state.copy(),
+            }
+            asyncio.run_coroutine_threadsafe(self._call(scope, b""), loop).result(self.startup_timeout)
+
+    def build_scope(self, request) -> Dict[str, Any]:
+        """Flask(werkzeug) 요청을 ASGI HTTP scope로 변환"""
+        environ = request.environ
+        server_port = environ.get("SERVER_PORT")
+        client_port = environ.get("REMOTE_PORT")
+        path = request.path or "/"
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": environ.get("SERVER_PROTOCOL", "HTTP/1.1").split("/")[-1],
+            "method": request.method.upper(),
+            "scheme": request.scheme,
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": request.query_string,
+            "root_path": "",
+            # 헤더는 재인코딩 없이 latin-1 바이트로 그대로 전달
+            "headers": [
+                (key.lower().encode("latin-1"), value.encode("latin-1"))
+                for key, value in request.headers.items()
+            ],
+            "client": (request.remote_addr or "", int(client_port) if client_port else 0),
+            "server": (environ.get("SERVER_NAME", "localhost"), int(server_port) if server_port else 80),
+            "state": self._state.copy(),
+        }
+
+    async def _call(self, scope: Dict[str, Any], body: bytes) -> Tuple[int, List[Tuple[str, str]], bytes, float]:
+        """ASGI 앱 1회 호출 후 (상태코드, 헤더, 본문, 앱 실행 시간) 반환"""
+        status = 500
+        headers: List[Tuple[str, str]] = []
+        chunks: List[bytes] = []
+        request_sent = False
+        response_done = asyncio.Event()
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # 본문 전송 후에는 응답이 끝날 때까지 대기하다가 연결 종료 알림
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers.extend(
+                    (key.decode("latin-1"), value.decode("latin-1"))
+                    for key, value in message.get("headers", [])
+                )
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_done.set()
+        return status, headers, b"".join(chunks), time.perf_counter() - started
+
+    def __call__(self, request):
+        """Functions Framework 요청 처리 - Flask 응답 튜플 (본문, 상태코드, 헤더) 반환"""
+        started = time.perf_counter()
+        scope = self.build_scope(request)
+        body = request.get_data(cache=False)
+        future = asyncio.run_coroutine_threadsafe(self._call(scope, body), self.loop)
+        status, headers, content, app_seconds = future.result()
+        if self.observer is not None:
+            self.observer(time.perf_counter() - started, app_seconds)
+        return content, status, headers
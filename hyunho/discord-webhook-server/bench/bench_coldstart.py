@@ -0,0 +1,96 @@
+# 콜드 스타트 벤치마크 + 회귀 검사
+# 새 프로세스에서 main을 import(`python -X importtime`)하고 첫 요청/두 번째 요청 지연을 측정
+# 예산(budget)을 넘으면 종료 코드 1 반환 (CI에서 회귀 감지용)
+#
+# 실행: python bench/bench_coldstart.py [--runs 5] [--budget-ms 2000] [--first-request-ms 5]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# 자식 프로세스: import 시간과 첫/두 번째 요청 시간을 JSON으로 출력
+CHILD = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from flask import Flask, Request
+from werkzeug.test import EnvironBuilder
+def timed():
+    request = Request(EnvironBuilder(method="GET", path="/").get_environ())
+    t = time.perf_counter()
+    main.discord_webhook(request)
+    return (time.perf_counter() - t) * 1000
+with Flask("coldstart").app_context():
+    first = timed()
+    second = timed()
+print(json.dumps({"import_ms": (imported - started) * 1000, "first_ms": first, "second_ms": second}))
+"""
+
+
+def run_child(env):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(output.stdout.strip().splitlines()[-1])
+
+    # importtime 출력(stderr): "import time: self [us] | cumulative | imported package"
+    self_times = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        self_times[name.strip()] = int(self_us)
+    return result, self_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark for the webhook Cloud Function")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("COLDSTART_BUDGET_MS", 2000)),
+                        help="import + 첫 요청 합계 예산 (중앙값 기준)")
+    parser.add_argument("--first-request-ms", type=float, default=float(os.getenv("COLDSTART_FIRST_REQUEST_MS", 5)),
+                        help="첫 요청 지연 예산 (중앙값 기준)")
+    parser.add_argument("--top", type=int, default=10, help="self 시간이 큰 모듈 출력 개수")
+    args = parser.parse_args()
+
+    # Cloud Functions 런타임과 동일하게 import 시점 워밍업 활성화
+    env = dict(os.environ, FUNCTION_TARGET="discord_webhook", WARMUP_ON_IMPORT="1")
+    results = []
+    module_times = defaultdict(list)
+    for _ in range(args.runs):
+        result, self_times = run_child(env)
+        results.append(result)
+        for name, us in self_times.items():
+            module_times[name].append(us)
+
+    median = {key: statistics.median(r[key] for r in results) for key in results[0]}
+    total = median["import_ms"] + median["first_ms"]
+    print(f"runs={args.runs} import={median['import_ms']:.1f}ms first_request={median['first_ms']:.2f}ms "
+          f"warm_request={median['second_ms']:.2f}ms total={total:.1f}ms")
+
+    print(f"\ntop {args.top} modules by self import time (median):")
+    heaviest = sorted(module_times.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, samples in heaviest[:args.top]:
+        print(f"  {statistics.median(samples) / 1000:>8.1f}ms  {name}")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"cold start {total:.1f}ms > budget {args.budget_ms:.0f}ms")
+    if median["first_ms"] > args.first_request_ms:
+        failures.append(f"first request {median['first_ms']:.2f}ms > budget {args.first_request_ms:.1f}ms")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK: within cold start budget")
+
+
+if __name__ == "__main__":
+    main()
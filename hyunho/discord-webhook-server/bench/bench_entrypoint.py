@@ -0,0 +1,72 @@
+# Cloud Functions 엔트리포인트 지연시간 벤치마크
+# 기존 요청별 TestClient 브리지 vs 영구 이벤트 루프 ASGI 어댑터의 p50/p99 비교
+#
+# 실행: python bench/bench_entrypoint.py [반복횟수]
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask, Request  # noqa: E402
+from werkzeug.test import EnvironBuilder  # noqa: E402
+
+from main import app, discord_webhook  # noqa: E402
+
+
+def legacy_bridge(request):
+    """변경 전 엔트리포인트 (요청마다 TestClient 생성)"""
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+    method = request.method.lower()
+    path = request.path
+    headers = dict(request.headers)
+    json_data = request.get_json(silent=True)
+    headers.pop('host', None)
+    if method == 'post':
+        response = client.post(path, json=json_data, headers=headers)
+    else:
+        response = client.get(path, headers=headers)
+    return response.json(), response.status_code, {'Content-Type': 'application/json'}
+
+
+def make_request(method, path, json=None):
+    return Request(EnvironBuilder(method=method, path=path, json=json).get_environ())
+
+
+def measure(handler, method, path, json, iterations):
+    # 워밍업
+    handler(make_request(method, path, json))
+    samples = []
+    for _ in range(iterations):
+        request = make_request(method, path, json)
+        started = time.perf_counter()
+        handler(request)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    flask_app = Flask(__name__)
+    cases = [
+        ("GET", "/", None),
+        ("POST", "/api/webhooks/bench/register", {"webhook_url": "https://discord.com/api/webhooks/1/abc"}),
+    ]
+    print(f"{'case':<40} {'handler':<10} {'p50(ms)':>10} {'p99(ms)':>10}")
+    with flask_app.app_context():
+        for method, path, json in cases:
+            for name, handler in (("legacy", legacy_bridge), ("asgi", discord_webhook)):
+                result = measure(handler, method, path, json, iterations)
+                print(f"{method + ' ' + path:<40} {name:<10} {result['p50']:>10.3f} {result['p99']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# 아웃박스 기록 처리량 벤치마크
+# 버스트로 들어오는 append를 그룹 커밋(fsync 1회/배치)으로 처리할 때와 건별 커밋할 때 비교
+#
+# 실행: python bench/bench_outbox.py [동시기록수]
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from outbox import Outbox, OutboxConfig  # noqa: E402
+
+
+async def never_send(webhook_url, payload):
+    await asyncio.sleep(3600)
+
+
+async def measure(path, count, batch_size, commit_interval_ms):
+    outbox = Outbox(OutboxConfig(path=path, batch_size=batch_size, commit_interval_ms=commit_interval_ms, workers=0), never_send)
+    await outbox.start()
+    payload = {"content": "아웃박스 기록 테스트", "embeds": [{"title": "alert", "description": "x" * 200}]}
+    started = time.perf_counter()
+    await asyncio.gather(*(outbox.append("bench", "https://discord.com/api/webhooks/1/x", payload) for _ in range(count)))
+    elapsed = time.perf_counter() - started
+    stats = await outbox.stats()
+    await outbox.stop()
+    return elapsed, stats
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'mode':<14} {'elapsed(s)':>10} {'appends/s':>10} {'commits':>8} {'avg batch':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, batch_size, interval in (("per-append", 1, 0.0), ("group-commit", 100, 5.0)):
+            elapsed, stats = await measure(os.path.join(tmp, f"{name}.db"), count, batch_size, interval)
+            print(f"{name:<14} {elapsed:>10.3f} {count / elapsed:>10.0f} {stats['group_commits']:>8} {stats['avg_batch_size']:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+# 페이로드 직렬화 마이크로벤치마크
+# 임베드 크기별로 기존 경로(build_payload + 기본 json.dumps)와 새 경로(encode_payload, orjson) 비교
+# 새 경로의 출력이 기존 페이로드와 키 순서까지 동일한지 먼저 검증
+#
+# 실행: python bench/bench_payload.py [반복횟수]
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from webhook import WebhookMessage, webhook_manager  # noqa: E402
+
+
+def legacy_build_payload(message):
+    """변경 전 build_payload (출력 기준값)"""
+    payload = {}
+
+    # 기본 메시지 필드들
+    if message.content:
+        payload["content"] = message.content
+    if message.username:
+        payload["username"] = message.username
+    if message.avatar_url:
+        payload["avatar_url"] = message.avatar_url
+    if message.tts:
+        payload["tts"] = message.tts
+
+    # 임베드 처리
+    if message.embeds:
+        embeds_data = []
+        for embed in message.embeds:
+            embed_dict = {}
+
+            # 기본 임베드 필드들
+            if embed.title:
+                embed_dict["title"] = embed.title
+            if embed.description:
+                embed_dict["description"] = embed.description
+            if embed.url:
+                embed_dict["url"] = embed.url
+            if embed.color:
+                embed_dict["color"] = embed.color
+            if embed.timestamp:
+                embed_dict["timestamp"] = embed.timestamp
+
+            # 복합 객체들
+            if embed.footer:
+                footer_dict = {"text": embed.footer.text}
+                if embed.footer.icon_url:
+                    footer_dict["icon_url"] = embed.footer.icon_url
+                embed_dict["footer"] = footer_dict
+
+            if embed.author:
+                author_dict = {"name": embed.author.name}
+                if embed.author.url:
+                    author_dict["url"] = embed.author.url
+                if embed.author.icon_url:
+                    author_dict["icon_url"] = embed.author.icon_url
+                embed_dict["author"] = author_dict
+
+            if embed.image:
+                embed_dict["image"] = embed.image
+            if embed.thumbnail:
+                embed_dict["thumbnail"] = embed.thumbnail
+
+            # 필드 목록
+            if embed.fields:
+                fields_data = []
+                for field in embed.fields:
+                    fields_data.append({
+                        "name": field.name,
+                        "value": field.value,
+                        "inline": field.inline
+                    })
+                embed_dict["fields"] = fields_data
+
+            embeds_data.append(embed_dict)
+
+        payload["embeds"] = embeds_data
+
+    return payload
+
+
+def make_message(embeds, fields):
+    return WebhookMessage(
+        content="🚨 배포 파이프라인 알림",
+        username="CI Bot",
+        avatar_url="https://example.com/avatar.png",
+        embeds=[
+            {
+                "title": f"빌드 #{i}",
+                "description": "변경 사항 요약\n" * 5,
+                "url": "https://example.com/builds/1",
+                "color": 0x00FF00,
+                "timestamp": "2024-01-01T00:00:00Z",
+                "footer": {"text": "CI/CD Bot", "icon_url": "https://example.com/icon.png"},
+                "author": {"name": "octocat", "url": "https://github.com/octocat"},
+                "thumbnail": {"url": "https://example.com/thumb.png"},
+                "fields": [
+                    {"name": f"항목 {j}", "value": f"값 {j} \"quoted\" \u2028", "inline": j % 2 == 0}
+                    for j in range(fields)
+                ],
+            }
+            for i in range(embeds)
+        ],
+    )
+
+
+CASES = {
+    "text-only": make_message(0, 0),
+    "1 embed x 5 fields": make_message(1, 5),
+    "3 embeds x 10 fields": make_message(3, 10),
+    "10 embeds x 25 fields": make_message(10, 25),
+}
+
+
+def legacy_encode(message):
+    # 변경 전 httpx(json=...)가 하던 직렬화
+    return json.dumps(legacy_build_payload(message)).encode("utf-8")
+
+
+def verify(message):
+    expected = json.dumps(legacy_build_payload(message), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert webhook_manager.encode_payload(message) == expected, "encode_payload 출력이 기존과 다름"
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for message in CASES.values():
+        verify(message)
+
+    encoders = [("legacy", legacy_encode), ("orjson", webhook_manager.encode_payload)]
+
+    print(f"{'case':<24} " + " ".join(f"{name + '(us)':>12}" for name, _ in encoders) + f" {'bytes':>8}")
+    for case, message in CASES.items():
+        timings = [
+            min(timeit.repeat(lambda: encode(message), number=iterations, repeat=3)) / iterations * 1e6
+            for _, encode in encoders
+        ]
+        size = len(webhook_manager.encode_payload(message))
+        print(f"{case:<24} " + " ".join(f"{t:>12.2f}" for t in timings) + f" {size:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# 레이트리밋 스케줄러 검증/벤치마크
+# X-RateLimit-* 헤더를 내려주는 로컬 스텁에 버스트 전송 후 성공률과 대기 메트릭 확인
+#
+# 실행: python bench/bench_ratelimit.py [메시지수] [윈도우당한도] [윈도우초]
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import httpx  # noqa: E402
+
+from stub_discord import RateLimitedStubDiscordServer  # noqa: E402
+from webhook import DiscordWebhookManager, TransportConfig, WebhookMessage  # noqa: E402
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    window = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    server = RateLimitedStubDiscordServer(limit=limit, window=window)
+    await server.start()
+    message = WebhookMessage(content="버스트 테스트")
+
+    # 스케줄러 없이 버스트 전송 (변경 전 동작)
+    async with httpx.AsyncClient() as client:
+        responses = await asyncio.gather(
+            *(client.post(server.webhook_url("raw"), json={"content": "x"}) for _ in range(count))
+        )
+    raw_failed = sum(r.status_code == 429 for r in responses)
+
+    # 스케줄러 경유 전송
+    manager = DiscordWebhookManager(TransportConfig(rate_limit_max_retries=count))
+    manager.register_webhook("hot", server.webhook_url("scheduled"))
+    await manager.startup()
+    server.rate_limited = 0
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(manager.send_webhook("hot", message) for _ in range(count)), return_exceptions=True
+    )
+    elapsed = time.perf_counter() - started
+    await manager.shutdown()
+    await server.stop()
+
+    failed = sum(isinstance(r, Exception) for r in results)
+    print(f"messages={count} limit={limit}/{window}s (ideal ≈ {max(count - limit, 0) / limit * window:.2f}s)")
+    print(f"without scheduler: {count - raw_failed} ok, {raw_failed} rejected with 429")
+    print(f"with scheduler:    {count - failed} ok, {failed} failed in {elapsed:.2f}s, upstream 429s={server.rate_limited}")
+    print("scheduler stats:", manager.scheduler.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
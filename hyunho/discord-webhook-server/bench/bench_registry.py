@@ -0,0 +1,57 @@
+# 웹훅 저장소 검증/벤치마크
+# 여러 프로세스가 같은 SQLite 파일에 동시에 등록한 뒤 모든 프로세스에서 보이는지 확인하고,
+# 캐시를 거친 get_webhook_url 조회 시간을 측정
+#
+# 실행: python bench/bench_registry.py [프로세스수] [프로세스당등록수]
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from registry import SQLiteRegistryBackend, WebhookRegistry  # noqa: E402
+
+
+def register_many(path, worker, count):
+    registry = WebhookRegistry(SQLiteRegistryBackend(path), cache_ttl=0.1)
+    for i in range(count):
+        registry.register(f"w{worker}-{i}", f"https://discord.com/api/webhooks/{worker}/{i}")
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_process = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "registry.db")
+        reader = WebhookRegistry(SQLiteRegistryBackend(path), cache_ttl=0.1)
+
+        started = time.perf_counter()
+        workers = [
+            multiprocessing.Process(target=register_many, args=(path, worker, per_process))
+            for worker in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        for process in workers:
+            process.join()
+            assert process.exitcode == 0, "등록 프로세스 실패"
+        elapsed = time.perf_counter() - started
+
+        time.sleep(0.15)  # 캐시 TTL 경과 후 다른 프로세스의 등록이 보여야 함
+        expected = processes * per_process
+        visible = sum(1 for name in reader.all() if name.startswith("w"))
+        print(f"{processes} processes x {per_process} registrations in {elapsed:.2f}s -> visible in reader: {visible}/{expected}")
+        assert visible == expected, "다른 프로세스의 등록이 보이지 않음"
+
+        iterations = 200000
+        per_lookup = timeit.timeit(lambda: reader.get("w0-0"), number=iterations) / iterations
+        print(f"cached lookup: {per_lookup * 1e9:.0f} ns/op (reloads={reader.reloads})")
+
+
+if __name__ == "__main__":
+    main()
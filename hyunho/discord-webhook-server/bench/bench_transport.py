@@ -0,0 +1,70 @@
+# Discord 전송 처리량 부하 테스트
+# 로컬 스텁 서버를 대상으로 기존 블로킹 requests 전송 vs 공유 httpx 커넥션 풀 전송 비교
+#
+# 실행: python bench/bench_transport.py [동시요청수] [스텁지연ms]
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from stub_discord import StubDiscordServer  # noqa: E402
+from webhook import DiscordWebhookManager, TransportConfig, WebhookMessage  # noqa: E402
+
+
+class LegacyWebhookManager(DiscordWebhookManager):
+    """변경 전 전송 방식 (async 함수 안에서 블로킹 requests.post 호출)"""
+
+    async def send_webhook(self, identifier, message):
+        import requests
+
+        payload = self.build_payload(message)
+        response = requests.post(self.get_webhook_url(identifier), json=payload, timeout=10)
+        response.raise_for_status()
+        return {"status": "success"}
+
+
+async def run(manager, identifier, message, concurrency):
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(manager.send_webhook(identifier, message) for _ in range(concurrency)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - started
+    failures = sum(isinstance(r, Exception) for r in results)
+    return elapsed, failures
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    # 기존 방식은 이벤트 루프를 막으므로 스텁 서버는 별도 스레드에서 실행
+    server = StubDiscordServer(latency_ms=latency_ms)
+    server.start_in_thread()
+    message = WebhookMessage(content="부하 테스트 메시지")
+
+    # 스텁에는 전역 레이트리밋이 없으므로 전송 계층만 측정하도록 전역 상한 해제
+    managers = [("pooled-httpx", DiscordWebhookManager(TransportConfig(global_rate_limit=0)))]
+    try:
+        import requests  # noqa: F401
+        managers.insert(0, ("legacy-requests", LegacyWebhookManager()))
+    except ImportError:
+        print("requests 미설치 - 기존 방식 측정 생략")
+
+    print(f"concurrency={concurrency} stub_latency={latency_ms}ms")
+    print(f"{'transport':<18} {'elapsed(s)':>10} {'msg/s':>10} {'failed':>8}")
+    for name, manager in managers:
+        manager.register_webhook("stub", server.webhook_url())
+        await manager.startup()
+        elapsed, failures = await run(manager, "stub", message, concurrency)
+        await manager.shutdown()
+        print(f"{name:<18} {elapsed:>10.3f} {concurrency / elapsed:>10.1f} {failures:>8}")
+
+    server.stop_thread()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+# 로컬 Discord 웹훅 스텁 서버 (벤치마크/부하 테스트용)
+# HTTP/1.1 keep-alive를 지원하는 최소 asyncio 서버로, 지연시간과 레이트리밋 헤더를 설정할 수 있음
+#
+# 단독 실행: python bench/stub_discord.py --port 8099 --latency-ms 50 [--rate-limit 5 --window 2]
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+from typing import Optional
+
+
+class StubDiscordServer:
+    """POST /api/webhooks/... 요청에 204를 돌려주는 가짜 Discord 서버"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency_ms / 1000
+        self.request_count = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def webhook_url(self, webhook_id: str = "1", token: str = "stub") -> str:
+        return f"{self.base_url}/api/webhooks/{webhook_id}/{token}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self):
+        """별도 스레드의 이벤트 루프에서 서버 실행 (블로킹 클라이언트 측정용)"""
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, name="stub-discord", daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self.start(), loop).result()
+        self._thread_loop = loop
+
+    def stop_thread(self):
+        loop = self._thread_loop
+        if loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            self._thread_loop = None
+
+    async def respond(self, method: str, path: str, headers: dict, body: bytes):
+        """(상태코드, 추가 헤더, 본문) 반환 - 하위 클래스에서 동작 변경 가능"""
+        return 204, {}, b""
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.request_count += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, extra_headers, content = await self.respond(method, path, headers, body)
+
+                lines = [f"HTTP/1.1 {status} Stub", f"Content-Length: {len(content)}"]
+                if content:
+                    lines.append("Content-Type: application/json")
+                lines.extend(f"{key}: {value}" for key, value in extra_headers.items())
+                writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + content)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class RateLimitedStubDiscordServer(StubDiscordServer):
+    """웹훅 URL마다 고정 윈도우 레이트리밋을 흉내 내고 X-RateLimit-* 헤더를 내려주는 스텁"""
+
+    def __init__(self, *args, limit: int = 5, window: float = 2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limit = limit
+        self.window = window
+        self.rate_limited = 0
+        self._windows = {}  # path -> (윈도우 시작 시각, 사용 횟수)
+
+    async def respond(self, method, path, headers, body):
+        now = time.monotonic()
+        started, used = self._windows.get(path, (now, 0))
+        if now - started >= self.window:
+            started, used = now, 0
+        reset_after = self.window - (now - started)
+        rate_headers = {
+            "X-RateLimit-Bucket": f"stub-{abs(hash(path)) % 10**8}",
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+        }
+        if used >= self.limit:
+            self.rate_limited += 1
+            rate_headers.update({"X-RateLimit-Remaining": "0", "Retry-After": f"{reset_after:.3f}"})
+            content = json.dumps({"message": "You are being rate limited.", "retry_after": reset_after, "global": False})
+            return 429, rate_headers, content.encode()
+        self._windows[path] = (started, used + 1)
+        rate_headers["X-RateLimit-Remaining"] = str(self.limit - used - 1)
+        return 204, rate_headers, b""
+
+
+async def _serve(args):
+    if args.rate_limit:
+        server = RateLimitedStubDiscordServer(args.host, args.port, args.latency_ms, limit=args.rate_limit, window=args.window)
+    else:
+        server = StubDiscordServer(args.host, args.port, args.latency_ms)
+    await server.start()
+    print(f"Stub Discord listening on {server.webhook_url()}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local Discord webhook stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="윈도우당 허용 요청 수 (0이면 비활성화)")
+    parser.add_argument("--window", type=float, default=2.0, help="레이트리밋 윈도우 (초)")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
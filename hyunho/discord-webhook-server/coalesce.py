@@ -0,0 +1,286 @@
+# 웹훅 메시지 묶음 전송(coalescing) 모듈
+# 짧은 시간 창 안에 같은 웹훅으로 들어온 메시지들을 Discord 한도 내에서 최소 개수의 페이로드로 합쳐 전송
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from pydantic import BaseModel
+
+# Discord 웹훅 한도
+MAX_CONTENT_LENGTH = 2000  # content 최대 글자 수
+MAX_EMBEDS = 10  # 메시지당 임베드 수
+MAX_EMBED_TOTAL_CHARS = 6000  # 메시지 내 임베드 전체 글자 수
+MAX_EMBED_DESCRIPTION = 4096  # 임베드 설명 최대 글자 수
+MAX_EMBED_FIELDS = 25  # 임베드당 필드 수
+MAX_EMBED_TITLE = 256  # 임베드 제목
+MAX_FIELD_NAME = 256  # 필드 이름
+MAX_FIELD_VALUE = 1024  # 필드 값
+MAX_FOOTER_TEXT = 2048  # 푸터 텍스트
+MAX_AUTHOR_NAME = 256  # 작성자 이름
+CONTINUED_FIELD_NAME = "\u200b"  # 나뉜 필드 값의 이어지는 필드 이름 (Discord는 빈 이름을 허용하지 않음)
+
+
+# 웹훅별 묶음 전송 설정
+class CoalesceConfig(BaseModel):
+    window_ms: float = 250.0  # 첫 메시지 도착 후 기다리는 시간 (ms)
+    max_messages: int = 50  # 이 개수가 모이면 시간 창과 무관하게 즉시 전송
+
+
+def _split_text(text: str, limit: int) -> List[str]:
+    """limit 글자 이하 조각으로 분할 (가능하면 줄바꿈 기준)"""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+def _embed_chars(embed: Dict[str, Any]) -> int:
+    """Discord가 6000자 한도 계산에 포함하는 임베드 글자 수"""
+    total = len(embed.get("title", "")) + len(embed.get("description", ""))
+    total += len(embed.get("footer", {}).get("text", ""))
+    total += len(embed.get("author", {}).get("name", ""))
+    for field in embed.get("fields", []):
+        total += len(field.get("name", "")) + len(field.get("value", ""))
+    return total
+
+
+def _truncate(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def _fits(embed: Dict[str, Any]) -> bool:
+    """임베드 하나가 Discord 한도를 모두 지키는지 여부"""
+    fields = embed.get("fields", [])
+    return (
+        len(embed.get("description", "")) <= MAX_EMBED_DESCRIPTION
+        and len(fields) <= MAX_EMBED_FIELDS
+        and len(embed.get("title", "")) <= MAX_EMBED_TITLE
+        and len(embed.get("footer", {}).get("text", "")) <= MAX_FOOTER_TEXT
+        and len(embed.get("author", {}).get("name", "")) <= MAX_AUTHOR_NAME
+        and all(len(f.get("name", "")) <= MAX_FIELD_NAME and len(f.get("value", "")) <= MAX_FIELD_VALUE for f in fields)
+        and _embed_chars(embed) <= MAX_EMBED_TOTAL_CHARS
+    )
+
+
+def split_embed(embed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Discord 한도를 넘는 임베드를 여러 개의 연속 임베드로 분할
+    - 설명은 4096자, 필드 값은 1024자 조각으로 나누고 임베드당 필드 25개 / 전체 6000자를 지킴
+    - 분할할 수 없는 제목/작성자/푸터/필드 이름은 한도에 맞게 자름
+    """
+    if _fits(embed):
+        return [embed]
+
+    # 첫 임베드에는 원본의 나머지 속성을, 이어지는 임베드에는 색상만 유지
+    first = {k: v for k, v in embed.items() if k not in ("description", "fields")}
+    if "title" in first:
+        first["title"] = _truncate(first["title"], MAX_EMBED_TITLE)
+    if "footer" in first:
+        first["footer"] = {**first["footer"], "text": _truncate(first["footer"].get("text", ""), MAX_FOOTER_TEXT)}
+    if "author" in first:
+        first["author"] = {**first["author"], "name": _truncate(first["author"].get("name", ""), MAX_AUTHOR_NAME)}
+
+    def continuation() -> Dict[str, Any]:
+        return {"color": embed["color"]} if "color" in embed else {}
+
+    # 설명 조각은 첫 임베드의 제목/작성자/푸터와 합쳐도 전체 한도 안에 들도록 크기 제한
+    description_limit = min(MAX_EMBED_DESCRIPTION, MAX_EMBED_TOTAL_CHARS - _embed_chars(first))
+    parts = [first]
+    for index, description in enumerate(_split_text(embed.get("description", ""), description_limit)):
+        if index > 0:
+            parts.append(continuation())
+        parts[-1]["description"] = description
+
+    chars = _embed_chars(parts[-1])
+    for field in embed.get("fields", []):
+        values = _split_text(field.get("value", ""), MAX_FIELD_VALUE) or [field.get("value", "")]
+        for index, value in enumerate(values):
+            piece = {
+                "name": _truncate(field.get("name", ""), MAX_FIELD_NAME) if index == 0 else CONTINUED_FIELD_NAME,
+                "value": value,
+                "inline": field.get("inline", False),
+            }
+            size = len(piece["name"]) + len(value)
+            if len(parts[-1].get("fields", [])) >= MAX_EMBED_FIELDS or chars + size > MAX_EMBED_TOTAL_CHARS:
+                parts.append(continuation())
+                chars = 0
+            parts[-1].setdefault("fields", []).append(piece)
+            chars += size
+    return parts
+
+
+def pack_payloads(payloads: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], List[int]]]:
+    """
+    같은 작성자(username/avatar/tts)의 페이로드들을 Discord 한도 내에서 최소 개수로 합침
+    반환: [(합쳐진 페이로드, 포함된 원본 인덱스 목록)]
+    """
+    if not payloads:
+        return []
+    common = {k: payloads[0][k] for k in ("username", "avatar_url", "tts") if k in payloads[0]}
+    packed: List[Tuple[Dict[str, Any], List[int]]] = []
+    content: List[str] = []
+    content_length = 0
+    embeds: List[Dict[str, Any]] = []
+    embed_chars = 0
+    sources: List[int] = []
+
+    def finish():
+        nonlocal content, content_length, embeds, embed_chars, sources
+        if content or embeds:
+            payload = dict(common)
+            if content:
+                payload["content"] = "\n".join(content)
+            if embeds:
+                payload["embeds"] = embeds
+            packed.append((payload, sources))
+        content, content_length, embeds, embed_chars, sources = [], 0, [], 0, []
+
+    for index, payload in enumerate(payloads):
+        for chunk in _split_text(payload.get("content", ""), MAX_CONTENT_LENGTH):
+            added = len(chunk) + (1 if content else 0)
+            if content_length + added > MAX_CONTENT_LENGTH:
+                finish()
+                added = len(chunk)
+            content.append(chunk)
+            content_length += added
+            if index not in sources:
+                sources.append(index)
+        for original in payload.get("embeds", []):
+            for embed in split_embed(original):
+                chars = _embed_chars(embed)
+                if len(embeds) >= MAX_EMBEDS or embed_chars + chars > MAX_EMBED_TOTAL_CHARS:
+                    finish()
+                embeds.append(embed)
+                embed_chars += chars
+                if index not in sources:
+                    sources.append(index)
+    finish()
+    return packed
+
+
+class _PendingGroup:
+    def __init__(self):
+        self.payloads: List[Dict[str, Any]] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.Task] = None
+
+
+class MessageCoalescer:
+    """웹훅 식별자별 시간 창 동안 메시지를 모아 묶음 전송"""
+
+    def __init__(self, send: Callable[[str, Dict[str, Any]], Awaitable[Any]]):
+        self.send = send  # (webhook_url, payload) -> 응답
+        self.configs: Dict[str, CoalesceConfig] = {}  # 식별자 -> 설정 (등록된 식별자만 묶음 전송)
+        self._pending: Dict[Tuple, _PendingGroup] = {}
+        self._tasks: Set[asyncio.Task] = set()  # 실행 중인 전송 태스크 (GC 방지용 참조)
+
+        # 메트릭
+        self.messages_in = 0
+        self.payloads_out = 0
+        self.split_payloads = 0  # 분할로 인해 추가된 페이로드 수
+
+    def load_from_env(self):
+        """환경변수 COALESCE_<이름>=window_ms[:max_messages] 로 설정 로드"""
+        for key, value in os.environ.items():
+            if key.startswith("COALESCE_"):
+                window, _, max_messages = value.partition(":")
+                config = CoalesceConfig(window_ms=float(window))
+                if max_messages:
+                    config.max_messages = int(max_messages)
+                self.configs[key[len("COALESCE_"):].lower()] = config
+
+    def configure(self, identifier: str, config: Optional[CoalesceConfig]):
+        """식별자별 묶음 전송 설정/해제 (None이면 해제)"""
+        if config is None:
+            self.configs.pop(identifier, None)
+        else:
+            self.configs[identifier] = config
+
+    def enabled(self, identifier: str) -> bool:
+        return identifier in self.configs
+
+    async def submit(self, identifier: str, webhook_url: str, payload: Dict[str, Any]) -> int:
+        """메시지를 묶음에 추가하고, 해당 메시지가 포함된 페이로드가 모두 전송되면 반환 (페이로드 수)"""
+        config = self.configs[identifier]
+        key = (identifier, webhook_url, payload.get("username"), payload.get("avatar_url"), payload.get("tts", False))
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = _PendingGroup()
+            group.timer = self._spawn(self._flush_later(key, config.window_ms / 1000))
+
+        future = asyncio.get_running_loop().create_future()
+        group.payloads.append(payload)
+        group.futures.append(future)
+        self.messages_in += 1
+        if len(group.payloads) >= config.max_messages:
+            group.timer.cancel()
+            self._spawn(self._flush(key))
+        return await future
+
+    def _spawn(self, coro: Awaitable[Any]) -> asyncio.Task:
+        """태스크를 만들고 끝날 때까지 참조 유지 (이벤트 루프는 약한 참조만 가짐)"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self, key: Tuple, delay: float):
+        await asyncio.sleep(delay)
+        await self._flush(key)
+
+    async def _flush(self, key: Tuple):
+        """모인 메시지를 합쳐 순서대로 전송하고 각 메시지의 대기자에게 결과 전달"""
+        group = self._pending.pop(key, None)
+        if group is None:
+            return
+        webhook_url = key[1]
+        sent_counts = [0] * len(group.payloads)
+        errors: Dict[int, BaseException] = {}
+        try:
+            packed = pack_payloads(group.payloads)
+            self.payloads_out += len(packed)
+            self.split_payloads += max(0, len(packed) - len(group.payloads))
+
+            for payload, sources in packed:
+                try:
+                    await self.send(webhook_url, payload)
+                    for index in sources:
+                        sent_counts[index] += 1
+                except Exception as e:
+                    for index in sources:
+                        errors.setdefault(index, e)
+        except Exception as e:
+            # 분할 실패 등 예상 밖 오류: 아직 결과가 없는 대기자 모두에게 전달 (요청이 멈추지 않도록)
+            for index in range(len(group.futures)):
+                errors.setdefault(index, e)
+        except BaseException:
+            # 취소(종료 중 등)된 경우에도 대기자가 멈추지 않도록 오류로 끝냄
+            for index in range(len(group.futures)):
+                errors.setdefault(index, RuntimeError("묶음 전송이 취소됨"))
+            raise
+        finally:
+            for index, future in enumerate(group.futures):
+                if future.done():
+                    continue
+                if index in errors:
+                    future.set_exception(errors[index])
+                else:
+                    future.set_result(sent_counts[index])
+
+    def stats(self) -> Dict[str, Any]:
+        """묶음 전송 메트릭 (packing_ratio = 입력 메시지 수 / 실제 API 호출 수)"""
+        return {
+            "enabled_webhooks": sorted(self.configs),
+            "pending_messages": sum(len(g.payloads) for g in self._pending.values()),
+            "messages_in": self.messages_in,
+            "payloads_out": self.payloads_out,
+            "split_payloads": self.split_payloads,
+            "packing_ratio": round(self.messages_in / self.payloads_out, 3) if self.payloads_out else None,
+        }
@@ -0,0 +1,145 @@
+# 비동기(fire-and-forget) 웹훅 전송 대기열
+# 요청은 검증 후 대기열에 넣고 즉시 202를 반환, 백그라운드 워커들이 Discord로 전송
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from webhook import WebhookMessage
+
+
+class QueueFullError(Exception):
+    """대기열이 가득 차서 전송을 받을 수 없을 때 발생"""
+
+
+# 전송 상태 기록 모델
+class DeliveryRecord(BaseModel):
+    delivery_id: str  # 전송 ID
+    identifier: str  # 웹훅 식별자
+    status: str = "queued"  # queued|sending|delivered|failed
+    created_at: float  # 접수 시각 (epoch 초)
+    completed_at: Optional[float] = None  # 완료 시각 (epoch 초)
+    error: Optional[str] = None  # 실패 사유
+
+
+class DeliveryQueue:
+    """메모리 내 제한 대기열 + 전송 워커 풀"""
+
+    def __init__(
+        self,
+        send: Callable[[str, WebhookMessage], Awaitable[Any]],
+        max_size: int = 1000,
+        workers: int = 8,
+        max_records: int = 10000,
+        drain_timeout: float = 10.0,
+    ):
+        self.send = send
+        self.max_size = max_size
+        self.worker_count = workers
+        self.max_records = max_records
+        self.drain_timeout = drain_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._workers: List[asyncio.Task] = []
+        self._records: "OrderedDict[str, DeliveryRecord]" = OrderedDict()  # 오래된 기록부터 정리
+        self._accepting = True
+
+    @classmethod
+    def from_env(cls, send: Callable[[str, WebhookMessage], Awaitable[Any]]) -> "DeliveryQueue":
+        """환경변수(DELIVERY_*)에서 설정 로드"""
+        return cls(
+            send,
+            max_size=int(os.getenv("DELIVERY_QUEUE_SIZE", 1000)),
+            workers=int(os.getenv("DELIVERY_WORKERS", 8)),
+            max_records=int(os.getenv("DELIVERY_MAX_RECORDS", 10000)),
+            drain_timeout=float(os.getenv("DELIVERY_DRAIN_TIMEOUT", 10.0)),
+        )
+
+    def _ensure_workers(self):
+        """워커가 없으면 현재 이벤트 루프에서 워커 풀 시작"""
+        if not self._workers:
+            self._accepting = True
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"delivery-worker-{i}")
+                for i in range(self.worker_count)
+            ]
+
+    async def start(self):
+        """앱 시작 시 워커 풀 기동"""
+        self._ensure_workers()
+
+    def submit(self, identifier: str, message: WebhookMessage) -> DeliveryRecord:
+        """전송 요청을 대기열에 추가 (가득 찼거나 종료 중이면 QueueFullError)"""
+        if not self._accepting:
+            raise QueueFullError("서버 종료 중")
+        self._ensure_workers()
+        record = DeliveryRecord(
+            delivery_id=os.urandom(16).hex(),
+            identifier=identifier,
+            created_at=time.time(),
+        )
+        try:
+            self._queue.put_nowait((record, message))
+        except asyncio.QueueFull:
+            raise QueueFullError("전송 대기열이 가득 찼습니다")
+        self._records[record.delivery_id] = record
+        while len(self._records) > self.max_records:
+            self._records.popitem(last=False)
+        return record
+
+    def get(self, delivery_id: str) -> Optional[DeliveryRecord]:
+        """전송 상태 조회"""
+        return self._records.get(delivery_id)
+
+    async def _worker(self):
+        while True:
+            record, message = await self._queue.get()
+            try:
+                record.status = "sending"
+                await self.send(record.identifier, message)
+                record.status = "delivered"
+            except asyncio.CancelledError:
+                record.status = "failed"
+                record.error = "서버 종료로 전송이 중단됨"
+                raise
+            except Exception as e:
+                record.status = "failed"
+                record.error = str(e)
+            finally:
+                record.completed_at = time.time()
+                self._queue.task_done()
+
+    async def stop(self):
+        """새 요청 접수를 멈추고 남은 전송을 drain_timeout 동안 처리한 뒤 워커 종료"""
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # 시간 내에 처리하지 못한 전송은 실패로 기록
+        while not self._queue.empty():
+            record, _ = self._queue.get_nowait()
+            record.status = "failed"
+            record.error = "서버 종료로 전송되지 않음"
+            record.completed_at = time.time()
+            self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """대기열 깊이 및 상태별 건수"""
+        counts: Dict[str, int] = {}
+        for record in self._records.values():
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.max_size,
+            "workers": len(self._workers),
+            "statuses": counts,
+        }
@@ -1,20 +1,67 @@
 # Discord Webhook Server - Google Cloud Functions 배포용
 # FastAPI + Functions Framework로 구현
 
+import os
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Optional
+
 import functions_framework
-from fastapi import FastAPI, HTTPException
-import requests.exceptions
-from webhook import WebhookMessage, webhook_manager
+import httpx
+from fastapi import FastAPI, HTTPException, Header, Query
+from fastapi.responses import JSONResponse, Response
+import metrics
+from asgi_adapter import ASGIAdapter
+from webhook import BatchRequest, WebhookMessage, webhook_manager
+from coalesce import CoalesceConfig
+from delivery import DeliveryQueue, QueueFullError
+
+if TYPE_CHECKING:
+    from outbox import Outbox
 
 # Google Cloud Functions는 환경변수를 자동으로 로드하므로 dotenv 불필요
 
+# 비동기 전송 모드용 대기열 (백그라운드 워커가 webhook_manager로 전송)
+delivery_queue = DeliveryQueue.from_env(webhook_manager.send_webhook)
+
+# 영속 아웃박스 (OUTBOX_PATH 설정 시에만 사용, 실패한 전송을 디스크에 기록 후 재시도)
+# 사용하지 않으면 모듈(sqlite3 등)을 아예 import하지 않아 콜드 스타트 비용을 줄임
+outbox: Optional["Outbox"] = None
+if os.getenv("OUTBOX_PATH"):
+    from outbox import Outbox, is_retryable
+    outbox = Outbox.from_env(webhook_manager.send_payload)
+
+# 앱 수명주기: 시작 시 HTTP 커넥션 풀/전송 워커 생성, 종료 시 남은 전송 처리 후 정리
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await webhook_manager.startup()
+    await delivery_queue.start()
+    if outbox is not None:
+        await outbox.start()
+    yield
+    if outbox is not None:
+        await outbox.stop()
+    await delivery_queue.stop()
+    await webhook_manager.shutdown()
+
+def require_outbox() -> "Outbox":
+    if outbox is None:
+        raise HTTPException(
+            status_code=404,
+            detail="아웃박스가 비활성화되어 있습니다 (OUTBOX_PATH 설정 필요)"
+        )
+    return outbox
+
 # FastAPI 앱 생성
 app = FastAPI(
     title="Discord Webhook Server",
     version="2.0.0",
-    description="Google Cloud Functions 기반 Discord 웹훅 서버"
+    description="Google Cloud Functions 기반 Discord 웹훅 서버",
+    lifespan=lifespan
 )
 
+# 라우트별 요청 지연 히스토그램 (순수 ASGI 미들웨어)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # 헬스 체크 엔드포인트
 @app.get("/")
 async def health_check():
@@ -35,12 +82,74 @@ async def list_webhooks():
     }
 
 # 웹훅 메시지 전송 (메인 기능)
+# ?async=true 또는 "Prefer: respond-async" 헤더가 있으면 대기열에 넣고 즉시 202 반환
 @app.post("/api/webhook/{identifier}")
-async def send_webhook(identifier: str, message: WebhookMessage):
+async def send_webhook(
+    identifier: str,
+    message: WebhookMessage,
+    async_mode: bool = Query(False, alias="async"),
+    prefer: Optional[str] = Header(None)
+):
+    if async_mode or (prefer and "respond-async" in prefer.lower()):
+        # 아웃박스가 켜져 있으면 디스크에 기록(그룹 커밋)한 뒤 202 반환
+        if outbox is not None:
+            delivery_id = await outbox.append(
+                identifier,
+                webhook_manager.get_webhook_url(identifier),
+                webhook_manager.build_payload(message)
+            )
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": "queued",
+                    "delivery_id": delivery_id,
+                    "status_url": f"/api/deliveries/{delivery_id}"
+                }
+            )
+        try:
+            record = delivery_queue.submit(identifier, message)
+        except QueueFullError as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": "1"}
+            )
+        return JSONResponse(
+            status_code=202,
+            content={
+                "status": "queued",
+                "delivery_id": record.delivery_id,
+                "status_url": f"/api/deliveries/{record.delivery_id}"
+            }
+        )
+    
     try:
         result = await webhook_manager.send_webhook(identifier, message)
         return result
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
+        # 아웃박스가 켜져 있으면 일시적 오류(타임아웃/연결 오류/429/5xx)는 기록 후 백그라운드 재시도
+        if outbox is not None and is_retryable(e):
+            delivery_id = await outbox.append(
+                identifier,
+                webhook_manager.get_webhook_url(identifier),
+                webhook_manager.build_payload(message)
+            )
+            return JSONResponse(
+                status_code=202,
+                content={
+                    "status": "retrying",
+                    "detail": f"Discord API 요청 실패, 재시도 예정: {str(e)}",
+                    "delivery_id": delivery_id,
+                    "status_url": f"/api/deliveries/{delivery_id}"
+                }
+            )
+        # 재시도 후에도 레이트리밋이 풀리지 않으면 429와 Retry-After 전달
+        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+            raise HTTPException(
+                status_code=429,
+                detail="Discord 레이트리밋 초과",
+                headers={"Retry-After": e.response.headers.get("retry-after", "1")}
+            )
         raise HTTPException(
             status_code=400, 
             detail=f"Discord API 요청 실패: {str(e)}"
@@ -51,6 +160,126 @@ async def send_webhook(identifier: str, message: WebhookMessage):
             detail=f"서버 내부 오류: {str(e)}"
         )
 
+# 비동기 전송 대기열 현황
+@app.get("/api/deliveries")
+async def delivery_stats():
+    return delivery_queue.stats()
+
+# 비동기 전송 상태 조회
+@app.get("/api/deliveries/{delivery_id}")
+async def get_delivery(delivery_id: str):
+    record = delivery_queue.get(delivery_id)
+    if record is None and outbox is not None:
+        record = await outbox.status(delivery_id)
+    if record is None:
+        raise HTTPException(
+            status_code=404,
+            detail="해당 전송 ID를 찾을 수 없습니다"
+        )
+    return record
+
+# 아웃박스 현황 (대기/재시도 중, dead-letter 건수, 그룹 커밋 통계)
+@app.get("/api/outbox/stats")
+async def outbox_stats():
+    return await require_outbox().stats()
+
+# dead-letter 목록 조회
+@app.get("/api/dead-letters")
+async def list_dead_letters(limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    return {"dead_letters": await require_outbox().dead_letters(limit, offset)}
+
+# dead-letter 전체 재전송
+@app.post("/api/dead-letters/replay")
+async def replay_dead_letters():
+    count = await require_outbox().replay()
+    return {"message": f"{count}건을 재전송 대기열에 넣었습니다", "replayed_count": count}
+
+# dead-letter 단건 재전송
+@app.post("/api/dead-letters/{delivery_id}/replay")
+async def replay_dead_letter(delivery_id: str):
+    count = await require_outbox().replay(delivery_id)
+    if not count:
+        raise HTTPException(
+            status_code=404,
+            detail="해당 dead-letter를 찾을 수 없습니다"
+        )
+    return {"message": "재전송 대기열에 넣었습니다", "delivery_id": delivery_id}
+
+# 여러 웹훅으로 한 번에 전송 (항목별 결과 반환)
+@app.post("/api/webhooks/batch")
+async def send_webhook_batch(batch: BatchRequest):
+    outcomes = await webhook_manager.send_batch(batch.items, batch.concurrency)
+    
+    results = []
+    for index, (item, outcome) in enumerate(zip(batch.items, outcomes)):
+        if not isinstance(outcome, Exception):
+            results.append({"index": index, "identifier": item.identifier, **outcome, "status_code": 200})
+            continue
+        # 단건 전송 엔드포인트와 동일한 상태코드 규칙 적용
+        if isinstance(outcome, httpx.HTTPStatusError) and outcome.response.status_code == 429:
+            status_code, detail = 429, "Discord 레이트리밋 초과"
+        elif isinstance(outcome, httpx.HTTPError):
+            status_code, detail = 400, f"Discord API 요청 실패: {str(outcome)}"
+        else:
+            status_code, detail = 500, f"서버 내부 오류: {str(outcome)}"
+        results.append({
+            "index": index,
+            "identifier": item.identifier,
+            "status": "error",
+            "status_code": status_code,
+            "detail": detail
+        })
+    
+    succeeded = sum(1 for r in results if r["status_code"] == 200)
+    return {
+        "total_count": len(results),
+        "success_count": succeeded,
+        "failure_count": len(results) - succeeded,
+        "results": results
+    }
+
+# 웹훅별 묶음 전송(coalescing) 설정
+@app.put("/api/webhooks/{name}/coalesce")
+async def enable_coalescing(name: str, config: CoalesceConfig):
+    webhook_manager.coalescer.configure(name, config)
+    return {
+        "message": f"웹훅 '{name}' 묶음 전송이 활성화되었습니다",
+        "webhook_name": name,
+        "config": config
+    }
+
+# 웹훅별 묶음 전송 해제
+@app.delete("/api/webhooks/{name}/coalesce")
+async def disable_coalescing(name: str):
+    webhook_manager.coalescer.configure(name, None)
+    return {
+        "message": f"웹훅 '{name}' 묶음 전송이 해제되었습니다",
+        "webhook_name": name
+    }
+
+# 묶음 전송 메트릭 (packing_ratio = 입력 메시지 수 / Discord API 호출 수)
+@app.get("/api/coalesce/stats")
+async def coalesce_stats():
+    return webhook_manager.coalescer.stats()
+
+# 레이트리밋 스케줄러 메트릭 (대기열 깊이, 대기 시간, 429 횟수)
+@app.get("/api/ratelimit/stats")
+async def ratelimit_stats():
+    return webhook_manager.scheduler.stats()
+
+# Prometheus 메트릭 (텍스트 포맷)
+# 대기열 깊이는 요청 경로에서 갱신하지 않고 스크랩 시점에 각 컴포넌트 상태에서 읽음
+@app.get("/metrics")
+async def prometheus_metrics():
+    metrics.QUEUE_DEPTH.labels("delivery").set(delivery_queue.stats()["queue_depth"])
+    metrics.QUEUE_DEPTH.labels("coalesce").set(webhook_manager.coalescer.stats()["pending_messages"])
+    metrics.QUEUE_DEPTH.labels("ratelimit").set(webhook_manager.scheduler.stats()["queue_depth"])
+    if outbox is not None:
+        stats = await outbox.stats()
+        metrics.QUEUE_DEPTH.labels("outbox").set(stats["pending"])
+        metrics.DEAD_LETTERS.set(stats["dead_letters"])
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 # 런타임 웹훅 등록
 @app.post("/api/webhooks/{name}/register")
 async def register_webhook(name: str, webhook_data: dict):
@@ -67,57 +296,29 @@ async def register_webhook(name: str, webhook_data: dict):
     }
 
 # Google Cloud Functions 엔트리포인트
+# 인스턴스당 하나의 이벤트 루프를 유지하며 요청을 ASGI로 직접 전달
+asgi_adapter = ASGIAdapter(app, observer=metrics.observe_bridge)
+
+# 모듈 로드(인스턴스 시작) 시점에 앱 초기화를 끝내 첫 요청도 웜 상태로 처리
+# Cloud Functions 런타임(FUNCTION_TARGET/K_SERVICE)에서는 기본 활성화, WARMUP_ON_IMPORT=1/0으로 강제 설정
+# (uvicorn 등 다른 서버로 app을 직접 띄울 때는 그 서버의 이벤트 루프에서 lifespan이 실행되어야 하므로 생략)
+_warmup = os.getenv("WARMUP_ON_IMPORT")
+if _warmup == "1" or (_warmup is None and (os.getenv("FUNCTION_TARGET") or os.getenv("K_SERVICE"))):
+    asgi_adapter.warmup()
+
 @functions_framework.http
 def discord_webhook(request):
     """
     Google Cloud Functions 진입점
     모든 HTTP 요청을 FastAPI 앱으로 라우팅
     """
-    from fastapi.testclient import TestClient
-    
-    # TestClient로 FastAPI 앱 테스트
-    client = TestClient(app)
-    
-    # 요청 정보 추출
-    method = request.method.lower()
-    path = request.path if hasattr(request, 'path') else '/'
-    headers = dict(request.headers) if hasattr(request, 'headers') else {}
-    
-    # JSON 데이터 처리
-    json_data = None
-    if hasattr(request, 'get_json'):
-        try:
-            json_data = request.get_json(silent=True)
-        except Exception:
-            pass
-    
-    # Content-Type 헤더 정리
-    headers.pop('host', None)  # TestClient가 자체 host를 사용
-    
     try:
-        # HTTP 메서드별 요청 처리
-        if method == 'post':
-            response = client.post(path, json=json_data, headers=headers)
-        elif method == 'get':
-            response = client.get(path, headers=headers)
-        elif method == 'put':
-            response = client.put(path, json=json_data, headers=headers)
-        elif method == 'delete':
-            response = client.delete(path, headers=headers)
-        else:
-            response = client.get(path, headers=headers)
-        
-        # Cloud Functions 응답 형식으로 반환
-        return (
-            response.json(),
-            response.status_code,
-            {'Content-Type': 'application/json'}
-        )
-        
+        # 원본 본문/헤더를 그대로 전달하고, 앱 응답도 재직렬화 없이 반환
+        return asgi_adapter(request)
     except Exception as e:
         # 에러 발생 시 기본 응답
         return (
             {"error": f"요청 처리 중 오류 발생: {str(e)}"},
             500,
             {'Content-Type': 'application/json'}
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,85 @@
+# Prometheus 메트릭 수집 모듈
+# 라우트별 요청 지연, Discord 호출 지연/상태(웹훅별), ASGI 브리지 오버헤드
+# 대기열 깊이 같은 현재 상태 값은 요청 경로에서 갱신하지 않고 /metrics 스크랩 시점에 읽어서 설정
+
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, disable_created_metrics, generate_latest
+
+# *_created 시계열은 스크랩 크기만 늘리므로 비활성화
+disable_created_metrics()
+
+# 마이크로초 단위 구간 (브리지 오버헤드)
+_FAST_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "HTTP 요청 처리 시간 (라우트 템플릿별)",
+    ["method", "route", "status"],
+)
+DISCORD_REQUEST_SECONDS = Histogram(
+    "discord_request_duration_seconds",
+    "Discord API 호출 1회 지연 (웹훅 ID별, 레이트리밋 대기 제외)",
+    ["webhook", "status"],
+)
+BRIDGE_OVERHEAD_SECONDS = Histogram(
+    "asgi_bridge_overhead_seconds",
+    "Functions Framework -> ASGI 앱 전달 오버헤드 (scope 변환 + 이벤트 루프 왕복)",
+    buckets=_FAST_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "webhook_queue_depth",
+    "대기열 깊이 (delivery: 비동기 전송, coalesce: 묶음 대기, ratelimit: 레이트리밋 대기, outbox: 재시도 대기)",
+    ["queue"],
+)
+DEAD_LETTERS = Gauge("webhook_outbox_dead_letters", "아웃박스 dead-letter 건수")
+
+
+def webhook_label(webhook_url: str) -> str:
+    """웹훅 URL에서 ID만 추출 (토큰은 메트릭에 남기지 않음)"""
+    _, _, rest = webhook_url.partition("/webhooks/")
+    return rest.split("/", 1)[0] or "unknown"
+
+
+def observe_bridge(total_seconds: float, app_seconds: float):
+    """ASGI 어댑터 콜백: 전체 처리 시간 중 앱 밖에서 쓴 시간 기록"""
+    BRIDGE_OVERHEAD_SECONDS.observe(max(0.0, total_seconds - app_seconds))
+
+
+def render() -> bytes:
+    """Prometheus 텍스트 포맷으로 현재 메트릭 출력"""
+    return generate_latest()
+
+
+class MetricsMiddleware:
+    """
+    요청 지연 히스토그램을 기록하는 순수 ASGI 미들웨어
+    (BaseHTTPMiddleware와 달리 응답 본문을 감싸지 않아 요청당 오버헤드가 작음)
+    라우트 레이블은 FastAPI가 scope["route"]에 넣는 라우트 템플릿(/api/webhook/{identifier})을 사용해 카디널리티를 제한
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route.path if route else "unmatched", str(status)).observe(
+                time.perf_counter() - started
+            )
+
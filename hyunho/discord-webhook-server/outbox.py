@@ -0,0 +1,381 @@
+# 영속 전송 아웃박스 (SQLite WAL)
+# 접수된 메시지를 디스크에 기록(그룹 커밋)한 뒤 백그라운드 워커가 전송하고,
+# 실패 시 지수 백오프 + 지터로 재시도, max_attempts를 넘으면 dead-letter 테이블로 이동
+
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+# 아웃박스 설정
+class OutboxConfig(BaseModel):
+    path: str = "/tmp/webhook-outbox.db"  # SQLite 파일 경로
+    max_attempts: int = 8  # 이 횟수를 넘으면 dead-letter로 이동
+    base_delay: float = 1.0  # 첫 재시도 기본 대기 (초)
+    max_delay: float = 300.0  # 재시도 대기 상한 (초)
+    workers: int = 4  # 전송 워커 수
+    batch_size: int = 100  # 워커가 한 번에 가져오는 건수 / 그룹 커밋 최대 건수
+    commit_interval_ms: float = 5.0  # 그룹 커밋 모으는 시간 (ms)
+    lease_seconds: float = 60.0  # 워커가 가져간 항목을 다른 워커가 다시 가져가기까지의 시간
+
+    @classmethod
+    def from_env(cls) -> "OutboxConfig":
+        """환경변수(OUTBOX_*)에서 설정 로드"""
+        values = {}
+        for field in cls.model_fields:
+            env_value = os.getenv(f"OUTBOX_{field.upper()}")
+            if env_value is not None:
+                values[field] = env_value
+        return cls(**values)
+
+
+def is_retryable(error: Exception) -> bool:
+    """재시도할 오류인지 판단 (타임아웃/연결 오류/429/5xx만 재시도, 잘못된 URL·페이로드 등 나머지는 즉시 dead-letter)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        status_code = error.response.status_code
+        return status_code == 429 or status_code >= 500
+    # UnsupportedProtocol은 TransportError지만 잘못된 URL이라 재시도해도 성공하지 않음
+    return isinstance(error, httpx.TransportError) and not isinstance(error, httpx.UnsupportedProtocol)
+
+
+class Outbox:
+    """SQLite 기반 전송 아웃박스 + 재시도 워커"""
+
+    def __init__(self, config: OutboxConfig, send: Callable[[str, Dict[str, Any]], Awaitable[Any]]):
+        self.config = config
+        self.send = send  # (webhook_url, payload) -> 응답
+        # DB 작업은 전용 스레드 하나에서 순서대로 실행 (이벤트 루프를 막지 않음)
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending_writes: List[Tuple[tuple, asyncio.Future]] = []
+        self._flush_scheduled = False
+        self._wake: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._running = False
+        self._delivered: "OrderedDict[str, float]" = OrderedDict()  # 최근 전송 완료 ID -> 완료 시각
+
+        # 메트릭
+        self.appended = 0
+        self.group_commits = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.worker_errors = 0
+
+    @classmethod
+    def from_env(cls, send: Callable[[str, Dict[str, Any]], Awaitable[Any]]) -> Optional["Outbox"]:
+        """OUTBOX_PATH가 설정된 경우에만 아웃박스 생성"""
+        if not os.getenv("OUTBOX_PATH"):
+            return None
+        return cls(OutboxConfig.from_env(), send)
+
+    # ---- DB (전용 스레드에서 실행) ----
+
+    def _open(self):
+        conn = sqlite3.connect(self.config.path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")  # 커밋마다 fsync (그룹 커밋으로 횟수를 줄임)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, identifier TEXT NOT NULL, webhook_url TEXT NOT NULL, payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (next_attempt_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letters ("
+            "id TEXT PRIMARY KEY, identifier TEXT NOT NULL, webhook_url TEXT NOT NULL, payload TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL, last_error TEXT, created_at REAL NOT NULL, failed_at REAL NOT NULL)"
+        )
+        self._conn = conn
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE ... COMMIT, 실패 시 ROLLBACK (공유 연결이 열린 트랜잭션에 갇히지 않도록)"""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _insert_batch(self, rows: List[tuple]):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (id, identifier, webhook_url, payload, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _claim_due(self, limit: int) -> Tuple[List[tuple], Optional[float]]:
+        """재시도 시각이 된 항목을 가져가며 lease 시간만큼 다른 워커가 못 가져가도록 표시"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, identifier, webhook_url, payload, attempts, created_at FROM outbox "
+                "WHERE next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                    [(now + self.config.lease_seconds, row[0]) for row in rows],
+                )
+            next_due = conn.execute("SELECT MIN(next_attempt_at) FROM outbox").fetchone()[0]
+        return rows, next_due
+
+    def _record_results(self, delivered: List[str], retries: List[tuple], dead: List[tuple], in_flight: List[str]):
+        """완료된 전송 결과 기록 + 아직 전송 중인 항목의 lease 연장을 하나의 트랜잭션으로 처리"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM outbox WHERE id = ?", [(entry_id,) for entry_id in delivered])
+            conn.executemany(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?", retries
+            )
+            for entry_id, attempts, error in dead:
+                conn.execute(
+                    "INSERT OR REPLACE INTO dead_letters (id, identifier, webhook_url, payload, attempts, last_error, created_at, failed_at) "
+                    "SELECT id, identifier, webhook_url, payload, ?, ?, created_at, ? FROM outbox WHERE id = ?",
+                    (attempts, error, now, entry_id),
+                )
+                conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+            conn.executemany(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ?",
+                [(now + self.config.lease_seconds, entry_id) for entry_id in in_flight],
+            )
+
+    def _replay(self, entry_id: Optional[str]) -> int:
+        """dead-letter 항목을 시도 횟수 0으로 아웃박스에 되돌림 (entry_id가 없으면 전체)"""
+        where, params = ("WHERE id = ?", (entry_id,)) if entry_id else ("", ())
+        with self._transaction() as conn:
+            count = conn.execute(
+                "INSERT OR REPLACE INTO outbox (id, identifier, webhook_url, payload, attempts, next_attempt_at, last_error, created_at) "
+                f"SELECT id, identifier, webhook_url, payload, 0, ?, last_error, created_at FROM dead_letters {where}",
+                (time.time(), *params),
+            ).rowcount
+            conn.execute(f"DELETE FROM dead_letters {where}", params)
+        return count
+
+    def _status(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute(
+            "SELECT attempts, next_attempt_at, last_error, created_at FROM outbox WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row:
+            return {"status": "retrying" if row[0] else "queued", "attempts": row[0],
+                    "next_attempt_at": row[1], "error": row[2], "created_at": row[3]}
+        row = self._conn.execute(
+            "SELECT attempts, last_error, created_at, failed_at FROM dead_letters WHERE id = ?", (entry_id,)
+        ).fetchone()
+        if row:
+            return {"status": "dead", "attempts": row[0], "error": row[1], "created_at": row[2], "completed_at": row[3]}
+        return None
+
+    def _dead_letters(self, limit: int, offset: int) -> List[Dict[str, Any]]:
+        rows = self._conn.execute(
+            "SELECT id, identifier, payload, attempts, last_error, created_at, failed_at FROM dead_letters "
+            "ORDER BY failed_at DESC LIMIT ? OFFSET ?",
+            (limit, offset),
+        ).fetchall()
+        return [
+            {"delivery_id": r[0], "identifier": r[1], "payload": json.loads(r[2]), "attempts": r[3],
+             "error": r[4], "created_at": r[5], "failed_at": r[6]}
+            for r in rows
+        ]
+
+    def _counts(self) -> Tuple[int, int]:
+        pending = self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        dead = self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        return pending, dead
+
+    async def _db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, func, *args)
+
+    # ---- 수명주기 ----
+
+    async def start(self):
+        """DB 열고 전송 워커 시작"""
+        if self._running:
+            return
+        if self._conn is None:
+            await self._db(self._open)
+        self._wake = asyncio.Event()
+        self._running = True
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"outbox-worker-{i}") for i in range(self.config.workers)
+        ]
+
+    async def stop(self):
+        """남은 그룹 커밋을 마치고 워커 종료 (미전송 항목은 디스크에 남아 다음 시작 시 재개)"""
+        await self._flush()
+        self._running = False
+        if self._wake is not None:
+            self._wake.set()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---- 기록 (그룹 커밋) ----
+
+    async def append(self, identifier: str, webhook_url: str, payload: Dict[str, Any]) -> str:
+        """메시지를 아웃박스에 기록하고 디스크 커밋이 끝나면 ID 반환"""
+        entry_id = os.urandom(16).hex()
+        now = time.time()
+        future = asyncio.get_running_loop().create_future()
+        self._pending_writes.append(
+            ((entry_id, identifier, webhook_url, json.dumps(payload, ensure_ascii=False), now, now), future)
+        )
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.create_task(self._flush_later())
+        await future
+        return entry_id
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.config.commit_interval_ms / 1000)
+        await self._flush()
+
+    async def _flush(self):
+        """모인 기록을 batch_size 단위로 한 트랜잭션(fsync 1회)에 커밋"""
+        self._flush_scheduled = False
+        while self._pending_writes:
+            batch = self._pending_writes[:self.config.batch_size]
+            self._pending_writes = self._pending_writes[self.config.batch_size:]
+            try:
+                await self._db(self._insert_batch, [row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.appended += len(batch)
+            self.group_commits += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            if self._wake is not None:
+                self._wake.set()
+
+    # ---- 전송 워커 ----
+
+    def _backoff(self, attempts: int) -> float:
+        """지수 백오프 + full jitter"""
+        return random.uniform(0, min(self.config.max_delay, self.config.base_delay * 2 ** (attempts - 1)))
+
+    async def _deliver(self, row: tuple) -> Tuple[str, int, Optional[Exception]]:
+        entry_id, _, webhook_url, payload, attempts, _ = row
+        try:
+            await self.send(webhook_url, json.loads(payload))
+            return entry_id, attempts + 1, None
+        except Exception as e:
+            return entry_id, attempts + 1, e
+
+    async def _worker(self):
+        errors = 0
+        while self._running:
+            try:
+                rows, next_due = await self._db(self._claim_due, self.config.batch_size)
+                if rows:
+                    await self._process(rows)
+                    errors = 0
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # DB 오류 등으로 워커가 조용히 종료되지 않도록 기록 후 백오프하고 계속 실행
+                # (기록하지 못한 항목은 lease가 끝나면 다시 가져감)
+                errors += 1
+                self.worker_errors += 1
+                logger.exception("아웃박스 워커 오류 (연속 %d회)", errors)
+                await asyncio.sleep(self._backoff(errors))
+                continue
+            errors = 0
+            # 다음 재시도 시각 또는 새 기록이 들어올 때까지 대기
+            timeout = 1.0 if next_due is None else min(1.0, max(0.0, next_due - time.time()))
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, rows: List[tuple]):
+        """가져온 항목을 동시에 전송하며, lease의 1/3마다 완료된 결과를 기록하고 전송 중인 항목의 lease를 연장
+        (느린/레이트리밋 걸린 전송이 lease를 넘겨 다른 워커가 같은 항목을 중복 전송하지 않도록)"""
+        entry_ids = {asyncio.create_task(self._deliver(row)): row[0] for row in rows}
+        pending = set(entry_ids)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=self.config.lease_seconds / 3)
+                await self._record([task.result() for task in done], [entry_ids[task] for task in pending])
+        finally:
+            # 기록 실패 시 남은 전송은 취소 (항목은 lease가 끝나면 다시 전송됨)
+            for task in pending:
+                task.cancel()
+
+    async def _record(self, results: List[Tuple[str, int, Optional[Exception]]], in_flight: List[str]):
+        delivered, retries, dead = [], [], []
+        now = time.time()
+        for entry_id, attempts, error in results:
+            if error is None:
+                delivered.append(entry_id)
+            elif attempts >= self.config.max_attempts or not is_retryable(error):
+                dead.append((entry_id, attempts, str(error)))
+            else:
+                retries.append((attempts, now + self._backoff(attempts), str(error), entry_id))
+        await self._db(self._record_results, delivered, retries, dead, in_flight)
+
+        self.delivered += len(delivered)
+        self.retried += len(retries)
+        self.dead_lettered += len(dead)
+        for entry_id in delivered:
+            self._delivered[entry_id] = now
+        while len(self._delivered) > 10000:
+            self._delivered.popitem(last=False)
+
+    # ---- 조회/관리 ----
+
+    async def status(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        """전송 상태 조회 (queued|retrying|delivered|dead)"""
+        if entry_id in self._delivered:
+            return {"status": "delivered", "completed_at": self._delivered[entry_id]}
+        status = await self._db(self._status, entry_id)
+        if status is not None:
+            status["delivery_id"] = entry_id
+        return status
+
+    async def dead_letters(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        return await self._db(self._dead_letters, limit, offset)
+
+    async def replay(self, entry_id: Optional[str] = None) -> int:
+        """dead-letter 재전송 (entry_id가 없으면 전체), 되돌린 건수 반환"""
+        count = await self._db(self._replay, entry_id)
+        if count:
+            self._wake.set()
+        return count
+
+    async def stats(self) -> Dict[str, Any]:
+        pending, dead = await self._db(self._counts)
+        return {
+            "pending": pending,
+            "dead_letters": dead,
+            "appended": self.appended,
+            "group_commits": self.group_commits,
+            "avg_batch_size": round(self.appended / self.group_commits, 2) if self.group_commits else None,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "worker_errors": self.worker_errors,
+        }
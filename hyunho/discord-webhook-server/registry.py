@@ -0,0 +1,185 @@
+# 웹훅 등록 정보 저장소
+# 런타임 등록(register_webhook)을 인스턴스 간에 공유/영속화하기 위한 백엔드 인터페이스와
+# 조회 경로를 메모리 조회로 유지하는 캐시 계층
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import sqlite3
+
+
+class RegistryBackend(ABC):
+    """웹훅 저장소 백엔드 인터페이스 (공유 저장소는 이 클래스를 구현)"""
+
+    @abstractmethod
+    def load(self) -> Tuple[int, Dict[str, str]]:
+        """(버전, 전체 웹훅 {이름: URL}) 반환"""
+
+    @abstractmethod
+    def version(self) -> int:
+        """변경될 때마다 증가하는 버전 번호 (캐시 무효화 판단용, 가벼워야 함)"""
+
+    @abstractmethod
+    def put(self, name: str, webhook_url: str) -> int:
+        """웹훅 저장 후 새 버전 반환"""
+
+    @abstractmethod
+    def delete(self, name: str) -> int:
+        """웹훅 삭제 후 새 버전 반환"""
+
+
+class MemoryRegistryBackend(RegistryBackend):
+    """프로세스 메모리 저장소 (기본값, 인스턴스 간 공유되지 않음)"""
+
+    def __init__(self):
+        self._webhooks: Dict[str, str] = {}
+        self._version = 0
+
+    def load(self) -> Tuple[int, Dict[str, str]]:
+        return self._version, dict(self._webhooks)
+
+    def version(self) -> int:
+        return self._version
+
+    def put(self, name: str, webhook_url: str) -> int:
+        self._webhooks[name] = webhook_url
+        self._version += 1
+        return self._version
+
+    def delete(self, name: str) -> int:
+        if self._webhooks.pop(name, None) is not None:
+            self._version += 1
+        return self._version
+
+
+class SQLiteRegistryBackend(RegistryBackend):
+    """SQLite 파일 저장소 (같은 파일을 여러 프로세스가 동시에 사용 가능)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS webhooks (name TEXT PRIMARY KEY, webhook_url TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS registry_meta (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO registry_meta (id, version) VALUES (0, 0)")
+
+    def _connect(self) -> "sqlite3.Connection":
+        # 작업마다 연결을 열어 스레드/프로세스 간 공유 문제를 피함 (쓰기 잠금은 최대 5초 대기)
+        # sqlite3는 이 백엔드를 쓸 때만 import (기본 메모리 백엔드의 콜드 스타트 비용 절감)
+        import sqlite3
+
+        return sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+
+    def load(self) -> Tuple[int, Dict[str, str]]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            version = conn.execute("SELECT version FROM registry_meta WHERE id = 0").fetchone()[0]
+            webhooks = dict(conn.execute("SELECT name, webhook_url FROM webhooks"))
+            conn.execute("COMMIT")
+            return version, webhooks
+        finally:
+            conn.close()
+
+    def version(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT version FROM registry_meta WHERE id = 0").fetchone()[0]
+        finally:
+            conn.close()
+
+    def _write(self, statement: str, params: Tuple) -> int:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            changed = conn.execute(statement, params).rowcount
+            if changed:
+                conn.execute("UPDATE registry_meta SET version = version + 1 WHERE id = 0")
+            version = conn.execute("SELECT version FROM registry_meta WHERE id = 0").fetchone()[0]
+            conn.execute("COMMIT")
+            return version
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def put(self, name: str, webhook_url: str) -> int:
+        return self._write(
+            "INSERT INTO webhooks (name, webhook_url) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET webhook_url = excluded.webhook_url",
+            (name, webhook_url),
+        )
+
+    def delete(self, name: str) -> int:
+        return self._write("DELETE FROM webhooks WHERE name = ?", (name,))
+
+
+class WebhookRegistry:
+    """
+    저장소 앞단의 메모리 캐시
+    조회는 항상 dict 조회이며, cache_ttl초마다 한 번만 백엔드 버전을 확인해 바뀌었으면 다시 로드
+    """
+
+    def __init__(self, backend: RegistryBackend, static: Optional[Dict[str, str]] = None, cache_ttl: float = 5.0):
+        self.backend = backend
+        self.static = dict(static or {})  # 환경변수로 등록된 웹훅 (저장소에 쓰지 않음)
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._version = -1
+        self._webhooks: Dict[str, str] = dict(self.static)
+        self._next_check = 0.0
+        self.reloads = 0  # 캐시 재로드 횟수
+        self.refresh(force=True)
+
+    @classmethod
+    def from_env(cls, static: Optional[Dict[str, str]] = None) -> "WebhookRegistry":
+        """환경변수(REGISTRY_*)로 백엔드 선택: REGISTRY_BACKEND=memory|sqlite, REGISTRY_PATH, REGISTRY_CACHE_TTL"""
+        kind = os.getenv("REGISTRY_BACKEND", "memory").lower()
+        if kind == "sqlite":
+            backend: RegistryBackend = SQLiteRegistryBackend(os.getenv("REGISTRY_PATH", "/tmp/webhook-registry.db"))
+        elif kind == "memory":
+            backend = MemoryRegistryBackend()
+        else:
+            raise ValueError(f"지원하지 않는 REGISTRY_BACKEND: {kind}")
+        return cls(backend, static=static, cache_ttl=float(os.getenv("REGISTRY_CACHE_TTL", 5.0)))
+
+    def refresh(self, force: bool = False):
+        """TTL이 지났으면 백엔드 버전을 확인하고, 바뀌었으면 캐시를 새로 로드"""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + self.cache_ttl
+            if not force and self.backend.version() == self._version:
+                return
+            version, stored = self.backend.load()
+            # 저장소 등록이 환경변수 등록보다 우선
+            self._webhooks = {**self.static, **stored}
+            self._version = version
+            self.reloads += 1
+
+    def get(self, name: str) -> Optional[str]:
+        """웹훅 URL 조회 (핫 패스: 메모리 dict 조회)"""
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._webhooks.get(name)
+
+    def all(self) -> Dict[str, str]:
+        self.refresh()
+        return self._webhooks
+
+    def register(self, name: str, webhook_url: str):
+        """저장소에 쓰고 즉시 캐시에 반영"""
+        self.backend.put(name, webhook_url)
+        self.refresh(force=True)
+
+    def unregister(self, name: str):
+        self.backend.delete(name)
+        self.refresh(force=True)
@@ -1,10 +1,25 @@
 # Discord 웹훅 처리 전용 모듈
 # 웹훅 URL 관리와 메시지 전송 로직을 분리하여 관심사 분리 구현
 
+import asyncio
 import os
-import requests
-from typing import Optional, Dict, Any, List
-from pydantic import BaseModel
+import time
+import httpx
+import orjson
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+from pydantic import BaseModel, Field
+
+import metrics
+from coalesce import MessageCoalescer
+from registry import WebhookRegistry
+
+# HTTP/2 지원 여부 (h2 패키지가 설치된 경우에만 사용 가능)
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 # Discord Embed 필드 모델
 class EmbedField(BaseModel):
@@ -49,32 +64,373 @@ class WebhookMessage(BaseModel):
     # TTS (Text-to-Speech)
     tts: Optional[bool] = False  # 음성 읽기 여부
 
+# 페이로드 키 순서 (값이 비어 있으면 제외되는 필드들)
+_MESSAGE_KEYS = ("content", "username", "avatar_url", "tts")
+_EMBED_KEYS = ("title", "description", "url", "color", "timestamp")
+
+def _embed_payload(embed: Embed) -> Dict[str, Any]:
+    """임베드 -> Discord 페이로드 dict"""
+    values = embed.__dict__
+    data = {name: values[name] for name in _EMBED_KEYS if values[name]}
+    
+    # 복합 객체들
+    footer = embed.footer
+    if footer:
+        data["footer"] = {"text": footer.text, "icon_url": footer.icon_url} if footer.icon_url else {"text": footer.text}
+    author = embed.author
+    if author:
+        author_dict = {"name": author.name}
+        if author.url:
+            author_dict["url"] = author.url
+        if author.icon_url:
+            author_dict["icon_url"] = author.icon_url
+        data["author"] = author_dict
+    if embed.image:
+        data["image"] = embed.image
+    if embed.thumbnail:
+        data["thumbnail"] = embed.thumbnail
+    
+    # 필드 목록
+    if embed.fields:
+        data["fields"] = [
+            {"name": field.name, "value": field.value, "inline": field.inline}
+            for field in embed.fields
+        ]
+    return data
+
+def dumps_payload(payload: Dict[str, Any]) -> bytes:
+    """페이로드를 공백 없는 UTF-8 JSON 바이트로 직렬화"""
+    return orjson.dumps(payload)
+
+# 배치 전송 항목 모델
+class BatchItem(BaseModel):
+    identifier: str  # 웹훅 이름 또는 webhook_id/token
+    message: WebhookMessage  # 전송할 메시지
+
+# 배치 전송 요청 모델
+# 배치 요청 하나에 담을 수 있는 최대 항목 수 (초과 시 422, 요청 하나가 전송을 무한정 늘리지 못하도록)
+MAX_BATCH_ITEMS = 100
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., max_length=MAX_BATCH_ITEMS)  # 전송 목록
+    concurrency: Optional[int] = None  # 동시 전송 수 (서버 상한 이하로 제한)
+
+# Discord API 호출용 HTTP 클라이언트 설정
+# 환경변수 접두사는 WEBHOOK_ 과 겹치지 않도록 DISCORD_HTTP_ 사용
+class TransportConfig(BaseModel):
+    max_connections: int = 100  # 전체 동시 연결 수 상한
+    max_keepalive_connections: int = 20  # 유지할 keep-alive 연결 수
+    keepalive_expiry: float = 30.0  # keep-alive 연결 유지 시간 (초)
+    connect_timeout: float = 5.0  # 연결 타임아웃 (초)
+    timeout: float = 10.0  # 읽기/쓰기/풀 대기 타임아웃 (초)
+    http2: bool = True  # HTTP/2 사용 여부 (h2 미설치 시 HTTP/1.1)
+    rate_limit_max_retries: int = 3  # 429 응답 시 재시도 횟수
+    global_rate_limit: float = 50.0  # 전역 초당 요청 수 상한 (0이면 비활성화)
+    rate_limit_max_urls: int = 10000  # 레이트리밋 상태를 유지할 웹훅 URL 수 상한 (유휴 상태인 오래된 것부터 정리)
+    batch_concurrency: int = 10  # 배치 전송 시 최대 동시 전송 수
+
+    @classmethod
+    def from_env(cls) -> "TransportConfig":
+        """환경변수(DISCORD_HTTP_*)에서 설정 로드"""
+        values = {}
+        for field in cls.model_fields:
+            env_value = os.getenv(f"DISCORD_HTTP_{field.upper()}")
+            if env_value is not None:
+                values[field] = env_value
+        return cls(**values)
+
+# Discord 레이트리밋 버킷 상태
+class _RateLimitBucket:
+    def __init__(self):
+        self.lock = asyncio.Lock()  # 버킷별 FIFO 대기열 (예약 단계에서만 잡음)
+        self.remaining: Optional[int] = None  # X-RateLimit-Remaining (미확인 시 None)
+        self.reset_at = 0.0  # 버킷 리셋 시각 (time.monotonic 기준)
+        self.waiting = 0  # 예약 대기 중인 요청 수
+        self.discovered = False  # 첫 응답으로 헤더 정보를 받았는지 여부
+        self.probe: Optional[asyncio.Future] = None  # 버킷 정보 확인용 첫 요청 완료 신호
+        self.bucket_id: Optional[str] = None  # X-RateLimit-Bucket (공유 버킷인 경우)
+        self.urls = 0  # 이 버킷을 쓰는 URL 수 (0이 되면 공유 버킷 목록에서도 제거)
+
+    def idle(self, now: float) -> bool:
+        """대기/진행 중인 요청이 없고 레이트리밋 윈도우도 끝나 상태를 버려도 되는지 여부"""
+        return not self.waiting and self.probe is None and not self.lock.locked() and now >= self.reset_at
+
+class RateLimitScheduler:
+    """
+    웹훅 URL/버킷별 Discord 레이트리밋 스케줄러
+    X-RateLimit-Bucket/Remaining/Reset-After, Retry-After 헤더를 추적하여
+    버킷 단위로 전송 속도를 조절하고, 전역 레이트리밋도 함께 준수
+    """
+    
+    def __init__(self, max_retries: int = 3, global_rate: float = 50.0, max_urls: int = 10000):
+        self.max_retries = max_retries
+        self.global_rate = global_rate
+        self.max_urls = max_urls
+        # 웹훅 URL -> 버킷 (클라이언트가 보낸 URL이므로 최근 사용 순으로 유지하고 max_urls를 넘으면 정리)
+        self._url_buckets: "OrderedDict[str, _RateLimitBucket]" = OrderedDict()
+        self._buckets: Dict[str, _RateLimitBucket] = {}  # X-RateLimit-Bucket -> 버킷
+        
+        # 전역 레이트리밋 (토큰 버킷 + 전역 429 발생 시 전체 대기)
+        self._global_lock = asyncio.Lock()
+        self._global_tokens = global_rate
+        self._global_updated = time.monotonic()
+        self._global_reset_at = 0.0
+        
+        # 메트릭
+        self.reservations = 0  # 전송 예약 횟수
+        self.delayed = 0  # 대기가 발생한 예약 횟수
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.rate_limited = 0  # 429 응답 수
+        self.global_rate_limited = 0  # 전역 429 응답 수
+    
+    def _bucket_for(self, url: str) -> _RateLimitBucket:
+        bucket = self._url_buckets.get(url)
+        if bucket is None:
+            bucket = self._url_buckets[url] = _RateLimitBucket()
+            bucket.urls += 1
+            self._evict(keep=url)
+        else:
+            self._url_buckets.move_to_end(url)
+        return bucket
+
+    def _evict(self, keep: str):
+        """URL 수가 상한을 넘으면 오래 쓰지 않은 유휴 버킷부터 정리 (사용 중이거나 리셋 대기 중인 버킷은 유지)"""
+        if len(self._url_buckets) <= self.max_urls:
+            return
+        now = time.monotonic()
+        for url, bucket in list(self._url_buckets.items()):
+            if len(self._url_buckets) <= self.max_urls:
+                break
+            if url == keep or not bucket.idle(now):
+                continue
+            del self._url_buckets[url]
+            bucket.urls -= 1
+            if not bucket.urls and bucket.bucket_id is not None:
+                self._buckets.pop(bucket.bucket_id, None)
+    
+    async def _acquire_global(self):
+        """전역 토큰 하나 확보 (전역 429 리셋 전이면 대기)"""
+        async with self._global_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._global_reset_at:
+                    await asyncio.sleep(self._global_reset_at - now)
+                    continue
+                if self.global_rate <= 0:
+                    return
+                self._global_tokens = min(
+                    self.global_rate,
+                    self._global_tokens + (now - self._global_updated) * self.global_rate,
+                )
+                self._global_updated = now
+                if self._global_tokens >= 1:
+                    self._global_tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._global_tokens) / self.global_rate)
+    
+    async def _reserve(self, url: str) -> _RateLimitBucket:
+        """버킷에 남은 요청 수가 생길 때까지 대기 후 1회분 예약"""
+        bucket = self._bucket_for(url)
+        bucket.waiting += 1
+        started = time.monotonic()
+        try:
+            async with bucket.lock:
+                while True:
+                    if not bucket.discovered:
+                        # 버킷 한도를 모르는 동안에는 요청 하나만 보내고 응답 헤더를 기다림
+                        if bucket.probe is None:
+                            bucket.probe = asyncio.get_running_loop().create_future()
+                            break
+                        await asyncio.shield(bucket.probe)
+                        continue
+                    now = time.monotonic()
+                    if bucket.remaining is not None and bucket.remaining <= 0:
+                        if now < bucket.reset_at:
+                            await asyncio.sleep(bucket.reset_at - now)
+                            continue
+                        # 리셋 시각이 지났으면 새 윈도우의 남은 횟수를 첫 요청으로 다시 확인
+                        bucket.remaining = None
+                        bucket.discovered = False
+                        continue
+                    if bucket.remaining is not None:
+                        bucket.remaining -= 1
+                    break
+            await self._acquire_global()
+        finally:
+            bucket.waiting -= 1
+            waited = time.monotonic() - started
+            self.reservations += 1
+            if waited > 0.001:
+                self.delayed += 1
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return bucket
+    
+    @staticmethod
+    def _release_probe(bucket: _RateLimitBucket):
+        """첫 요청이 끝나면 (성공/실패 무관) 대기 중인 요청들을 깨움"""
+        if bucket.probe is not None:
+            if not bucket.probe.done():
+                bucket.probe.set_result(None)
+            bucket.probe = None
+    
+    def _update(self, url: str, response: httpx.Response):
+        """응답 헤더로 버킷 상태 갱신"""
+        headers = response.headers
+        now = time.monotonic()
+        bucket = self._bucket_for(url)
+        bucket.discovered = True
+        
+        # 같은 X-RateLimit-Bucket을 쓰는 URL들은 하나의 버킷 상태를 공유
+        bucket_id = headers.get("x-ratelimit-bucket")
+        if bucket_id:
+            shared = self._buckets.setdefault(bucket_id, bucket)
+            shared.bucket_id = bucket_id
+            if shared is not bucket and self._url_buckets.get(url) is bucket:
+                self._url_buckets[url] = shared
+                shared.urls += 1
+            bucket = shared
+            bucket.discovered = True
+        
+        if headers.get("x-ratelimit-remaining") is not None and headers.get("x-ratelimit-reset-after"):
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset_at = now + float(headers["x-ratelimit-reset-after"])
+            if bucket.remaining is None or reset_at > bucket.reset_at + 0.05:
+                # 새 윈도우 시작
+                bucket.remaining = remaining
+            else:
+                # 같은 윈도우: 이미 예약된 요청을 고려해 더 작은 값 유지
+                bucket.remaining = min(bucket.remaining, remaining)
+            bucket.reset_at = reset_at
+        
+        if response.status_code == 429:
+            self.rate_limited += 1
+            retry_after = self._retry_after(response)
+            if headers.get("x-ratelimit-global", "").lower() == "true":
+                self.global_rate_limited += 1
+                self._global_reset_at = max(self._global_reset_at, now + retry_after)
+            else:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, now + retry_after)
+    
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float:
+        """Retry-After 헤더 또는 본문의 retry_after(초) 반환"""
+        value = response.headers.get("retry-after")
+        if value is None:
+            try:
+                value = response.json().get("retry_after")
+            except Exception:
+                value = None
+        try:
+            return max(float(value), 0.0)
+        except (TypeError, ValueError):
+            return 1.0
+    
+    async def send(self, url: str, request: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """레이트리밋을 지키며 요청 실행 (429 시 Retry-After 만큼 기다렸다가 재시도)"""
+        attempt = 0
+        while True:
+            bucket = await self._reserve(url)
+            try:
+                response = await request()
+                self._update(url, response)
+            finally:
+                self._release_probe(bucket)
+            if response.status_code != 429 or attempt >= self.max_retries:
+                return response
+            attempt += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """대기열 깊이/대기 시간 메트릭"""
+        buckets = {id(b): b for b in self._url_buckets.values()}.values()
+        return {
+            "queue_depth": sum(b.waiting for b in buckets),
+            "tracked_buckets": len(buckets),
+            "reservations": self.reservations,
+            "delayed": self.delayed,
+            "total_wait_seconds": round(self.total_wait_seconds, 6),
+            "avg_wait_seconds": round(self.total_wait_seconds / self.reservations, 6) if self.reservations else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+            "rate_limited_responses": self.rate_limited,
+            "global_rate_limited_responses": self.global_rate_limited,
+        }
+
 class DiscordWebhookManager:
     """Discord 웹훅 관리 클래스"""
     
-    def __init__(self):
+    def __init__(self, transport_config: Optional[TransportConfig] = None):
         # 환경변수에서 기본 웹훅 URL들을 로드
         # 여러 웹훅을 미리 등록해두고 이름으로 사용 가능
-        self.registered_webhooks = {}
-        self._load_webhooks_from_env()
+        # 런타임 등록은 저장소(REGISTRY_BACKEND)에 기록되고, 조회는 메모리 캐시에서 처리
+        self.registry = WebhookRegistry.from_env(static=self._load_webhooks_from_env())
+        
+        # 모든 요청이 공유하는 keep-alive 커넥션 풀 (startup 시 또는 첫 전송 시 생성)
+        self.transport_config = transport_config or TransportConfig.from_env()
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # 웹훅별 레이트리밋 스케줄러
+        self.scheduler = RateLimitScheduler(
+            max_retries=self.transport_config.rate_limit_max_retries,
+            global_rate=self.transport_config.global_rate_limit,
+            max_urls=self.transport_config.rate_limit_max_urls,
+        )
+        
+        # 식별자별 묶음 전송 (COALESCE_<이름> 환경변수 또는 런타임 설정으로 활성화)
+        self.coalescer = MessageCoalescer(self.send_payload)
+        self.coalescer.load_from_env()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """공유 비동기 HTTP 클라이언트 반환 (없거나 닫혔으면 새로 생성)"""
+        if self._client is None or self._client.is_closed:
+            cfg = self.transport_config
+            self._client = httpx.AsyncClient(
+                http2=cfg.http2 and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=cfg.max_connections,
+                    max_keepalive_connections=cfg.max_keepalive_connections,
+                    keepalive_expiry=cfg.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(cfg.timeout, connect=cfg.connect_timeout),
+            )
+        return self._client
+    
+    async def startup(self):
+        """앱 시작 시 HTTP 클라이언트 준비"""
+        self._get_client()
     
-    def _load_webhooks_from_env(self):
+    async def shutdown(self):
+        """앱 종료 시 커넥션 풀 정리"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    def _load_webhooks_from_env(self) -> Dict[str, str]:
         """환경변수에서 웹훅 URL들을 로드"""
         # 환경변수 패턴: WEBHOOK_채널명=전체_웹훅_URL
+        webhooks = {}
         for key, value in os.environ.items():
             if key.startswith("WEBHOOK_"):
                 webhook_name = key.replace("WEBHOOK_", "").lower()
-                self.registered_webhooks[webhook_name] = value
+                webhooks[webhook_name] = value
+        return webhooks
+    
+    @property
+    def registered_webhooks(self) -> Dict[str, str]:
+        """등록된 웹훅 전체 {이름: URL} (환경변수 + 저장소)"""
+        return self.registry.all()
     
     def register_webhook(self, name: str, webhook_url: str):
-        """런타임에 새 웹훅 등록"""
-        self.registered_webhooks[name] = webhook_url
+        """런타임에 새 웹훅 등록 (저장소에 기록되어 다른 인스턴스에도 공유)"""
+        self.registry.register(name, webhook_url)
     
     def get_webhook_url(self, identifier: str) -> str:
         """웹훅 URL 반환 - 등록된 이름 또는 직접 webhook_id 사용"""
         # 등록된 웹훅 이름인지 확인
-        if identifier in self.registered_webhooks:
-            return self.registered_webhooks[identifier]
+        webhook_url = self.registry.get(identifier)
+        if webhook_url is not None:
+            return webhook_url
         
         # webhook_id 형태로 간주하고 Discord API URL 구성
         # Discord 웹훅 URL 형태: https://discord.com/api/webhooks/ID/TOKEN
@@ -86,90 +442,75 @@ class DiscordWebhookManager:
             return f"https://discord.com/api/webhooks/{identifier}"
     
     def build_payload(self, message: WebhookMessage) -> Dict[str, Any]:
-        """웹훅 페이로드 구성"""
-        payload = {}
-        
-        # 기본 메시지 필드들
-        if message.content:
-            payload["content"] = message.content
-        if message.username:
-            payload["username"] = message.username
-        if message.avatar_url:
-            payload["avatar_url"] = message.avatar_url
-        if message.tts:
-            payload["tts"] = message.tts
+        """웹훅 페이로드 구성 (값이 비어 있는 필드는 제외)"""
+        values = message.__dict__
+        payload = {name: values[name] for name in _MESSAGE_KEYS if values[name]}
         
         # 임베드 처리
         if message.embeds:
-            embeds_data = []
-            for embed in message.embeds:
-                embed_dict = {}
-                
-                # 기본 임베드 필드들
-                if embed.title:
-                    embed_dict["title"] = embed.title
-                if embed.description:
-                    embed_dict["description"] = embed.description
-                if embed.url:
-                    embed_dict["url"] = embed.url
-                if embed.color:
-                    embed_dict["color"] = embed.color
-                if embed.timestamp:
-                    embed_dict["timestamp"] = embed.timestamp
-                
-                # 복합 객체들
-                if embed.footer:
-                    footer_dict = {"text": embed.footer.text}
-                    if embed.footer.icon_url:
-                        footer_dict["icon_url"] = embed.footer.icon_url
-                    embed_dict["footer"] = footer_dict
-                
-                if embed.author:
-                    author_dict = {"name": embed.author.name}
-                    if embed.author.url:
-                        author_dict["url"] = embed.author.url
-                    if embed.author.icon_url:
-                        author_dict["icon_url"] = embed.author.icon_url
-                    embed_dict["author"] = author_dict
-                
-                if embed.image:
-                    embed_dict["image"] = embed.image
-                if embed.thumbnail:
-                    embed_dict["thumbnail"] = embed.thumbnail
-                
-                # 필드 목록
-                if embed.fields:
-                    fields_data = []
-                    for field in embed.fields:
-                        fields_data.append({
-                            "name": field.name,
-                            "value": field.value,
-                            "inline": field.inline
-                        })
-                    embed_dict["fields"] = fields_data
-                
-                embeds_data.append(embed_dict)
-            
-            payload["embeds"] = embeds_data
+            payload["embeds"] = [_embed_payload(embed) for embed in message.embeds]
         
         return payload
     
-    async def send_webhook(self, identifier: str, message: WebhookMessage) -> Dict[str, str]:
-        """웹훅 메시지 전송"""
-        webhook_url = self.get_webhook_url(identifier)
-        payload = self.build_payload(message)
+    def encode_payload(self, message: WebhookMessage) -> bytes:
+        """검증된 메시지를 바로 전송용 JSON 바이트로 변환"""
+        return dumps_payload(self.build_payload(message))
+    
+    async def send_payload(self, webhook_url: str, payload: Dict[str, Any]) -> httpx.Response:
+        """구성된 페이로드를 Discord로 전송 (공유 커넥션 풀 사용, 버킷별 레이트리밋 준수)"""
+        client = self._get_client()
+        body = dumps_payload(payload)
+        webhook_id = metrics.webhook_label(webhook_url)
+        
+        # 레이트리밋 재시도마다 실제 Discord 호출 1회의 지연과 상태코드 기록
+        async def post() -> httpx.Response:
+            status = "error"
+            started = time.perf_counter()
+            try:
+                response = await client.post(webhook_url, content=body, headers={"Content-Type": "application/json"})
+                status = str(response.status_code)
+                return response
+            finally:
+                metrics.DISCORD_REQUEST_SECONDS.labels(webhook_id, status).observe(time.perf_counter() - started)
         
-        # Discord API 호출
-        response = requests.post(webhook_url, json=payload, timeout=10)
+        response = await self.scheduler.send(webhook_url, post)
         
         # HTTP 에러 체크
         response.raise_for_status()
+        return response
+    
+    async def send_webhook(self, identifier: str, message: WebhookMessage) -> Dict[str, Any]:
+        """웹훅 메시지 전송"""
+        webhook_url = self.get_webhook_url(identifier)
+        payload = self.build_payload(message)
         
-        return {
+        result = {
             "status": "success", 
             "message": f"Webhook sent successfully to {identifier}",
             "webhook_url": webhook_url.split("/webhooks/")[0] + "/webhooks/***"  # 보안을 위해 URL 마스킹
         }
+        
+        # 묶음 전송이 켜진 웹훅은 시간 창 동안 모았다가 합쳐서 전송
+        if self.coalescer.enabled(identifier):
+            await self.coalescer.submit(identifier, webhook_url, payload)
+            result["coalesced"] = True
+            return result
+        
+        await self.send_payload(webhook_url, payload)
+        return result
+    
+    async def send_batch(self, items: List[BatchItem], concurrency: Optional[int] = None) -> List[Any]:
+        """여러 메시지를 동시 전송 수 제한 하에 병렬 전송 (항목별 결과 또는 예외 반환)"""
+        limit = self.transport_config.batch_concurrency
+        if concurrency:
+            limit = max(1, min(concurrency, limit))
+        semaphore = asyncio.Semaphore(limit)
+        
+        async def send_one(item: BatchItem):
+            async with semaphore:
+                return await self.send_webhook(item.identifier, item.message)
+        
+        return await asyncio.gather(*(send_one(item) for item in items), return_exceptions=True)
 
 # 전역 웹훅 매니저 인스턴스
 webhook_manager = DiscordWebhookManager()
\ No newline at end of file